@@ -6,5 +6,9 @@ class FrontendConfig(AppConfig):
     name = 'frontend'
 
 class BackendConfig(AppConfig):
+    default = True # Used for the 'backend' entry in INSTALLED_APPS
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend'
+
+    def ready(self):
+        from . import signals # noqa: F401 (connects the receivers)
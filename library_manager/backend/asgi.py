@@ -2,6 +2,10 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests served through it use backend/asgi_urls.py, where the book read
+endpoints are async views (backend/async_views.py), e.g.:
+
+    uvicorn backend.asgi:application --workers 1
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
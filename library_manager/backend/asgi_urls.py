@@ -0,0 +1,23 @@
+"""
+URL configuration for requests served over ASGI (see AsyncEndpointsMiddleware).
+
+Same URLs and names as backend/urls.py, but the book read endpoints are served by
+the async views in backend/async_views.py. Django uses the first matching pattern,
+so the async routes shadow the DRF ones listed after them.
+"""
+from django.urls import path
+
+from . import async_views
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    # List books (GET, async) and Create books (POST)
+    path("api/books/", async_views.book_list, name="book-list-create"),
+    # Retrieve (GET, async), Update (PUT/PATCH), Delete (DELETE) a specific book
+    path("api/books/<int:id>/", async_views.book_detail, name="book-detail"),
+    # List borrowed books (GET, async)
+    path("api/books/borrowed/", async_views.borrowed_books, name="borrowed-books-list"),
+    # Server-sent availability deltas of borrows/returns (GET, ASGI only)
+    path("api/books/availability/", async_views.availability_feed, name="book-availability-feed"),
+    *wsgi_urlpatterns,
+]
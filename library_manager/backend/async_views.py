@@ -0,0 +1,292 @@
+"""
+ASGI-native versions of the book read endpoints.
+
+Under ASGI every DRF view runs in a worker thread (sync_to_async), so a worker
+can only serve as many slow requests at a time as it has threads. The GET
+handlers of the book list, book detail and borrowed-books endpoints are
+re-implemented here as async views on the async ORM (aiterator, aget), with the
+same query parameters, response bodies, caching and ETags as their DRF
+counterparts in views.py. Writes (POST/PUT/PATCH/DELETE) are handed to the DRF
+views unchanged.
+
+AsyncEndpointsMiddleware routes requests that arrive over ASGI to
+backend/asgi_urls.py, which maps the same URLs to these views; WSGI requests
+keep using backend/urls.py. The availability feed (server-sent events, see
+availability_feed.py) is only available over ASGI. Only session authentication is supported here (the
+frontend's); other clients of these URLs should authenticate with a session too.
+"""
+import asyncio
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from .availability_feed import RESET_EVENT, get_broadcaster
+from .db_routers import set_replica_reads
+from .models import Book
+from .pagination import KeysetPagination, get_ordering_keys, ordering_expressions
+from .response_cache import acached_book_data, book_response_etag, book_response_last_modified
+from .roles import get_role, is_admin_or_librarian
+from .serializers import BookFastListSerializer, get_requested_book_fields
+from .views import BookDetailView, BookListCreateView, BorrowedBooksListView, group_books_by_borrower
+
+User = get_user_model()
+
+ASYNC_URLCONF = 'backend.asgi_urls'
+SAFE_METHODS = ('GET', 'HEAD')
+# Same compact UTF-8 JSON as DRF's JSONRenderer
+JSON_DUMPS_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+# The DRF views still handle everything but GET (one thread hop, as before)
+_book_list_create = sync_to_async(BookListCreateView.as_view())
+_book_detail = sync_to_async(BookDetailView.as_view())
+_borrowed_books = sync_to_async(BorrowedBooksListView.as_view())
+
+
+class AsyncEndpointsMiddleware:
+    """Serves ASGI requests from ASYNC_URLCONF. Place it anywhere in MIDDLEWARE."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if isinstance(request, ASGIRequest):
+            request.urlconf = ASYNC_URLCONF
+        return self.get_response(request) # A coroutine in async mode
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params=JSON_DUMPS_PARAMS)
+
+
+def _error(exc):
+    """
+    The response DRF's exception handler gives for a NotFound/ValidationError/Http404
+    (how it words an Http404 depends on the DRF version, like in the sync views).
+    """
+    response = exception_handler(exc, {})
+    return _json(response.data, status=response.status_code)
+
+
+async def _authenticate(request):
+    """
+    Loads the session user (with profile, see auth_backends.py) and resolves their
+    role once, so that serializers and ETags below never query synchronously.
+    Returns None for anonymous requests.
+    """
+    user = await request.auser()
+    request.user = user # request.user would load the user again, synchronously
+    if not user.is_authenticated:
+        return None
+    await sync_to_async(get_role)(user)
+    return user
+
+
+def _forbidden():
+    # IsAuthenticated with SessionAuthentication answers 403, not 401
+    return _json({'detail': 'Authentication credentials were not provided.'}, status=403)
+
+
+# The DRF Request wrappers below carry no authenticators: they only provide query_params and
+# absolute URLs to the filters, paginator and serializer. The viewer is always passed explicitly.
+def _context(drf_request, view=None):
+    return {'request': drf_request, 'format': None, 'view': view}
+
+
+async def _values(queryset):
+    return [row async for row in queryset.aiterator()]
+
+
+def _borrowers(rows):
+    return {row['id']: row['borrower__username'] for row in rows if row.get('borrower__username') is not None}
+
+
+# ============================== #
+# BOOK LIST                      #
+# ============================== #
+
+@csrf_exempt
+async def book_list(request):
+    """GET /api/books/ (async); POST goes to BookListCreateView."""
+    if request.method not in SAFE_METHODS:
+        return await _book_list_create(request)
+    if await _authenticate(request) is None:
+        return _forbidden()
+    set_replica_reads(True)
+    try:
+        return await _book_list_get(request)
+    finally:
+        set_replica_reads(False)
+
+
+@condition(etag_func=book_response_etag, last_modified_func=book_response_last_modified)
+async def _book_list_get(request):
+    drf_request = Request(request)
+    view = BookListCreateView(request=drf_request, format_kwarg=None, args=(), kwargs={})
+
+    async def build():
+        # Filters, search and ordering only build the (lazy) queryset: no database access here
+        queryset = view.filter_queryset(view.get_queryset())
+        queryset = queryset.order_by(*ordering_expressions(get_ordering_keys(queryset)))
+        rows_queryset, fields = view.get_book_values(queryset)
+
+        paginator = KeysetPagination()
+        paginated = paginator.is_requested(drf_request)
+        if paginated:
+            page_queryset = paginator.get_page_queryset(rows_queryset, drf_request)
+            rows = paginator.finalize_page([row async for row in page_queryset])
+        else:
+            rows = await _values(rows_queryset)
+
+        data = BookFastListSerializer(rows, context={**_context(drf_request, view), 'viewer': None, 'fields': fields}).data
+        if paginated:
+            data = {'next': paginator.get_next_link(), 'previous': paginator.get_previous_link(), 'results': data}
+        return data, _borrowers(rows)
+
+    try:
+        return _json(await acached_book_data(request, build))
+    except (NotFound, ValidationError) as exc:
+        return _error(exc)
+
+
+# ============================== #
+# BOOK DETAIL                    #
+# ============================== #
+
+@csrf_exempt
+async def book_detail(request, id):
+    """GET /api/books/<id>/ (async); PUT/PATCH/DELETE go to BookDetailView."""
+    if request.method not in SAFE_METHODS:
+        return await _book_detail(request, id=id)
+    if await _authenticate(request) is None:
+        return _forbidden()
+    set_replica_reads(True)
+    try:
+        return await _book_detail_get(request, id)
+    finally:
+        set_replica_reads(False)
+
+
+@condition(etag_func=book_response_etag, last_modified_func=book_response_last_modified)
+async def _book_detail_get(request, id):
+    drf_request = Request(request)
+
+    async def build():
+        fields = get_requested_book_fields(drf_request.query_params)
+        try:
+            row = await BookFastListSerializer.get_values_queryset(Book.objects.filter(id=id), fields=fields).aget()
+        except Book.DoesNotExist:
+            raise Http404("No Book matches the given query.") # What get_object_or_404() raises
+        # The fast serializer renders exactly what BookSerializer does
+        context = {**_context(drf_request), 'viewer': None, 'fields': fields}
+        data = next(BookFastListSerializer(None, context=context).iter_data([row]))
+        return data, _borrowers([row])
+
+    try:
+        return _json(await acached_book_data(request, build))
+    except (Http404, ValidationError) as exc:
+        return _error(exc)
+
+
+# ============================== #
+# BORROWED BOOKS                 #
+# ============================== #
+
+@csrf_exempt
+async def borrowed_books(request):
+    """GET /api/books/borrowed/ (async version of BorrowedBooksListView)."""
+    if request.method not in SAFE_METHODS:
+        return await _borrowed_books(request)
+    user = await _authenticate(request)
+    if user is None:
+        return _forbidden()
+    drf_request = Request(request)
+    serializer = BookFastListSerializer(None, context={**_context(drf_request), 'viewer': user})
+
+    if not is_admin_or_librarian(user):
+        rows = await _values(BookFastListSerializer.get_values_queryset(
+            Book.objects.filter(borrower=user, available=False).order_by('due_date')
+        ))
+        return _json({"my_borrowed_books": list(serializer.iter_data(rows))})
+
+    # Admins/Librarians: all loans grouped by borrower, optionally paged by borrower
+    borrowed_books_query = Book.objects.filter(available=False, borrower__isnull=False)
+    borrowers = (
+        User.objects.filter(id__in=borrowed_books_query.values('borrower_id'))
+        .values('id', 'username').order_by('username')
+    )
+    paginator = KeysetPagination()
+    page = None
+    if paginator.is_requested(drf_request):
+        try:
+            page = paginator.finalize_page([row async for row in paginator.get_page_queryset(borrowers, drf_request)])
+        except NotFound as exc:
+            return _error(exc)
+        borrowed_books_query = borrowed_books_query.filter(borrower_id__in=[b['id'] for b in page])
+
+    rows = await _values(BookFastListSerializer.get_values_queryset(
+        borrowed_books_query.order_by('borrower__username', 'borrower_id', 'due_date', 'id')
+    ))
+    payload = {"borrowed_books_by_user": group_books_by_borrower(rows, serializer.iter_data(rows))}
+    if page is not None:
+        payload["next"] = paginator.get_next_link()
+        payload["previous"] = paginator.get_previous_link()
+    return _json(payload)
+
+
+# ============================== #
+# AVAILABILITY FEED              #
+# ============================== #
+
+FEED_RETRY_MS = 3000 # Reconnect delay suggested to EventSource clients
+
+
+async def _feed_events(last_event_id, heartbeat):
+    subscription = get_broadcaster().subscribe(last_event_id)
+    try:
+        yield f"retry: {FEED_RETRY_MS}\n\n"
+        if subscription.reset:
+            yield RESET_EVENT
+        for message in subscription.missed:
+            yield message
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n" # Keeps proxies from closing an idle stream
+                continue
+            if message is None: # Fell too far behind: the client reconnects and re-fetches
+                yield RESET_EVENT
+                return
+            yield message
+    finally:
+        # Also runs when the client disconnects (Django cancels the stream)
+        subscription.close()
+
+
+@require_GET
+async def availability_feed(request):
+    """
+    GET /api/books/availability/ (ASGI only): server-sent availability deltas of
+    borrows and returns. Resumes after the Last-Event-ID header or ?last_event_id=.
+    """
+    if await _authenticate(request) is None:
+        return _forbidden()
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    heartbeat = getattr(settings, 'AVAILABILITY_FEED_HEARTBEAT', 15)
+    response = StreamingHttpResponse(_feed_events(last_event_id, heartbeat), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Tells nginx not to buffer the stream
+    return response
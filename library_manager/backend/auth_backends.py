@@ -0,0 +1,65 @@
+"""
+Authentication backend that loads a user together with their UserProfile.
+
+The default ModelBackend fetches only the User row, so the first access to
+``request.user.profile`` (permission checks, UserSerializer in CurrentUserView,
+CurrentUserUpdateView and LoginView) costs a second query on every request.
+ProfileModelBackend joins the profile in the same query; users without a
+profile are loaded as well (``hasattr(user, 'profile')`` is then False without a query).
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class ProfileModelBackend(ModelBackend):
+    """ModelBackend whose users come with their profile already loaded."""
+
+    def _users(self):
+        return UserModel._default_manager.select_related('profile')
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = self._users().get(**{UserModel.USERNAME_FIELD: username})
+        except UserModel.DoesNotExist:
+            # Run the default password hasher once to reduce the timing difference
+            # between an existing and a nonexistent user (as ModelBackend does)
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await self._users().aget(**{UserModel.USERNAME_FIELD: username})
+        except UserModel.DoesNotExist:
+            UserModel().set_password(password)
+            return None
+        if await user.acheck_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        """Called by AuthenticationMiddleware for the session's user on every request."""
+        try:
+            user = self._users().get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        try:
+            user = await self._users().aget(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
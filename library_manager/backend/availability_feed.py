@@ -0,0 +1,158 @@
+"""
+In-process broadcaster for the book availability feed (server-sent events).
+
+Every successful borrow and return (circulation.py) publishes a compact delta
+once its transaction commits:
+
+    id: 3f9a1c2e-42
+    event: availability
+    data: {"id":12,"available":false,"due_date":"2026-05-14"}
+
+async_views.availability_feed streams these to subscribed clients over ASGI.
+Event ids are resume tokens ("<boot>-<sequence>"): a client that reconnects with
+the Last-Event-ID header (EventSource sends it automatically) or ?last_event_id=
+first receives the events it missed, as long as they are still among the last
+AVAILABILITY_FEED_HISTORY events of this process. Otherwise (token too old, or
+issued before a restart) it receives a `reset` event and should re-fetch
+/api/books/ before applying further deltas. Borrower names are never sent.
+
+The broadcaster lives in the worker process: borrows/returns handled by another
+process are not seen by its subscribers. Serve the API with a single ASGI worker
+(e.g. `uvicorn backend.asgi:application`), so writes and the feed share it.
+"""
+import asyncio
+import json
+import threading
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+
+def _event(name, data, event_id=None):
+    """One SSE message, ready to be written to the stream."""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {name}", f"data: {json.dumps(data, separators=(',', ':'))}"]
+    return "\n".join(lines) + "\n\n"
+
+
+RESET_EVENT = _event('reset', {})
+
+
+class Subscription:
+    """The events waiting for one connected client (consumed on its event loop)."""
+
+    def __init__(self, broadcaster, loop, limit):
+        self.broadcaster = broadcaster
+        self.loop = loop
+        self.limit = limit
+        self.queue = asyncio.Queue()
+        self.missed = [] # Replayed before the live events
+        self.reset = False # The client must re-fetch the catalogue first
+        self.pending = 0 # Pushed but not yet consumed (the queue itself fills later, on the loop)
+        self.overflowed = False
+
+    def push(self, event):
+        """Called by AvailabilityBroadcaster.publish() (any thread, under its lock)."""
+        if self.overflowed:
+            return
+        if self.pending >= self.limit:
+            # The client does not keep up: end its stream with a reset, it reconnects
+            self.overflowed = True
+            event = None
+        self.pending += 1
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+        except RuntimeError: # The client's event loop is gone
+            self.broadcaster._subscribers.discard(self)
+
+    async def get(self):
+        """The next SSE message, or None when the stream must end with a reset."""
+        event = await self.queue.get()
+        with self.broadcaster._lock:
+            self.pending -= 1
+        return event
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+
+class AvailabilityBroadcaster:
+    """Fans out availability deltas to subscriptions and keeps recent ones for resuming."""
+
+    def __init__(self, history=1000):
+        self.boot = uuid.uuid4().hex[:8] # Tokens of an earlier process never match
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._history = deque(maxlen=max(1, history)) # (sequence, message)
+        self._subscribers = set()
+
+    def publish(self, data):
+        """Sends `data` (a JSON-serialisable dict) as an `availability` event; returns its id."""
+        with self._lock:
+            self._sequence += 1
+            event_id = f"{self.boot}-{self._sequence}"
+            message = _event('availability', data, event_id)
+            self._history.append((self._sequence, message))
+            # Pushed under the lock, so every subscriber gets the events in sequence order
+            for subscription in list(self._subscribers):
+                subscription.push(message)
+        return event_id
+
+    def _parse(self, token):
+        boot, _, sequence = (token or '').partition('-')
+        if boot != self.boot or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def subscribe(self, last_event_id=None):
+        """
+        Registers a client on the running event loop. The events it missed after
+        `last_event_id` are in subscription.missed; subscription.reset is set if
+        they cannot be replayed.
+        """
+        subscription = Subscription(self, asyncio.get_running_loop(), self._history.maxlen)
+        with self._lock:
+            # Registered and replayed under the lock: no event is missed or sent twice
+            self._subscribers.add(subscription)
+            if last_event_id:
+                sequence = self._parse(last_event_id)
+                oldest = self._history[0][0] if self._history else self._sequence + 1
+                if sequence is None or sequence > self._sequence or sequence < oldest - 1:
+                    subscription.reset = True
+                else:
+                    subscription.missed = [message for seq, message in self._history if seq > sequence]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """The process-wide broadcaster, sized by AVAILABILITY_FEED_HISTORY."""
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                _broadcaster = AvailabilityBroadcaster(getattr(settings, 'AVAILABILITY_FEED_HISTORY', 1000))
+    return _broadcaster
+
+
+def publish_availability(book):
+    """Publishes the book's new availability once the current transaction commits."""
+    data = {
+        'id': book.id,
+        'available': book.available,
+        'due_date': book.due_date.isoformat() if book.due_date else None,
+    }
+    transaction.on_commit(lambda: get_broadcaster().publish(data))
@@ -0,0 +1,99 @@
+"""
+Bulk catalogue writes for the librarian bulk endpoint (BookBulkView).
+
+Creates and updates are validated by BookSerializer(many=True) (see
+BookListSerializer) and written here with bulk_create/bulk_update, CHUNK_SIZE
+books per statement. Deletes run in chunks of CHUNK_SIZE ids, each in its own
+short transaction, so a large delete never holds its row locks for long.
+
+Creates and updates send no model signals, and deletes run with the per-book
+handlers muted (signals.bulk_book_delete()): each function refreshes the search
+index, assigns works and recounts their copies (works.py), drops the cached
+book responses, logs the changes for delta sync and (deletes) releases the
+borrowers' loan counters itself, like catalogue_import.py.
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from .change_log import record_book_changes
+from .circulation import release_loan_slots
+from .models import Book
+from .response_cache import invalidate_book_responses
+from .search import index_book_rows
+from .signals import bulk_book_delete
+from .works import KEY_FIELDS, assign_works, refresh_work_counts
+
+CHUNK_SIZE = 500
+MAX_BULK_BOOKS = 5000 # Books per bulk request
+SEARCH_FIELDS = ('title', 'author', 'isbn')
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _after_write(book_ids, work_ids, reindex=True):
+    if reindex:
+        index_book_rows(list(Book.objects.filter(id__in=book_ids).values('id', *SEARCH_FIELDS)))
+    refresh_work_counts(work_ids)
+    invalidate_book_responses()
+    record_book_changes(book_ids)
+
+
+def create_books(books, chunk_size=CHUNK_SIZE):
+    """Inserts unsaved Book instances (with unique ISBNs) and returns them with their ids."""
+    with transaction.atomic():
+        work_ids = assign_works(books)
+        for chunk in _chunks(books, chunk_size):
+            Book.objects.bulk_create(chunk)
+        # Not every backend returns the new ids from bulk_create (MySQL): read them by ISBN
+        ids = {}
+        for chunk in _chunks(books, chunk_size):
+            ids.update(Book.objects.filter(isbn__in=[book.isbn for book in chunk]).values_list('isbn', 'id'))
+        for book in books:
+            book.id = ids[book.isbn]
+        _after_write([book.id for book in books], work_ids)
+    return books
+
+
+def update_books(books, fields, chunk_size=CHUNK_SIZE):
+    """Writes `fields` of the given (modified) Book instances, one UPDATE per chunk."""
+    fields = list(fields)
+    with transaction.atomic():
+        work_ids = set()
+        if set(KEY_FIELDS).intersection(fields):
+            # Copies whose title, author or language changed move to another work
+            work_ids = {book.work_id for book in books} | assign_works(books)
+            fields.append('work')
+        if fields:
+            for chunk in _chunks(books, chunk_size):
+                Book.objects.bulk_update(chunk, fields)
+        _after_write([book.id for book in books], work_ids, reindex=bool(set(SEARCH_FIELDS).intersection(fields)))
+    return books
+
+
+def delete_books(book_ids, chunk_size=CHUNK_SIZE):
+    """Deletes the books with the given ids, chunk by chunk. Returns the ids that existed."""
+    deleted = []
+    for chunk in _chunks(sorted(set(book_ids)), chunk_size):
+        with transaction.atomic():
+            rows = list(
+                Book.objects.select_for_update().filter(id__in=chunk)
+                .values_list('id', 'available', 'borrower_id', 'work_id')
+            )
+            if not rows:
+                continue
+            found = [book_id for book_id, _, _, _ in rows]
+            # Books deleted while on loan no longer count against their borrowers
+            holders = Counter(borrower_id for _, available, borrower_id, _ in rows if borrower_id and not available)
+            if holders:
+                release_loan_slots(holders)
+            with bulk_book_delete(): # Search tokens go by CASCADE
+                Book.objects.filter(id__in=found).delete()
+            refresh_work_counts({work_id for _, _, _, work_id in rows})
+            invalidate_book_responses()
+            record_book_changes(found, deleted=True)
+        deleted.extend(found)
+    return deleted
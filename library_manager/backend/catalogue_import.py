@@ -0,0 +1,276 @@
+"""
+Bulk catalogue import (JSON array, NDJSON or CSV).
+
+Records are read as a stream, validated and written in batches: each batch is
+one ``INSERT ... ON CONFLICT (isbn) DO UPDATE`` (``ON DUPLICATE KEY UPDATE`` on
+MySQL) inside its own transaction, instead of two queries per book with
+update_or_create. Only catalogue fields are updated for existing books; loan
+state (available, borrower, dates) is never touched by an import.
+
+Used by seeds.py and `python manage.py import_books`.
+"""
+import csv
+import io
+import json
+import os
+import re
+import time
+
+from django.db import connection, transaction
+
+from .change_log import record_book_changes
+from .models import Book
+from .response_cache import invalidate_book_responses
+from .search import index_book_rows
+from .works import assign_works, refresh_work_counts
+
+DEFAULT_BATCH_SIZE = 1000
+FORMATS = ('json', 'ndjson', 'csv')
+
+# Columns written on insert and overwritten when the ISBN already exists
+UPDATE_FIELDS = [
+    'title', 'author', 'category', 'language', 'condition', 'image',
+    'storage_location', 'publisher', 'publication_year', 'copy_number', 'added_by', 'work',
+]
+DEFAULTS = {
+    'title': 'Unknown Title',
+    'author': 'Unknown Author',
+    'category': 'TXT',
+    'language': 'English',
+    'condition': 'GD',
+    'image': 'images/library_seal.jpg',
+    'copy_number': 1,
+}
+CATEGORY_CODES = {code for code, _ in Book.CATEGORIES}
+CONDITION_CODES = {code for code, _ in Book.CONDITIONS}
+
+_WHITESPACE_RE = re.compile(r"\s*")
+
+
+class ImportSummary:
+    """Counters of one import run."""
+
+    def __init__(self):
+        self.read = 0
+        self.created = 0
+        self.updated = 0
+        self.batches = 0
+        self.errors = [] # (record number, message)
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def skipped(self):
+        return len(self.errors)
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.read} records read, {self.created} created, {self.updated} updated, "
+            f"{self.skipped} skipped in {self.batches} batches "
+            f"({self.elapsed:.2f}s, {self.rows_per_second:,.0f} rows/s)"
+        )
+
+
+# --- Readers (each yields one dict per record without loading the whole file) ---
+
+def iter_json_records(fp, chunk_size=1 << 16):
+    """Yields the elements of a top-level JSON array, decoding it chunk by chunk."""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    state = 'start' # start -> first -> (value -> separator)* -> done
+
+    while True:
+        pos = _WHITESPACE_RE.match(buffer, pos).end()
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of JSON input: expected a complete array of books.")
+            chunk = fp.read(chunk_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+
+        char = buffer[pos]
+        if state == 'start':
+            if char != '[':
+                raise ValueError("Expected a JSON array of books.")
+            pos += 1
+            state = 'first'
+        elif state == 'separator' or (state == 'first' and char == ']'):
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or ']' in the JSON array, found {char!r}.")
+            pos += 1
+            state = 'value'
+        else:
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            if end is None or (end == len(buffer) and not eof):
+                # Incomplete value (or a number that may continue): read more and retry
+                chunk = fp.read(chunk_size)
+                buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+                continue
+            yield record
+            pos = end
+            state = 'separator'
+
+
+def iter_ndjson_records(fp):
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_csv_records(fp):
+    for row in csv.DictReader(fp):
+        # Empty cells mean "no value", like a missing JSON key
+        yield {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension == 'jsonl':
+        return 'ndjson'
+    if extension in FORMATS:
+        return extension
+    raise ValueError(f"Cannot tell the format of '{path}'; pass one of: {', '.join(FORMATS)}.")
+
+
+def iter_records(fp, file_format):
+    if file_format == 'json':
+        return iter_json_records(fp)
+    if file_format == 'ndjson':
+        return iter_ndjson_records(fp)
+    if file_format == 'csv':
+        return iter_csv_records(fp)
+    raise ValueError(f"Unsupported format '{file_format}'; use one of: {', '.join(FORMATS)}.")
+
+
+# --- Validation ---
+
+def _optional_int(record, field):
+    value = record.get(field)
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a whole number, got {value!r}.")
+
+
+def _text(record, field, max_length):
+    value = record.get(field, DEFAULTS.get(field))
+    if value is None:
+        return None
+    value = str(value).strip()
+    if len(value) > max_length:
+        raise ValueError(f"{field} is longer than {max_length} characters.")
+    return value
+
+
+def clean_record(record, added_by=None):
+    """Validates one raw record and returns the field values of its Book. Raises ValueError."""
+    if not isinstance(record, dict):
+        raise ValueError("Record is not an object.")
+    isbn = _text(record, 'isbn', 13)
+    if not isbn:
+        raise ValueError("Missing ISBN.")
+    category = record.get('category', DEFAULTS['category'])
+    if category not in CATEGORY_CODES:
+        raise ValueError(f"Unknown category {category!r}.")
+    condition = record.get('condition', DEFAULTS['condition'])
+    if condition not in CONDITION_CODES:
+        raise ValueError(f"Unknown condition {condition!r}.")
+    copy_number = _optional_int(record, 'copy_number')
+
+    return {
+        'isbn': isbn,
+        'title': _text(record, 'title', 200) or DEFAULTS['title'],
+        'author': _text(record, 'author', 200) or DEFAULTS['author'],
+        'category': category,
+        'language': _text(record, 'language', 50) or DEFAULTS['language'],
+        'condition': condition,
+        'image': _text(record, 'image', 100) or DEFAULTS['image'],
+        'storage_location': _text(record, 'storage_location', 200),
+        'publisher': _text(record, 'publisher', 200),
+        'publication_year': _optional_int(record, 'publication_year'),
+        'copy_number': DEFAULTS['copy_number'] if copy_number is None else copy_number,
+        'added_by': added_by,
+    }
+
+
+# --- Writing ---
+
+def _write_batch(books, summary):
+    """Upserts one batch (a dict isbn -> field values) in a single statement."""
+    isbns = list(books)
+    with transaction.atomic():
+        existing = dict(Book.objects.filter(isbn__in=isbns).values_list('isbn', 'work_id'))
+        instances = [Book(**values) for values in books.values()]
+        work_ids = assign_works(instances)
+        # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target (it uses any unique key)
+        unique_fields = ['isbn'] if connection.features.supports_update_conflicts_with_target else None
+        Book.objects.bulk_create(
+            instances,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=UPDATE_FIELDS,
+        )
+        # bulk_create sends no post_save signals: refresh the search tokens of the batch,
+        # recount the copies of the works involved, drop the cached book responses and
+        # log the changes for delta sync
+        rows = list(Book.objects.filter(isbn__in=isbns).values('id', 'title', 'author', 'isbn'))
+        index_book_rows(rows)
+        refresh_work_counts(work_ids | set(existing.values()))
+        invalidate_book_responses()
+        record_book_changes([row['id'] for row in rows])
+    summary.created += len(isbns) - len(existing)
+    summary.updated += len(existing)
+    summary.batches += 1
+
+
+def import_records(records, added_by=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Imports an iterable of raw records in batches and returns an ImportSummary.
+    Invalid records are skipped and listed in summary.errors. `progress`, if given,
+    is called with the summary after every batch.
+    """
+    summary = ImportSummary()
+    batch = {}
+    for number, record in enumerate(records, start=1):
+        summary.read += 1
+        try:
+            values = clean_record(record, added_by=added_by)
+        except ValueError as e:
+            summary.errors.append((number, str(e)))
+            continue
+        batch.pop(values['isbn'], None) # A repeated ISBN within a batch: the last one wins
+        batch[values['isbn']] = values
+        if len(batch) >= batch_size:
+            _write_batch(batch, summary)
+            batch = {}
+            summary.elapsed = time.perf_counter() - summary.started
+            if progress:
+                progress(summary)
+    if batch:
+        _write_batch(batch, summary)
+    summary.elapsed = time.perf_counter() - summary.started
+    if progress and batch:
+        progress(summary)
+    return summary
+
+
+def import_books(path, file_format=None, added_by=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Imports books from a JSON/NDJSON/CSV file (format taken from the extension by default)."""
+    file_format = file_format or detect_format(path)
+    with io.open(path, 'r', encoding='utf-8', newline='' if file_format == 'csv' else None) as fp:
+        return import_records(iter_records(fp, file_format), added_by=added_by,
+                              batch_size=max(1, batch_size), progress=progress)
@@ -0,0 +1,91 @@
+"""
+Catalogue change log for delta sync (GET /api/books/changes/?since=<token>).
+
+Every write to a book appends a BookChange row (book id + created/updated or
+deleted) in the same transaction:
+
+- Book save/delete through the ORM: signals.py
+- borrow/return (QuerySet.update(), no signals): circulation.py
+- bulk imports (bulk_create, no signals): catalogue_import.py
+- user renames/deletions, which change the usernames shown in books: signals.py
+
+Other writes that bypass the model signals must call record_book_changes().
+
+Change tokens are BookChange ids. A client stores the `next_since` of its last
+sync and asks for everything after it; it then re-reads the listed books and
+drops the deleted ones. Entries name books, not field values, so one entry per
+book is enough: compact_book_changes() deletes every entry superseded by a newer
+one of the same book. Tombstones (deletions) are kept, one per deleted book, so
+every token ever handed out stays valid and no client has to start over.
+
+Ids are assigned at INSERT but become visible at COMMIT, so a transaction that
+commits late can add an entry below a token already returned. Entries younger
+than BOOK_CHANGE_SETTLE_SECONDS are therefore held back from clients; entries
+are written last in their transactions to keep that window small.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import BookChange
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1000
+
+
+def record_book_changes(book_ids, deleted=False):
+    """Logs that the given books were created/updated (or deleted)."""
+    kind = BookChange.DELETE if deleted else BookChange.UPSERT
+    now = timezone.now()
+    BookChange.objects.bulk_create(
+        [BookChange(book_id=book_id, kind=kind, changed_at=now) for book_id in dict.fromkeys(book_ids)]
+    )
+
+
+def _settle_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'BOOK_CHANGE_SETTLE_SECONDS', 2))
+
+
+def changes_since(since, limit=DEFAULT_LIMIT):
+    """
+    The changes after token `since`: (updated book ids, deleted book ids, next
+    token, has_more). At most `limit` log entries are read; a book that changed
+    several times is listed once, with its last change.
+    """
+    entries = list(
+        BookChange.objects.filter(id__gt=since).order_by('id').values_list('id', 'book_id', 'kind', 'changed_at')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Stop at the first entry that is too young: the tokens below it may still fill up
+    cutoff = _settle_cutoff()
+    for position, (_, _, _, changed_at) in enumerate(entries):
+        if changed_at > cutoff:
+            entries = entries[:position]
+            has_more = False
+            break
+
+    latest = {} # book id -> kind of its last change, in log order
+    for _, book_id, kind, _ in entries:
+        latest.pop(book_id, None)
+        latest[book_id] = kind
+    updated = [book_id for book_id, kind in latest.items() if kind == BookChange.UPSERT]
+    deleted = [book_id for book_id, kind in latest.items() if kind == BookChange.DELETE]
+    next_since = entries[-1][0] if entries else since
+    return updated, deleted, next_since, has_more
+
+
+def compact_book_changes(batch_size=1000):
+    """Deletes the entries superseded by a newer entry of the same book; returns how many."""
+    superseded = BookChange.objects.filter(
+        Exists(BookChange.objects.filter(book_id=OuterRef('book_id'), id__gt=OuterRef('id')))
+    ).order_by('id').values_list('id', flat=True)
+    removed = 0
+    while True:
+        ids = list(superseded[:batch_size])
+        if not ids:
+            return removed
+        removed += BookChange.objects.filter(id__in=ids).delete()[0]
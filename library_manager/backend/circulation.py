@@ -0,0 +1,521 @@
+"""
+Borrow and return transactions.
+
+Both operations claim the book with a single conditional UPDATE
+(``... WHERE id = %s AND available = TRUE``) so that two concurrent requests can
+never both succeed; the row is only read again when the UPDATE matched nothing,
+to explain why. The borrow limit is enforced the same way on the borrower's
+UserProfile.active_loans counter (``... SET active_loans = active_loans + 1
+WHERE active_loans < MAX_BORROW_LIMIT``) in the same transaction, so no COUNT
+query is needed and parallel borrows of the same user cannot overshoot it.
+
+borrow_books()/return_books() handle a whole stack of books (circulation desk):
+the referenced rows are locked with one SELECT ... FOR UPDATE, the borrow limit
+is checked once for the batch on the locked profile row, and the books are
+updated with one set-based UPDATE. Each item succeeds or fails on its own.
+
+borrow_work() lends any free copy of a title (models.Work): it picks one with
+the (work, available) index and claims it like borrow_book().
+
+Holds (models.Hold) queue patrons for a title with no free copy. place_hold()
+takes the next position from Work.last_hold_position, and a returned copy is
+lent to the head of the queue in the return's transaction (_lend_to_next_hold())
+instead of going back on the shelf. Positions are never renumbered: placing,
+cancelling and serving a hold cost the same on any queue length. Both lock the
+Work row first, so a hold is never left waiting next to a free copy. While a
+title has holds, only patrons holding it can borrow its copies directly
+(_take_hold_turn()).
+
+Each successful borrow/return is appended to the loan ledger (models.Loan) and
+the change log (change_log.py) in its transaction, moves the available_copies
+counter of the book's work (works.py), and is published to the
+availability feed (availability_feed.py) after commit.
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.http import Http404
+from rest_framework import status
+
+from .availability_feed import publish_availability
+from .change_log import record_book_changes
+from .models import Book, Hold, Loan, UserProfile, Work
+from .pagination import iter_keyset_batches
+from .response_cache import invalidate_book_responses
+from .works import adjust_available_copies
+
+# Define the borrow limit constant
+MAX_BORROW_LIMIT = 3
+LOAN_PERIOD = timedelta(weeks=2) # Standard 2-week loan
+MAX_BATCH_SIZE = 50 # Books per batch borrow/return request
+CLAIM_ATTEMPTS = 5 # Copies tried by borrow_work() before giving up
+RESERVED_FOR_HOLDS = 'This title is reserved for patrons on hold. Place a hold to join the queue.'
+
+
+class CirculationError(Exception):
+    """A borrow/return request that cannot be fulfilled. Views turn it into an error response."""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _get_book_or_404(book_id):
+    book = Book.objects.select_related('added_by', 'borrower').filter(id=book_id).first()
+    if book is None:
+        raise Http404("No Book matches the given query.")
+    return book
+
+
+def _reserve_loan_slot(user_id):
+    """Counts one more loan against the user's active_loans, unless the limit is reached."""
+    reserved = UserProfile.objects.filter(user_id=user_id, active_loans__lt=MAX_BORROW_LIMIT).update(
+        active_loans=F('active_loans') + 1
+    )
+    if not reserved and not UserProfile.objects.filter(user_id=user_id).exists():
+        # Users created without a profile (e.g. createsuperuser) get one on their first borrow,
+        # counting their loans including the book just claimed
+        loans = Book.objects.filter(borrower_id=user_id, available=False).count()
+        _, created = UserProfile.objects.get_or_create(user_id=user_id, defaults={'active_loans': loans})
+        if created:
+            reserved = loans <= MAX_BORROW_LIMIT
+        else: # Created concurrently
+            reserved = UserProfile.objects.filter(user_id=user_id, active_loans__lt=MAX_BORROW_LIMIT).update(
+                active_loans=F('active_loans') + 1
+            )
+    if not reserved:
+        raise CirculationError(f'Borrow limit reached. You cannot borrow more than {MAX_BORROW_LIMIT} books.')
+
+
+def _release_loan_slot(user_id):
+    UserProfile.objects.filter(user_id=user_id, active_loans__gt=0).update(active_loans=F('active_loans') - 1)
+
+
+def _claim_book(user, book_id, today, due_date):
+    """The conditional UPDATE that lends the book if it is still available; returns 1 or 0."""
+    return Book.objects.filter(id=book_id, available=True).update(
+        available=False,
+        borrower=user,
+        borrow_date=today,
+        due_date=due_date,
+    )
+
+
+def _take_hold_turn(user_id, work_id):
+    """
+    While patrons wait for a title, its copies are theirs: a direct borrow is
+    refused unless the borrower holds the title too, and uses up their hold.
+    """
+    if work_id is None or not Hold.objects.filter(work_id=work_id).exists(): # hold_queue_idx
+        return
+    if not Hold.objects.filter(work_id=work_id, user_id=user_id).delete()[0]:
+        raise CirculationError(RESERVED_FOR_HOLDS)
+
+
+def _complete_borrow(user, book_id, due_date):
+    """The rest of a borrow once the book is claimed. Returns the updated Book."""
+    book = _get_book_or_404(book_id)
+    # Raising rolls the claim back
+    _take_hold_turn(user.pk, book.work_id)
+    # Check borrow limit. The profile row stays locked until commit, so
+    # parallel borrows by the same user queue up here.
+    _reserve_loan_slot(user.pk)
+
+    Loan.objects.create(book_id=book_id, user_id=user.pk, action=Loan.BORROW, due_date=due_date)
+    invalidate_book_responses() # The claim bypasses the Book signals
+    record_book_changes([book_id])
+    adjust_available_copies({book.work_id: -1})
+    publish_availability(book)
+    return book
+
+
+def borrow_book(user, book_id):
+    """
+    Lends the book to `user` and returns the updated Book.
+    Raises Http404 for unknown books and CirculationError if the book is already
+    out or the user reached MAX_BORROW_LIMIT.
+    """
+    today = date.today()
+    due_date = today + LOAN_PERIOD
+    with transaction.atomic():
+        if not _claim_book(user, book_id, today, due_date):
+            book = _get_book_or_404(book_id)
+            due_date_str = book.due_date.strftime("%Y-%m-%d") if book.due_date else "an unknown date"
+            borrower_name = book.borrower.username if book.borrower else "another user"
+            raise CirculationError(
+                f'Book is currently unavailable. Borrowed by {borrower_name} and due back around {due_date_str}.'
+            )
+        return _complete_borrow(user, book_id, due_date)
+
+
+def borrow_work(user, work_id):
+    """
+    Lends any available copy of the work (title) to `user` and returns that Book.
+    Raises Http404 for unknown works and CirculationError if no copy is free or
+    the user reached MAX_BORROW_LIMIT.
+    """
+    today = date.today()
+    due_date = today + LOAN_PERIOD
+    candidates = Book.objects.filter(work_id=work_id, available=True).order_by('id') # book_work_avail_idx
+    if connection.features.has_select_for_update_skip_locked:
+        # Parallel borrowers of the same title each get a different copy instead of queueing
+        candidates = candidates.select_for_update(skip_locked=True)
+    with transaction.atomic():
+        for _ in range(CLAIM_ATTEMPTS):
+            book_id = candidates.values_list('id', flat=True).first()
+            if book_id is None:
+                break
+            # Without SKIP LOCKED a concurrent borrower may win this copy: try the next one
+            if _claim_book(user, book_id, today, due_date):
+                return _complete_borrow(user, book_id, due_date)
+    if not Work.objects.filter(id=work_id).exists():
+        raise Http404("No Work matches the given query.")
+    raise CirculationError('No copy of this title is currently available.')
+
+
+def return_book(user, book_id, is_admin_or_librarian=False):
+    """
+    Marks the book as returned and returns the updated Book. Regular users can
+    only return their own loans; admins and librarians can return any book.
+    """
+    with transaction.atomic():
+        loans = Book.objects.filter(id=book_id, available=False)
+        if is_admin_or_librarian:
+            # Lock the loan to learn whose counter goes down
+            borrower_ids = list(loans.select_for_update().values_list('borrower_id', flat=True))
+            borrower_id = borrower_ids[0] if borrower_ids else None
+        else:
+            loans = loans.filter(borrower=user)
+            borrower_id = user.pk
+        returned = loans.update(available=True, borrower=None, borrow_date=None, due_date=None)
+
+        if not returned:
+            book = _get_book_or_404(book_id)
+            if book.available:
+                raise CirculationError('Book is already available.')
+            raise CirculationError('You did not borrow this book.', status.HTTP_403_FORBIDDEN)
+
+        if borrower_id is not None:
+            _release_loan_slot(borrower_id)
+        Loan.objects.create(book_id=book_id, user_id=borrower_id, action=Loan.RETURN)
+        invalidate_book_responses() # The update bypasses the Book signals
+        record_book_changes([book_id])
+        book = _get_book_or_404(book_id)
+        _lock_works([book.work_id])
+        if _lend_to_next_hold(book_id, book.work_id) is None:
+            adjust_available_copies({book.work_id: 1})
+        else: # Lent again: the work's counter stays as it was
+            book = _get_book_or_404(book_id)
+        publish_availability(book)
+        return book
+
+
+# ============================== #
+# HOLDS                          #
+# ============================== #
+
+def place_hold(user, work_id):
+    """
+    Queues `user` for the next returned copy of the work (title) and returns the Hold.
+    Raises Http404 for unknown works and CirculationError if a copy is available
+    or the user already holds the title.
+    """
+    with transaction.atomic():
+        # Takes the next position of the queue. The work row stays locked until
+        # commit, so concurrent holds on the title get consecutive positions.
+        queued = Work.objects.filter(id=work_id, available_copies=0).update(
+            last_hold_position=F('last_hold_position') + 1
+        )
+        if not queued:
+            if not Work.objects.filter(id=work_id).exists():
+                raise Http404("No Work matches the given query.")
+            raise CirculationError('A copy of this title is available. Borrow it instead.')
+        position = Work.objects.filter(id=work_id).values_list('last_hold_position', flat=True).get()
+        try:
+            with transaction.atomic():
+                return Hold.objects.create(work_id=work_id, user_id=user.pk, position=position)
+        except IntegrityError: # unique_user_hold
+            raise CirculationError('You already have a hold on this title.')
+
+
+def cancel_hold(user, hold_id, is_admin_or_librarian=False):
+    """
+    Deletes a hold (one DELETE; the positions behind it are left as they are).
+    Regular users can only cancel their own holds; admins and librarians any.
+    """
+    holds = Hold.objects.filter(id=hold_id)
+    if not is_admin_or_librarian:
+        holds = holds.filter(user_id=user.pk)
+    deleted, _ = holds.delete()
+    if not deleted:
+        raise Http404("No Hold matches the given query.")
+
+
+def _lock_works(work_ids):
+    """
+    Locks the Work rows (in id order) before their hold queues are read:
+    place_hold() updates the same row, so a hold is either committed before
+    the queue is read or sees the returned copy counted as available.
+    """
+    work_ids = sorted(work_id for work_id in set(work_ids) if work_id is not None)
+    if work_ids:
+        list(Work.objects.select_for_update().filter(id__in=work_ids).order_by('id').values_list('id', flat=True))
+
+
+def _lend_to_next_hold(book_id, work_id):
+    """
+    Lends a copy returned in the current transaction (its Work row locked with
+    _lock_works()) to the first hold of its work whose patron is below
+    MAX_BORROW_LIMIT, and deletes that hold. Patrons at the limit keep their
+    place. Returns the new borrower's id, or None if nobody in the queue can
+    take the copy.
+    """
+    if work_id is None:
+        return None
+    today = date.today()
+    due_date = today + LOAN_PERIOD
+    position = 0
+    while True:
+        # The first hold behind `position` whose patron can borrow: the database
+        # walks hold_queue_idx and skips the patrons at the limit
+        hold = (
+            Hold.objects.select_for_update()
+            .filter(work_id=work_id, position__gt=position)
+            .exclude(user__profile__active_loans__gte=MAX_BORROW_LIMIT)
+            .order_by('position').values_list('id', 'user_id', 'position').first()
+        )
+        if hold is None:
+            return None
+        hold_id, user_id, position = hold
+        try:
+            with transaction.atomic(): # The claim is undone if the patron is at the limit
+                # The returned row is still locked by this transaction: no one else can claim it
+                Book.objects.filter(id=book_id).update(
+                    available=False, borrower_id=user_id, borrow_date=today, due_date=due_date,
+                )
+                _reserve_loan_slot(user_id)
+        except CirculationError: # Reached the limit meanwhile
+            continue
+        Loan.objects.create(book_id=book_id, user_id=user_id, action=Loan.BORROW, due_date=due_date)
+        Hold.objects.filter(id=hold_id).delete()
+        return user_id
+
+
+# ============================== #
+# BATCH BORROW / RETURN          #
+# ============================== #
+
+def _lock_books(references):
+    """
+    Locks the referenced books (ints are book ids, strings ISBNs) with a single
+    SELECT ... FOR UPDATE, in id order so that concurrent batches cannot
+    deadlock. Returns {reference: row} for the books that exist.
+    """
+    ids = [reference for reference in references if isinstance(reference, int)]
+    isbns = [reference for reference in references if isinstance(reference, str)]
+    rows = (
+        Book.objects.select_for_update().filter(Q(id__in=ids) | Q(isbn__in=isbns))
+        .order_by('id').values('id', 'isbn', 'available', 'borrower_id', 'due_date', 'work_id')
+    )
+    found = {}
+    for row in rows:
+        found[row['id']] = found[row['isbn']] = row
+    return found
+
+
+def _batch_outcomes(references, rows, check):
+    """
+    Pairs every reference with its locked row and the CirculationError that
+    `check(row)` reports for it (None if the item can proceed). Unknown books
+    and books listed twice fail here.
+    """
+    outcomes, seen = [], set()
+    for reference in references:
+        row = rows.get(reference)
+        if row is None:
+            error = CirculationError("No Book matches the given query.", status.HTTP_404_NOT_FOUND)
+        elif row['id'] in seen:
+            error = CirculationError('Book is listed more than once in this request.')
+        else:
+            seen.add(row['id'])
+            error = check(row)
+        outcomes.append([reference, row, error])
+    return outcomes
+
+
+def _reserve_loan_slots(user, count):
+    """
+    Counts up to `count` more loans against the user's active_loans, within
+    MAX_BORROW_LIMIT, and returns how many were granted. The profile row stays
+    locked until commit, like in _reserve_loan_slot().
+    """
+    profile, _ = UserProfile.objects.select_for_update().get_or_create(
+        user_id=user.pk,
+        # Users created without a profile (e.g. createsuperuser) get one, counting their loans
+        defaults={'active_loans': lambda: Book.objects.filter(borrower_id=user.pk, available=False).count()},
+    )
+    granted = max(0, min(count, MAX_BORROW_LIMIT - profile.active_loans))
+    if granted:
+        UserProfile.objects.filter(pk=profile.pk).update(active_loans=F('active_loans') + granted)
+    return granted
+
+
+def release_loan_slots(returned_per_user):
+    """Takes {user_id: returned loans} off the users' active_loans in one UPDATE (never below 0)."""
+    whens = []
+    for user_id, returned in returned_per_user.items():
+        whens.append(When(user_id=user_id, active_loans__gte=returned, then=F('active_loans') - returned))
+        whens.append(When(user_id=user_id, then=Value(0)))
+    UserProfile.objects.filter(user_id__in=returned_per_user).update(active_loans=Case(*whens))
+
+
+def _finish_batch(outcomes, book_ids, available_delta):
+    """
+    Logs the changed books, moves their works' available_copies by `available_delta`
+    each and replaces the rows of the outcomes by the updated Books.
+    """
+    invalidate_book_responses() # The update bypasses the Book signals
+    record_book_changes(book_ids)
+    books = Book.objects.select_related('added_by', 'borrower').in_bulk(book_ids)
+    # Returned copies lent again to a hold (return_books()) do not move the counter
+    per_work = Counter(book.work_id for book in books.values() if book.available == (available_delta > 0))
+    adjust_available_copies({work_id: count * available_delta for work_id, count in per_work.items()})
+    for outcome in outcomes:
+        outcome[1] = books.get(outcome[1]['id']) if outcome[2] is None else None
+    for book_id in book_ids:
+        publish_availability(books[book_id])
+    return [tuple(outcome) for outcome in outcomes]
+
+
+def _check_available(row):
+    if row['available']:
+        return None
+    due_date_str = row['due_date'].strftime("%Y-%m-%d") if row['due_date'] else "an unknown date"
+    return CirculationError(f'Book is currently unavailable. Due back around {due_date_str}.')
+
+
+def borrow_books(user, references):
+    """
+    Lends a batch of books (book ids or ISBNs) to `user` in one transaction.
+    Returns one (reference, book, error) tuple per reference, in order: the
+    updated Book and None on success, None and a CirculationError otherwise.
+    Books beyond the user's MAX_BORROW_LIMIT fail, the ones before them do not.
+    Copies of titles with holds go to their holders only, one per hold (as in
+    _take_hold_turn()).
+    """
+    today = date.today()
+    due_date = today + LOAN_PERIOD
+    with transaction.atomic():
+        rows = _lock_books(references)
+        outcomes = _batch_outcomes(references, rows, _check_available)
+
+        claims = [outcome for outcome in outcomes if outcome[2] is None]
+        waiting = set()
+        if claims:
+            waiting = set(
+                Hold.objects.filter(work_id__in={outcome[1]['work_id'] for outcome in claims})
+                .order_by().values_list('work_id', flat=True).distinct()
+            )
+        if waiting:
+            turns = set(Hold.objects.filter(user_id=user.pk, work_id__in=waiting).values_list('work_id', flat=True))
+            for outcome in claims:
+                work_id = outcome[1]['work_id']
+                if work_id not in waiting:
+                    continue
+                if work_id in turns:
+                    turns.discard(work_id)
+                else:
+                    outcome[2] = CirculationError(RESERVED_FOR_HOLDS)
+            claims = [outcome for outcome in claims if outcome[2] is None]
+
+        granted = _reserve_loan_slots(user, len(claims)) # The only limit check of the batch
+        for outcome in claims[granted:]:
+            outcome[2] = CirculationError(
+                f'Borrow limit reached. You cannot borrow more than {MAX_BORROW_LIMIT} books.'
+            )
+        book_ids = [outcome[1]['id'] for outcome in claims[:granted]]
+        if not book_ids:
+            return [tuple(outcome) for outcome in outcomes]
+        used_holds = {outcome[1]['work_id'] for outcome in claims[:granted]} & waiting
+        if used_holds:
+            Hold.objects.filter(user_id=user.pk, work_id__in=used_holds).delete()
+
+        # The rows are locked: every one of them is still available
+        Book.objects.filter(id__in=book_ids).update(
+            available=False,
+            borrower=user,
+            borrow_date=today,
+            due_date=due_date,
+        )
+        Loan.objects.bulk_create([
+            Loan(book_id=book_id, user_id=user.pk, action=Loan.BORROW, due_date=due_date) for book_id in book_ids
+        ])
+        return _finish_batch(outcomes, book_ids, -1)
+
+
+def return_books(user, references, is_admin_or_librarian=False):
+    """
+    Returns a batch of books (book ids or ISBNs) in one transaction, with the
+    same rules and result format as return_book() and borrow_books().
+    """
+    def check(row):
+        if row['available']:
+            return CirculationError('Book is already available.')
+        if not is_admin_or_librarian and row['borrower_id'] != user.pk:
+            return CirculationError('You did not borrow this book.', status.HTTP_403_FORBIDDEN)
+        return None
+
+    with transaction.atomic():
+        outcomes = _batch_outcomes(references, _lock_books(references), check)
+        returned = [outcome[1] for outcome in outcomes if outcome[2] is None]
+        if not returned:
+            return [tuple(outcome) for outcome in outcomes]
+
+        book_ids = [row['id'] for row in returned]
+        Book.objects.filter(id__in=book_ids).update(available=True, borrower=None, borrow_date=None, due_date=None)
+        borrower_ids = [row['borrower_id'] for row in returned if row['borrower_id'] is not None]
+        if borrower_ids:
+            release_loan_slots(Counter(borrower_ids))
+        Loan.objects.bulk_create([
+            Loan(book_id=row['id'], user_id=row['borrower_id'], action=Loan.RETURN) for row in returned
+        ])
+        work_ids = {row['work_id'] for row in returned}
+        _lock_works(work_ids)
+        # One query tells which titles have holds; only their copies are looked at one by one
+        waiting = set(
+            Hold.objects.filter(work_id__in=work_ids).order_by().values_list('work_id', flat=True).distinct()
+        )
+        for row in returned:
+            if row['work_id'] in waiting:
+                _lend_to_next_hold(row['id'], row['work_id'])
+        return _finish_batch(outcomes, book_ids, 1)
+
+
+def reconcile_active_loans(dry_run=False, batch_size=1000):
+    """
+    Recomputes UserProfile.active_loans from the books on loan and fixes the
+    profiles whose counter drifted (unless `dry_run`). Returns the drifted
+    profiles as (user_id, stored, actual) tuples.
+    """
+    drift = []
+    profiles = UserProfile.objects.order_by('user_id').values('user_id', 'active_loans')
+    for batch in iter_keyset_batches(profiles, batch_size):
+        user_ids = [row['user_id'] for row in batch]
+        actual = dict(
+            Book.objects.filter(borrower_id__in=user_ids, available=False)
+            .order_by().values('borrower_id').annotate(n=Count('id')).values_list('borrower_id', 'n')
+        )
+        changed = [
+            (row['user_id'], row['active_loans'], actual.get(row['user_id'], 0))
+            for row in batch if row['active_loans'] != actual.get(row['user_id'], 0)
+        ]
+        if changed and not dry_run:
+            with transaction.atomic():
+                for user_id, stored, loans in changed:
+                    # Only if unchanged meanwhile: a concurrent borrow/return already moved it
+                    UserProfile.objects.filter(user_id=user_id, active_loans=stored).update(active_loans=loans)
+        drift.extend(changed)
+    return drift
@@ -1,16 +1,249 @@
+"""
+Pooled MySQL connections for code that talks to MySQL directly (outside the ORM).
+
+get_db_connection() used to open a new connection (TCP handshake, authentication,
+session setup) on every call. It now checks a connection out of a process-wide
+pool; close() hands it back instead of disconnecting. Returned connections are
+rolled back and their session reset (transactions, snapshots, session variables,
+locks), or closed if that fails; a wrapper dropped without close() returns its
+connection when it is garbage collected. Idle connections are health-checked
+(ping) before reuse and replaced when they went stale.
+
+Settings (all optional):
+    DB_POOL_SIZE      connections kept per process (default 5)
+    DB_POOL_TIMEOUT   seconds to wait for a free connection (default 5)
+    DB_POOL_MAX_IDLE  seconds after which an idle connection is closed (default 300)
+
+The ORM does not use this pool: its connections persist per thread for
+CONN_MAX_AGE seconds (see DATABASES in settings.py).
+"""
+import threading
+import time
+import weakref
+from queue import Empty, LifoQueue
+
 import mysql.connector
 from mysql.connector import Error
 
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'SotfwareUser',
+    'database': 'library',
+}
+
+
+class PoolTimeout(Error):
+    """No connection became free within the pool's timeout."""
+
+
+def open_db_connection():
+    """A new, unpooled connection (what get_db_connection() did before the pool)."""
+    return mysql.connector.connect(**DB_CONFIG)
+
+
+def _is_healthy(connection):
+    try:
+        connection.ping(reconnect=False)
+        return True
+    except Exception:
+        return False
+
+
+def _reset_session(connection):
+    """Ends any open transaction and resets the session state of a returned connection."""
+    connection.rollback()
+    reset = getattr(connection, 'reset_session', None)
+    if reset is not None:
+        reset() # COM_RESET_CONNECTION: session variables, temporary tables, locks
+
+
+class ConnectionPool:
+    """
+    A fixed-size, thread-safe pool. Connections are created on demand up to
+    `size`; when all are checked out, acquire() waits up to `timeout` seconds.
+    """
+
+    def __init__(self, connect, size=5, timeout=5.0, max_idle=300.0, health_check=_is_healthy,
+                 reset=_reset_session):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._health_check = health_check
+        self._reset = reset
+        self._idle = LifoQueue() # (connection, released at); LIFO keeps the warm ones in use
+        self._lock = threading.Lock()
+        self._created = 0
+        # Metrics
+        self.checkouts = 0
+        self.waits = 0 # Checkouts that had to wait for a release
+        self.timeouts = 0
+        self.discarded = 0 # Connections closed as stale or broken
+        self.reclaimed = 0 # Connections returned by garbage collection (close() was never called)
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _reserve_new(self):
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return True
+        return False
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created -= 1
+            self.discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Checks out a connection, wrapped so that close() returns it to the pool."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        while True:
+            try:
+                connection, released_at = self._idle.get_nowait()
+            except Empty:
+                if self._reserve_new():
+                    try:
+                        connection = self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    break
+                remaining = deadline - time.monotonic()
+                waited = True
+                try:
+                    if remaining <= 0:
+                        raise Empty
+                    connection, released_at = self._idle.get(timeout=remaining)
+                except Empty:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise PoolTimeout(msg=f"No database connection became free within {self.timeout}s.")
+
+            if time.monotonic() - released_at > self.max_idle or not self._health_check(connection):
+                self._discard(connection)
+                continue
+            break
+
+        wait = time.monotonic() - started
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            if waited:
+                self.waits += 1
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        """Takes a connection back; one that cannot be reset is closed instead of reused."""
+        try:
+            self._reset(connection)
+        except Exception:
+            self._discard(connection)
+            return
+        self._idle.put((connection, time.monotonic()))
+
+    def _reclaim(self, connection):
+        with self._lock:
+            self.reclaimed += 1
+        self.release(connection)
+
+    def close_all(self):
+        """Closes the idle connections (checked-out ones are closed when released)."""
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except Empty:
+                return
+            self._discard(connection)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'open': self._created,
+                'idle': self._idle.qsize(),
+                'in_use': self._created - self._idle.qsize(),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'discarded': self.discarded,
+                'reclaimed': self.reclaimed,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
+
+
+class PooledConnection:
+    """
+    Proxy of a checked-out connection; close() (or leaving a with block) returns
+    it to the pool, and so does garbage collection of a proxy never closed.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        # Holds the pool and connection, not the proxy: runs once the proxy is collected
+        self._finalizer = weakref.finalize(self, pool._reclaim, connection)
+        self._finalizer.atexit = False
+
+    def __getattr__(self, name):
+        connection = self.__dict__.get('_connection')
+        if connection is None:
+            raise Error(msg="Connection was returned to the pool.")
+        return getattr(connection, name)
+
+    def close(self):
+        self._connection = None
+        detached = self._finalizer.detach() # None after the first close()
+        if detached is not None:
+            _, _, (connection,), _ = detached
+            self._pool.release(connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool, sized from the DB_POOL_* settings on first use."""
+    global _pool
+    if _pool is None:
+        from django.conf import settings
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    open_db_connection,
+                    size=getattr(settings, 'DB_POOL_SIZE', 5),
+                    timeout=getattr(settings, 'DB_POOL_TIMEOUT', 5.0),
+                    max_idle=getattr(settings, 'DB_POOL_MAX_IDLE', 300.0),
+                )
+    return _pool
+
+
+def db_pool_stats():
+    """Pool metrics for the monitoring API (None until the pool is first used)."""
+    return _pool.stats() if _pool is not None else None
+
+
 def get_db_connection():
+    """A pooled connection (call close() to hand it back), or None if MySQL cannot be reached."""
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='SotfwareUser',
-            database='library'
-        )
-        if connection.is_connected():
-            return connection
+        return get_pool().acquire()
     except Error as e:
         print(f"Error while connecting to MySQL: {e}")
-        return None
\ No newline at end of file
+        return None
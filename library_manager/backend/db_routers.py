@@ -0,0 +1,153 @@
+"""
+Read-replica routing.
+
+Only the read-only catalogue and user listing views (ReplicaReadMixin:
+BookListCreateView/BookDetailView GETs, BookExportView, UserListView) send their
+queries to a replica; everything else (borrow/return, registration, profile
+updates, authentication, permission checks) reads and writes the primary
+('default'). Replicas are the aliases listed in DATABASE_REPLICAS.
+
+Read-your-writes: any write during a request pins the rest of that request to
+the primary, and ReplicaRoutingMiddleware sets a short-lived cookie so the
+client's next requests (REPLICA_PIN_SECONDS, which should exceed the replication
+lag) read from the primary too.
+
+Local setup with two SQLite files:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+        'TEST': {'MIRROR': 'default'}, # Tests read the primary through this alias
+    }
+    DATABASE_REPLICAS = ['replica']
+then `python manage.py migrate --database=replica` and copy the primary file over
+the replica file to "replicate".
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PIN_COOKIE = 'primary_pin'
+
+
+class RoutingState:
+    """Routing decisions of one request."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned # The client wrote recently: read from the primary
+        self.wrote = False # This request wrote: read from the primary from now on
+        self.replica_reads = False # Set by ReplicaReadMixin while a listing view runs
+
+
+_state = ContextVar('backend_replica_routing', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def reading_from_replica():
+    """True if reads of the current request go to a replica."""
+    state = _state.get()
+    return bool(
+        state is not None and state.replica_reads and not state.pinned and not state.wrote and replicas()
+    )
+
+
+def set_replica_reads(enabled):
+    """Switches replica reads of the current request on or off (no-op outside ReplicaRoutingMiddleware)."""
+    state = _state.get()
+    if state is not None:
+        state.replica_reads = enabled
+
+
+def read_alias():
+    """The alias the current request reads from (for querysets evaluated after the view returns)."""
+    if reading_from_replica():
+        return random.choice(replicas())
+    return 'default'
+
+
+class PrimaryReplicaRouter:
+    """DATABASE_ROUTERS entry. Returning None leaves the decision to Django ('default')."""
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return random.choice(replicas())
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        aliases = {'default', *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks writes per request and pins clients that just wrote to the primary.
+    Runs natively under WSGI and ASGI (no thread hop for async views).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(state, response)
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(state, response)
+
+    def _pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    For read-only API views: the queries of GET/HEAD handlers go to a replica.
+    Authentication and permission checks (initial()) still read the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            set_replica_reads(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        set_replica_reads(False)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,102 @@
+"""
+Benchmarks BookSerializer(many=True) against BookFastListSerializer.
+
+Usage:
+    python manage.py benchmark_book_serializer                # 10k and 100k books
+    python manage.py benchmark_book_serializer --sizes 5000 --repeat 3
+
+Synthetic books are inserted inside a transaction that is rolled back at the end,
+so the command can be pointed at a development database without leaving data behind.
+"""
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from backend.models import Book
+from backend.serializers import BookSerializer, BookFastListSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Measures rows/second of the regular and the fast-path book list serializers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000],
+                            help="Catalogue sizes to benchmark (default: 10000 100000).")
+        parser.add_argument('--repeat', type=int, default=1,
+                            help="Runs per size; the best run is reported.")
+        parser.add_argument('--username', default=None,
+                            help="Serialize as this user (default: anonymous).")
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/api/books/')
+        if options['username']:
+            try:
+                request.user = User.objects.select_related('profile').get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['username']}' does not exist.")
+        else:
+            request.user = AnonymousUser()
+        context = {'request': request}
+        renderer = JSONRenderer()
+
+        for size in options['sizes']:
+            with transaction.atomic():
+                self._create_books(size)
+                queryset = Book.objects.order_by('id')
+
+                slow_time, slow_json = self._best_of(options['repeat'], lambda: renderer.render(
+                    BookSerializer(queryset.select_related('added_by', 'borrower'), many=True, context=context).data))
+                fast_time, fast_json = self._best_of(options['repeat'], lambda: renderer.render(
+                    BookFastListSerializer(queryset, context=context).data))
+
+                identical = "identical" if slow_json == fast_json else "DIFFERENT"
+                self.stdout.write(
+                    f"{size:>8} books | BookSerializer: {size / slow_time:>10,.0f} rows/s ({slow_time:.2f}s) | "
+                    f"BookFastListSerializer: {size / fast_time:>10,.0f} rows/s ({fast_time:.2f}s) | "
+                    f"speed-up x{slow_time / fast_time:.1f} | output {identical}"
+                )
+                transaction.set_rollback(True) # Leave the database untouched
+
+    def _best_of(self, repeat, func):
+        best, result = None, None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def _create_books(self, size):
+        """Inserts `size` books, a third of them borrowed with assorted due dates."""
+        borrower = User.objects.create_user(username=f"bench_borrower_{time.time_ns()}")
+        today = date.today()
+        categories = [code for code, _ in Book.CATEGORIES]
+        conditions = [code for code, _ in Book.CONDITIONS]
+        books = []
+        for i in range(size):
+            borrowed = i % 3 == 0
+            books.append(Book(
+                title=f"Benchmark Book {i}",
+                author=f"Author {i % 997}",
+                isbn=f"B{i:012d}",
+                category=categories[i % len(categories)],
+                language="English",
+                condition=conditions[i % len(conditions)],
+                image=f"static/images/covers/cover_{i % 47}.jpg",
+                available=not borrowed,
+                borrower=borrower if borrowed else None,
+                borrow_date=today - timedelta(days=i % 20) if borrowed else None,
+                due_date=today + timedelta(days=(i % 29) - 14) if borrowed else None,
+                publisher="Benchmark Press",
+                publication_year=1950 + i % 70,
+                copy_number=1 + i % 3,
+            ))
+        Book.objects.bulk_create(books, batch_size=2000)
@@ -0,0 +1,137 @@
+"""
+Benchmarks requests/second with per-request connections against persistent and
+pooled connections.
+
+Usage:
+    python manage.py benchmark_db_connections                       # ORM only
+    python manage.py benchmark_db_connections --direct              # also get_db_connection()
+    python manage.py benchmark_db_connections --requests 5000 --threads 4
+
+"orm" simulates the request cycle Django runs for every HTTP request
+(request_started, one query, request_finished) with CONN_MAX_AGE=0, i.e. a new
+connection per request, and then with --max-age (default: the configured
+CONN_MAX_AGE, or 60). "direct" compares a fresh mysql.connector connection per
+request with a checkout from the pool in backend/db_config.py.
+
+Run it against MySQL: with SQLite opening a connection costs next to nothing.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from mysql.connector import Error
+
+from backend import db_config
+
+
+class Command(BaseCommand):
+    help = "Measures requests/second with per-request, persistent (CONN_MAX_AGE) and pooled DB connections."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Simulated requests per run (default: 2000).")
+        parser.add_argument('--threads', type=int, default=1, help="Concurrent workers (default: 1).")
+        parser.add_argument('--max-age', type=int, default=None,
+                            help="CONN_MAX_AGE of the persistent run (default: the configured value, or 60).")
+        parser.add_argument('--direct', action='store_true',
+                            help="Also benchmark get_db_connection() against fresh mysql.connector connections.")
+
+    def handle(self, *args, **options):
+        total, threads = max(1, options['requests']), max(1, options['threads'])
+        max_age = options['max_age']
+        if max_age is None:
+            max_age = connection.settings_dict.get('CONN_MAX_AGE') or 60
+
+        self.stdout.write(f"{total} requests, {threads} thread(s), database: {connection.vendor}")
+        baseline = self._orm_run("orm: new connection per request", 0, total, threads)
+        persistent = self._orm_run(f"orm: CONN_MAX_AGE={max_age}", max_age, total, threads)
+        self._speedup(baseline, persistent)
+
+        if options['direct']:
+            try:
+                fresh = self._run("direct: fresh connection", self._fresh_request, total, threads)
+                pool = db_config.get_pool()
+                pooled = self._run(f"direct: pool of {pool.size}", self._pooled_request, total, threads)
+            except Error as e:
+                self.stdout.write(self.style.WARNING(f"Skipping the direct benchmark, MySQL not reachable: {e}"))
+            else:
+                self._speedup(fresh, pooled)
+                self.stdout.write(f"pool stats: {pool.stats()}")
+
+    # --- Runs ---
+
+    def _run(self, label, request, total, threads, cleanup=None):
+        def worker(count):
+            try:
+                for _ in range(count):
+                    request()
+            finally:
+                if cleanup:
+                    cleanup()
+
+        shares = [total // threads + (1 if i < total % threads else 0) for i in range(threads)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for future in [executor.submit(worker, share) for share in shares]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else float('inf')
+        self.stdout.write(f"{label:<40} {rate:>10,.0f} req/s ({elapsed:.2f}s)")
+        return rate
+
+    def _orm_run(self, label, max_age, total, threads):
+        opened = []
+        lock = threading.Lock()
+
+        def count_connection(sender, **kwargs):
+            with lock:
+                opened.append(1)
+
+        connections.close_all()
+        saved_max_age = connection.settings_dict.get('CONN_MAX_AGE', 0)
+        connection_created.connect(count_connection)
+        connection.settings_dict['CONN_MAX_AGE'] = max_age # Shared by the connections of all threads
+        try:
+            rate = self._run(label, self._orm_request, total, threads, cleanup=connections.close_all)
+        finally:
+            connection.settings_dict['CONN_MAX_AGE'] = saved_max_age
+            connection_created.disconnect(count_connection)
+            connections.close_all()
+        self.stdout.write(f"{'':<40} {len(opened):>10,} connections opened")
+        return rate
+
+    def _speedup(self, before, after):
+        self.stdout.write(self.style.SUCCESS(f"{'speed-up':<40} {after / before:>10.2f}x"))
+
+    # --- One simulated request each ---
+
+    def _orm_request(self):
+        # Same signals as a real request: request_finished closes connections past CONN_MAX_AGE
+        request_started.send(sender=self.__class__)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+        finally:
+            request_finished.send(sender=self.__class__)
+
+    @staticmethod
+    def _query(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        cursor.close()
+
+    def _fresh_request(self):
+        conn = db_config.open_db_connection()
+        try:
+            self._query(conn)
+        finally:
+            conn.close()
+
+    def _pooled_request(self):
+        with db_config.get_pool().acquire() as conn:
+            self._query(conn)
@@ -0,0 +1,29 @@
+"""
+Compacts the catalogue change log behind /api/books/changes/.
+
+Usage:
+    python manage.py compact_book_changes
+    python manage.py compact_book_changes --batch-size 5000
+
+Keeps only the newest entry of each book (tombstones of deleted books included),
+so the log never holds more rows than there are book ids. Change tokens issued
+before a compaction stay valid. Safe to run at any time, e.g. nightly from cron.
+"""
+from django.core.management.base import BaseCommand
+
+from backend.change_log import compact_book_changes
+from backend.models import BookChange
+
+
+class Command(BaseCommand):
+    help = "Deletes change log entries superseded by a newer entry of the same book."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Entries deleted per statement (default: 1000).")
+
+    def handle(self, *args, **options):
+        removed = compact_book_changes(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {removed} superseded entries, {BookChange.objects.count()} left."
+        ))
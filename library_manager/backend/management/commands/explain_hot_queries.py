@@ -0,0 +1,127 @@
+"""
+Runs EXPLAIN on the hot Book (and loan ledger) queries and fails if any of them falls back to a
+full table scan.
+
+Usage:
+    python manage.py explain_hot_queries            # verdict per query
+    python manage.py explain_hot_queries --plans    # also print the plans
+
+Supported backends: MySQL (access_type ALL), SQLite (a bare "SCAN <table>") and
+PostgreSQL ("Seq Scan"). Query planners on MySQL and PostgreSQL prefer full scans
+on tiny tables, so point the command at a database with realistic data (and fresh
+statistics, e.g. ANALYZE TABLE) before trusting a failure there.
+"""
+import json
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from backend.models import Book, BookSearchToken, Hold, Loan, UserProfile, Work
+from backend.pagination import get_ordering_keys, keyset_filter, ordering_expressions
+from backend.search import prefix_q
+
+SQLITE_FULL_SCAN_RE = re.compile(r"\bSCAN (?:TABLE )?(\w+)(?: AS \w+)?\s*$", re.MULTILINE)
+POSTGRES_FULL_SCAN_RE = re.compile(r"\bSeq Scan on (\w+)")
+
+
+def _mysql_full_scans(node):
+    """Walks an EXPLAIN FORMAT=JSON document for tables read with access_type ALL."""
+    tables = []
+    if isinstance(node, dict):
+        if node.get('access_type') == 'ALL':
+            tables.append(node.get('table_name', '?'))
+        for value in node.values():
+            tables.extend(_mysql_full_scans(value))
+    elif isinstance(node, list):
+        for value in node:
+            tables.extend(_mysql_full_scans(value))
+    return tables
+
+
+def find_full_scans(vendor, plan):
+    """Names of the tables a query plan reads with a full table scan."""
+    if vendor == 'mysql':
+        return _mysql_full_scans(json.loads(plan))
+    if vendor == 'sqlite':
+        return SQLITE_FULL_SCAN_RE.findall(plan)
+    if vendor == 'postgresql':
+        return POSTGRES_FULL_SCAN_RE.findall(plan)
+    raise CommandError(f"EXPLAIN checks are not implemented for the '{vendor}' backend.")
+
+
+def _keyset_page(ordering, values, size=21, queryset=None):
+    """A 'next page' query of the book list (or `queryset`), as KeysetPagination builds it."""
+    queryset = (Book.objects.all() if queryset is None else queryset).order_by(*ordering)
+    keys = get_ordering_keys(queryset)
+    return queryset.order_by(*ordering_expressions(keys)).filter(keyset_filter(keys, values))[:size]
+
+
+def hot_queries():
+    """
+    (label, queryset) pairs mirroring the queries issued by the views. ?available=
+    on its own is left out: it matches most of the catalogue, so a scan is the right plan.
+    """
+    user_id = 1 # Plans do not depend on the value
+    now = timezone.now()
+    borrowed = Book.objects.filter(available=False, borrower__isnull=False)
+    return [
+        ("borrow: claim book", Book.objects.filter(id=1, available=True)),
+        ("borrow: reserve loan slot", UserProfile.objects.filter(user_id=user_id, active_loans__lt=3)),
+        ("loans of a user", Book.objects.filter(borrower_id=user_id, available=False)),
+        ("return: own loan", Book.objects.filter(id=1, available=False, borrower_id=user_id)),
+        ("my borrowed books", Book.objects.filter(borrower_id=user_id, available=False).order_by('due_date')),
+        ("borrowed report: borrowers", borrowed.values('borrower_id')),
+        ("borrowed report: books of a page", borrowed.filter(borrower_id__in=[1, 2, 3]).order_by(
+            'borrower__username', 'borrower_id', 'due_date', 'id')),
+        ("filter: category", Book.objects.filter(category='SF')),
+        ("filter: category + available", Book.objects.filter(category='SF', available=True)),
+        ("filter: language", Book.objects.filter(language='English')),
+        ("filter: language + available", Book.objects.filter(language='English', available=True)),
+        ("filter: condition", Book.objects.filter(condition='GD')),
+        ("filter: all four", Book.objects.filter(category='SF', language='English', available=True, condition='GD')),
+        ("list: keyset page by title", _keyset_page(['title'], ['M', 1])),
+        ("list: keyset page by author", _keyset_page(['author'], ['M', 1])),
+        ("list: keyset page by id", _keyset_page(['id'], [1])),
+        ("search: token prefix", BookSearchToken.objects.filter(prefix_q('tolk')).values('book_id')),
+        ("ledger: book history page", _keyset_page(['-id'], [1000], 51, Loan.objects.filter(book_id=1))),
+        ("ledger: user history page", _keyset_page(['-id'], [1000], 51, Loan.objects.filter(user_id=user_id))),
+        ("ledger: date range page", _keyset_page(['-created_at', '-id'], [now, 1000], 51, Loan.objects.filter(
+            created_at__gte=now - timedelta(days=30), created_at__lt=now))),
+        ("titles: keyset page by title", _keyset_page(['title'], ['M', 1], queryset=Work.objects.filter(copy_count__gt=0))),
+        ("titles: category + available", Work.objects.filter(category='SF', available_copies__gt=0)),
+        ("borrow title: free copy", Book.objects.filter(work_id=1, available=True).order_by('id')[:1]),
+        ("return: first hold that can borrow", Hold.objects.filter(work_id=1, position__gt=0).exclude(
+            user__profile__active_loans__gte=3).order_by('position')[:1]),
+        ("borrow: title has holds", Hold.objects.filter(work_id=1)[:1]),
+        ("my holds", Hold.objects.filter(user_id=user_id).order_by('created_at', 'id')),
+    ]
+
+
+class Command(BaseCommand):
+    help = "EXPLAINs the hot Book queries and exits with an error if any does a full table scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plans', action='store_true', help="Print every query plan.")
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        explain_options = {'format': 'json'} if vendor == 'mysql' else {}
+        failures = []
+
+        for label, queryset in hot_queries():
+            plan = queryset.explain(**explain_options)
+            full_scans = find_full_scans(vendor, plan)
+            if full_scans:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {label} ({', '.join(full_scans)})"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok         {label}"))
+            if options['plans']:
+                self.stdout.write(plan)
+                self.stdout.write("")
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries fall back to a full table scan: {', '.join(failures)}")
@@ -0,0 +1,54 @@
+"""
+Imports books from a JSON array, NDJSON or CSV file (see backend/catalogue_import.py).
+
+Usage:
+    python manage.py import_books backend/books_data.json
+    python manage.py import_books books.csv --batch-size 5000 --added-by AdminUser
+    python manage.py import_books export.txt --format ndjson
+
+Existing books (same ISBN) get their catalogue fields updated; loans are left alone.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.catalogue_import import DEFAULT_BATCH_SIZE, FORMATS, import_books
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Bulk-imports (upserts by ISBN) books from a JSON, NDJSON or CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import.")
+        parser.add_argument('--format', choices=FORMATS, default=None,
+                            help="File format (default: taken from the file extension).")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f"Books written per statement/transaction (default: {DEFAULT_BATCH_SIZE}).")
+        parser.add_argument('--added-by', default=None, help="Username recorded as 'added_by'.")
+        parser.add_argument('--show-errors', type=int, default=20,
+                            help="How many skipped records to list (default: 20).")
+
+    def handle(self, *args, **options):
+        added_by = None
+        if options['added_by']:
+            added_by = User.objects.filter(username=options['added_by']).first()
+            if added_by is None:
+                raise CommandError(f"User '{options['added_by']}' does not exist.")
+
+        def progress(summary):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"  batch {summary.batches}: {summary.read} records, "
+                                  f"{summary.rows_per_second:,.0f} rows/s")
+
+        try:
+            summary = import_books(options['path'], file_format=options['format'], added_by=added_by,
+                                   batch_size=options['batch_size'], progress=progress)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Import failed: {e}")
+
+        for number, message in summary.errors[:options['show_errors']]:
+            self.stdout.write(self.style.WARNING(f"  skipped record {number}: {message}"))
+        if summary.skipped > options['show_errors']:
+            self.stdout.write(self.style.WARNING(f"  ... and {summary.skipped - options['show_errors']} more"))
+        self.stdout.write(self.style.SUCCESS(f"Imported {summary}"))
@@ -0,0 +1,109 @@
+"""
+Compares the throughput of the book read endpoints served over WSGI (the DRF
+views, one thread per concurrent request) and over ASGI (the async views in
+backend/async_views.py, all requests on one event loop).
+
+Usage:
+    python manage.py loadtest_read_endpoints --username admin
+    python manage.py loadtest_read_endpoints --username admin --requests 2000 --concurrency 50
+    python manage.py loadtest_read_endpoints --username admin --with-cache
+
+Requests go through Django's in-process handlers (test Client / AsyncClient), so
+the numbers cover middleware, views, ORM and serialization but no HTTP server.
+By default the book response cache is disabled so every request reaches the
+database; pass --with-cache to measure cached responses instead. For numbers
+with real servers, run e.g. `gunicorn --threads 8 backend.wsgi` and
+`uvicorn backend.asgi:application` against the same database and point an HTTP
+load generator at both.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from backend.models import Book
+
+
+class Command(BaseCommand):
+    help = "Measures requests/second of the book list/detail/borrowed endpoints over WSGI and ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="User the requests are made as.")
+        parser.add_argument('--requests', type=int, default=500, help="Requests per endpoint and run (default: 500).")
+        parser.add_argument('--concurrency', type=int, default=20, help="Requests in flight (default: 20).")
+        parser.add_argument('--with-cache', action='store_true', help="Keep the book response cache enabled.")
+
+    def handle(self, *args, **options):
+        try:
+            self.user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist.")
+        book = Book.objects.order_by('id').first()
+        if book is None:
+            raise CommandError("The catalogue is empty; import some books first (manage.py import_books).")
+
+        total, concurrency = max(1, options['requests']), max(1, options['concurrency'])
+        endpoints = [
+            ("book list", reverse('book-list-create')),
+            ("book list (page)", reverse('book-list-create') + '?page_size=20'),
+            ("book detail", reverse('book-detail', kwargs={'id': book.id})),
+            ("borrowed books", reverse('borrowed-books-list')),
+        ]
+        cache_timeout = {} if options['with_cache'] else {'BOOK_RESPONSE_CACHE_TIMEOUT': 0}
+
+        self.stdout.write(
+            f"{total} requests per endpoint, concurrency {concurrency}, user {self.user.username}, "
+            f"response cache {'on' if options['with_cache'] else 'off'}, database: {connections['default'].vendor}"
+        )
+        # ALLOWED_HOSTS: the test clients send Host: testserver
+        with override_settings(ALLOWED_HOSTS=['*'], **cache_timeout):
+            for label, url in endpoints:
+                wsgi = self._wsgi_run(url, total, concurrency)
+                asgi = asyncio.run(self._asgi_run(url, total, concurrency))
+                self.stdout.write(
+                    f"{label:<20} WSGI {wsgi:>8,.0f} req/s   ASGI {asgi:>8,.0f} req/s   "
+                    + self.style.SUCCESS(f"{asgi / wsgi:.2f}x")
+                )
+
+    def _report(self, started, total):
+        elapsed = time.perf_counter() - started
+        return total / elapsed if elapsed else float('inf')
+
+    def _check(self, response, url):
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} answered {response.status_code}: {response.content[:200]!r}")
+
+    def _wsgi_run(self, url, total, concurrency):
+        def worker(count):
+            client = Client()
+            client.force_login(self.user)
+            try:
+                for _ in range(count):
+                    self._check(client.get(url), url)
+            finally:
+                connections.close_all() # The worker thread's connections
+
+        shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(worker, share) for share in shares if share]:
+                future.result()
+        return self._report(started, total)
+
+    async def _asgi_run(self, url, total, concurrency):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with slots:
+                self._check(await client.get(url), url)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return self._report(started, total)
@@ -0,0 +1,30 @@
+"""
+Rebuilds the book search token index (see backend/search.py).
+
+Usage:
+    python manage.py rebuild_search_index
+    python manage.py rebuild_search_index --batch-size 5000
+
+Needed after writes that bypass model signals: bulk_create/bulk imports,
+QuerySet.update() of title/author/isbn, or loaddata.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the token index used by ?search_mode=index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Books reindexed per transaction (default: 1000).")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = rebuild_index(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {total} books in {time.perf_counter() - start:.2f}s."
+        ))
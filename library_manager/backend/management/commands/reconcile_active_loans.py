@@ -0,0 +1,33 @@
+"""
+Recomputes UserProfile.active_loans from the books currently on loan.
+
+Usage:
+    python manage.py reconcile_active_loans            # fix drifted counters
+    python manage.py reconcile_active_loans --dry-run  # only report them
+
+Counters can drift after writes that bypass backend/circulation.py and the Book
+signals (QuerySet.update() on loan fields, raw SQL, loaddata).
+"""
+from django.core.management.base import BaseCommand
+
+from backend.circulation import reconcile_active_loans
+
+
+class Command(BaseCommand):
+    help = "Recomputes the per-user active loan counters and reports drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Profiles checked per query (default: 1000).")
+
+    def handle(self, *args, **options):
+        drift = reconcile_active_loans(dry_run=options['dry_run'], batch_size=max(1, options['batch_size']))
+        for user_id, stored, actual in drift:
+            self.stdout.write(f"user {user_id}: active_loans {stored} -> {actual}")
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("All active loan counters are correct."))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} counters drifted (dry run, nothing changed)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drift)} drifted counters."))
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:45
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A frozen copy of the tokenizer in backend/search.py as of this migration, so
+# that later changes to it do not change what this backfill writes
+TOKEN_RE = re.compile(r"\w+")
+ISBN_HYPHEN_RE = re.compile(r"(?<=\d)[-\s](?=\d)")
+MAX_TOKEN_LENGTH = 64
+FIELD_WEIGHTS = (
+    ('isbn', 5),
+    ('title', 3),
+    ('author', 2),
+)
+
+
+def book_tokens(book):
+    """Maps each token of a values() dict to its weight."""
+    tokens = {}
+    for field, weight in FIELD_WEIGHTS:
+        text = book[field]
+        if not text:
+            continue
+        text = ISBN_HYPHEN_RE.sub('', str(text).lower())
+        for token in TOKEN_RE.findall(text):
+            token = token[:MAX_TOKEN_LENGTH]
+            tokens[token] = max(tokens.get(token, 0), weight)
+    return tokens
+
+
+def index_existing_books(apps, schema_editor):
+    """Backfills the search index for the books that already exist."""
+    Book = apps.get_model('backend', 'Book')
+    BookSearchToken = apps.get_model('backend', 'BookSearchToken')
+    tokens = []
+    for book in Book.objects.order_by('id').values('id', 'title', 'author', 'isbn').iterator(chunk_size=1000):
+        tokens.extend(
+            BookSearchToken(book_id=book['id'], token=token, weight=weight)
+            for token, weight in book_tokens(book).items()
+        )
+        if len(tokens) >= 5000:
+            BookSearchToken.objects.bulk_create(tokens)
+            tokens = []
+    BookSearchToken.objects.bulk_create(tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='backend.book')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('token', 'book'), name='unique_book_search_token')],
+            },
+        ),
+        migrations.RunPython(index_existing_books, migrations.RunPython.noop),
+    ]
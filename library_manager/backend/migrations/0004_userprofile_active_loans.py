@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:56
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_active_loans(apps, schema_editor):
+    """Initialises the counters from the books currently on loan."""
+    Book = apps.get_model('backend', 'Book')
+    UserProfile = apps.get_model('backend', 'UserProfile')
+    loans = (
+        Book.objects.filter(borrower_id=OuterRef('user_id'), available=False)
+        .order_by().values('borrower_id').annotate(n=Count('id')).values('n')
+    )
+    UserProfile.objects.update(
+        active_loans=Coalesce(Subquery(loans, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0003_book_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='active_loans',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_active_loans, migrations.RunPython.noop),
+    ]
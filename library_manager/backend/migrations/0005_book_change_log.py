@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def log_existing_books(apps, schema_editor):
+    """One entry per existing book, so that syncing from token 0 returns the whole catalogue."""
+    Book = apps.get_model('backend', 'Book')
+    BookChange = apps.get_model('backend', 'BookChange')
+    now = django.utils.timezone.now()
+    last_id = 0
+    while True:
+        ids = list(Book.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:1000])
+        if not ids:
+            break
+        BookChange.objects.bulk_create([BookChange(book_id=book_id, changed_at=now) for book_id in ids])
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0004_userprofile_active_loans'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('book_id', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('U', 'Created or updated'), ('D', 'Deleted')], default='U', max_length=1)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book_id', 'id'], name='book_change_book_idx')],
+            },
+        ),
+        migrations.RunPython(log_existing_books, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0005_book_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Loan',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('book_id', models.BigIntegerField()),
+                ('user_id', models.IntegerField(blank=True, null=True)),
+                ('action', models.CharField(choices=[('B', 'Borrowed'), ('R', 'Returned')], max_length=1)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('due_date', models.DateField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book_id', 'id'], name='loan_book_history_idx'), models.Index(fields=['user_id', 'id'], name='loan_user_history_idx'), models.Index(fields=['created_at', 'id'], name='loan_created_at_idx')],
+            },
+        ),
+    ]
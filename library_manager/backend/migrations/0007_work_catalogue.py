@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def group_copies_into_works(apps, schema_editor):
+    """One work per distinct title/author/language of the existing books, with its counters."""
+    Book = apps.get_model('backend', 'Book')
+    Work = apps.get_model('backend', 'Work')
+    keys = (
+        Book.objects.order_by('title', 'author', 'language').values('title', 'author', 'language')
+        .annotate(category=Max('category'), publisher=Max('publisher'),
+                  publication_year=Max('publication_year'), image=Max('image'))
+    )
+    batch = []
+    for key in keys.iterator(chunk_size=1000):
+        key['category'] = key['category'] or ''
+        key['image'] = key['image'] or ''
+        batch.append(Work(**key))
+        if len(batch) == 1000:
+            Work.objects.bulk_create(batch, ignore_conflicts=True) # Case-insensitive duplicates on MySQL
+            batch = []
+    Work.objects.bulk_create(batch, ignore_conflicts=True)
+
+    Book.objects.update(work_id=Subquery(
+        Work.objects.filter(
+            title=OuterRef('title'), author=OuterRef('author'), language=OuterRef('language'),
+        ).values('id')[:1]
+    ))
+    copies = Book.objects.filter(work_id=OuterRef('id')).order_by().values('work_id')
+    Work.objects.update(
+        copy_count=Coalesce(Subquery(copies.annotate(n=Count('id')).values('n')), 0),
+        available_copies=Coalesce(Subquery(copies.filter(available=True).annotate(n=Count('id')).values('n')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0006_loan_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Work',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('author', models.CharField(max_length=200)),
+                ('language', models.CharField(max_length=50)),
+                ('category', models.CharField(blank=True, default='', max_length=3)),
+                ('publisher', models.CharField(blank=True, max_length=200, null=True)),
+                ('publication_year', models.IntegerField(blank=True, null=True)),
+                ('image', models.CharField(blank=True, default='', max_length=100)),
+                ('copy_count', models.PositiveIntegerField(default=0)),
+                ('available_copies', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['title', 'id'], name='work_title_id_idx'), models.Index(fields=['author', 'id'], name='work_author_id_idx'), models.Index(fields=['category', 'available_copies'], name='work_category_avail_idx')],
+                'constraints': [models.UniqueConstraint(fields=('title', 'author', 'language'), name='unique_work_key')],
+            },
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='work',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='copies', to='backend.work'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['work', 'available'], name='book_work_avail_idx'),
+        ),
+        migrations.RunPython(group_copies_into_works, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings # Import settings to reference the AUTH_USER_MODEL
+from django.utils import timezone
 
 # Removed the old People model
 
@@ -25,6 +26,9 @@ class UserProfile(models.Model):
     age = models.IntegerField(null=True, blank=True)
     # Add an avatar field (optional)
     avatar = models.ImageField(upload_to='avatars/', default='avatars/default.svg', null=True, blank=True)
+    # Books currently on loan to the user. Kept in step by backend/circulation.py (and the Book
+    # signals for direct saves) so the borrow limit needs no COUNT; see `manage.py reconcile_active_loans`.
+    active_loans = models.PositiveIntegerField(default=0)
 
     # Removed name, email, password, numberbooks (handled by User model or derived)
 
@@ -32,6 +36,43 @@ class UserProfile(models.Model):
         # Use the related user's username for representation
         return f"{self.user.username}'s Profile ({self.get_type_display()})"
 
+class Work(models.Model):
+    """
+    A title in the catalogue: the copies (Book rows) that share title, author and
+    language. copy_count and available_copies are kept in step with the copies
+    by backend/works.py (Book signals, circulation, bulk writes), so the title
+    catalogue (/api/works/) is one query on this table. The descriptive fields
+    are those of the last saved copy.
+    """
+    title = models.CharField(max_length=200)
+    author = models.CharField(max_length=200)
+    language = models.CharField(max_length=50)
+    category = models.CharField(max_length=3, blank=True, default='')
+    publisher = models.CharField(max_length=200, blank=True, null=True)
+    publication_year = models.IntegerField(blank=True, null=True)
+    image = models.CharField(max_length=100, blank=True, default='')
+    copy_count = models.PositiveIntegerField(default=0)
+    available_copies = models.PositiveIntegerField(default=0)
+    # Position of the newest hold on this title; the next one gets last_hold_position + 1
+    last_hold_position = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # The grouping key of the copies (also the lookup index of backend/works.py)
+            models.UniqueConstraint(fields=['title', 'author', 'language'], name='unique_work_key'),
+        ]
+        indexes = [
+            # Keyset pages of the title catalogue ordered by title/author (id is the tie-breaker)
+            models.Index(fields=['title', 'id'], name='work_title_id_idx'),
+            models.Index(fields=['author', 'id'], name='work_author_id_idx'),
+            # ?category= combined with ?available=
+            models.Index(fields=['category', 'available_copies'], name='work_category_avail_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.available_copies}/{self.copy_count})"
+
+
 class Book(models.Model):
     CATEGORIES = [
         ('CK', 'Cooking'),
@@ -77,7 +118,17 @@ class Book(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        related_name='borrowed_books' # User.borrowed_books gives books borrowed by this user
+        related_name='borrowed_books', # User.borrowed_books gives books borrowed by this user
+        db_index=False, # Covered by book_borrower_loans_idx (borrower, available, due_date)
+    )
+    # The title this book is a copy of; assigned from title/author/language (backend/works.py)
+    work = models.ForeignKey(
+        Work,
+        on_delete=models.PROTECT, # A title cannot be deleted while it still has copies
+        null=True,
+        blank=True,
+        related_name='copies',
+        db_index=False, # Covered by book_work_avail_idx (work, available)
     )
     borrow_date = models.DateField(null=True, blank=True)
     storage_location = models.CharField(max_length=200, blank=True, null=True)
@@ -87,7 +138,133 @@ class Book(models.Model):
 
     # Removed the old 'user' field which pointed to People
 
+    class Meta:
+        # Composite indexes for the hot queries (checked by `manage.py explain_hot_queries`)
+        indexes = [
+            # Borrow-limit count and a user's loans: borrower=?, available=False ORDER BY due_date
+            models.Index(fields=['borrower', 'available', 'due_date'], name='book_borrower_loans_idx'),
+            # Librarian report: available=False grouped by borrower, then due_date; ?available= filter
+            models.Index(fields=['available', 'borrower', 'due_date'], name='book_available_loans_idx'),
+            # ?category= / ?language= / ?condition= filters, alone or combined with ?available=
+            models.Index(fields=['category', 'available'], name='book_category_avail_idx'),
+            models.Index(fields=['language', 'available'], name='book_language_avail_idx'),
+            models.Index(fields=['condition', 'available'], name='book_condition_avail_idx'),
+            # Keyset pages of the list ordered by title/author (id is the tie-breaker)
+            models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+            models.Index(fields=['author', 'id'], name='book_author_id_idx'),
+            # Borrowing a title: any available copy of the work
+            models.Index(fields=['work', 'available'], name='book_work_avail_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+class BookSearchToken(models.Model):
+    """
+    One word of a book's title/author/ISBN: the inverted index behind ?search_mode=index.
+    Maintained by the Book signals (backend/signals.py), see backend/search.py.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            # Also the lookup index: prefix range scans on token, with book_id covered
+            models.UniqueConstraint(fields=['token', 'book'], name='unique_book_search_token'),
+        ]
 
+    def __str__(self):
+        return f"{self.token} -> {self.book_id}"
+
+
+class BookChange(models.Model):
+    """
+    One entry of the catalogue change log behind /api/books/changes/ (see
+    backend/change_log.py): book `book_id` was created/updated or deleted.
+    The id is the change token clients sync from.
+    """
+    UPSERT = 'U'
+    DELETE = 'D'
+    KINDS = [
+        (UPSERT, 'Created or updated'),
+        (DELETE, 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    book_id = models.BigIntegerField() # No foreign key: entries outlive deleted books (tombstones)
+    kind = models.CharField(max_length=1, choices=KINDS, default=UPSERT)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Compaction: the newest entry of each book
+            models.Index(fields=['book_id', 'id'], name='book_change_book_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.get_kind_display()} {self.book_id}"
+
+
+class Loan(models.Model):
+    """
+    One entry of the append-only loan ledger: a borrow or a return, written by
+    backend/circulation.py in the same transaction. Rows are never updated or
+    deleted, and outlive the books and users they name (plain ids, no foreign
+    keys, which also keeps inserts free of constraint checks).
+    """
+    BORROW = 'B'
+    RETURN = 'R'
+    ACTIONS = [
+        (BORROW, 'Borrowed'),
+        (RETURN, 'Returned'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    book_id = models.BigIntegerField()
+    user_id = models.IntegerField(null=True, blank=True) # The borrower (None: a loan without one)
+    action = models.CharField(max_length=1, choices=ACTIONS)
+    created_at = models.DateTimeField(default=timezone.now)
+    due_date = models.DateField(null=True, blank=True) # Borrows only
+
+    class Meta:
+        # One index per history query, each ending in id for keyset pagination
+        indexes = [
+            models.Index(fields=['book_id', 'id'], name='loan_book_history_idx'),
+            models.Index(fields=['user_id', 'id'], name='loan_user_history_idx'),
+            models.Index(fields=['created_at', 'id'], name='loan_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()} book {self.book_id} ({self.user_id}) at {self.created_at:%Y-%m-%d}"
+
+
+class Hold(models.Model):
+    """
+    A patron waiting for a copy of a title. The holds of a work form a FIFO queue
+    in position order: a returned copy is lent to the first one in the same
+    transaction, and the hold is deleted (see backend/circulation.py). Positions
+    are never renumbered, so placing, cancelling and serving a hold each touch
+    one row plus one index entry, however long the queue.
+    """
+    id = models.BigAutoField(primary_key=True)
+    work = models.ForeignKey(Work, on_delete=models.CASCADE, related_name='holds', db_index=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='holds',
+        db_index=False, # Covered by unique_user_hold (user, work)
+    )
+    position = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # The queue of a title: its head is the first entry of this index
+            models.UniqueConstraint(fields=['work', 'position'], name='hold_queue_idx'),
+            # One hold per patron and title (also the index of a patron's holds)
+            models.UniqueConstraint(fields=['user', 'work'], name='unique_user_hold'),
+        ]
+
+    def __str__(self):
+        return f"Hold #{self.position} on {self.work_id} by {self.user_id}"
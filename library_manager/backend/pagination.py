@@ -0,0 +1,313 @@
+"""
+Keyset (cursor) pagination for the API list endpoints.
+
+Instead of ``LIMIT/OFFSET`` every page is fetched with a ``WHERE`` clause that
+continues right after the last row of the previous page, using the active
+ordering plus the primary key as a tie-breaker, e.g. ``(title, id) > ('X', 42)``.
+Deep pages therefore cost the same as the first one.
+"""
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, OrderBy, Q
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(payload):
+    """Encodes a cursor payload (dict) as an opaque, URL-safe token."""
+    raw = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token):
+    """Decodes a token produced by encode_cursor. Raises NotFound if it is malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError, binascii.Error):
+        raise NotFound('Invalid cursor')
+    if not isinstance(payload, dict):
+        raise NotFound('Invalid cursor')
+    return payload
+
+
+def _is_nullable(model, name):
+    """True if any field along the (possibly related) lookup path `name` can be NULL."""
+    for part in name.split(LOOKUP_SEP):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return True
+        if field.null:
+            return True
+        model = field.related_model or model
+    return False
+
+
+def _key_field(model, name):
+    """The model field at the end of the (possibly related) lookup path `name`, or None."""
+    field = None
+    for part in name.split(LOOKUP_SEP):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        model = field.related_model or model
+    return field
+
+
+def cursor_values(model, keys, values):
+    """
+    Converts the key values read from a cursor to the Python types of their fields,
+    so a forged cursor is rejected up front instead of failing inside the query.
+    """
+    converted = []
+    for (name, _, _), value in zip(keys, values):
+        if value is not None:
+            field = _key_field(model, name)
+            try:
+                if field is None:
+                    if not isinstance(value, (str, int, float)):
+                        raise TypeError(value)
+                else:
+                    value = field.to_python(value)
+            except (TypeError, ValueError, DjangoValidationError):
+                raise NotFound('Invalid cursor')
+        converted.append(value)
+    return converted
+
+
+def get_ordering_keys(queryset, default=('id',)):
+    """
+    Returns the queryset ordering as a list of (name, descending, nullable) tuples,
+    always ending with the primary key so that every row has a unique position.
+    """
+    model = queryset.model
+    pk_name = model._meta.pk.name
+    ordering = []
+    for item in queryset.query.order_by:
+        if isinstance(item, str):
+            ordering.append(item)
+        elif isinstance(item, OrderBy) and isinstance(item.expression, F):
+            # As produced by ordering_expressions(), so the keys survive a round trip
+            ordering.append(f"-{item.expression.name}" if item.descending else item.expression.name)
+    if not ordering:
+        ordering = list(model._meta.ordering or default)
+
+    keys = []
+    for item in ordering:
+        descending = item.startswith('-')
+        name = item.lstrip('-')
+        if name == 'pk':
+            name = pk_name
+        if name == '?' or any(key[0] == name for key in keys):
+            continue
+        keys.append((name, descending, name != pk_name and _is_nullable(model, name)))
+        if name == pk_name:
+            break # The primary key is unique, anything after it is redundant
+    else:
+        keys.append((pk_name, False, False))
+    return keys
+
+
+def ordering_expressions(keys):
+    """
+    ORDER BY expressions for `keys`. NULLs always sort first ascending and last
+    descending (the MySQL/SQLite default), so reversing a key flips both together.
+    """
+    expressions = []
+    for name, descending, nullable in keys:
+        if not nullable:
+            expressions.append(f"-{name}" if descending else name)
+        elif descending:
+            expressions.append(F(name).desc(nulls_last=True))
+        else:
+            expressions.append(F(name).asc(nulls_first=True))
+    return expressions
+
+
+def reverse_keys(keys):
+    return [(name, not descending, nullable) for name, descending, nullable in keys]
+
+
+def _after(name, descending, nullable, value):
+    """Q matching values of a single key that sort strictly after `value` (None = no rows)."""
+    if value is None:
+        # NULLs come first ascending (everything non-null is after) and last descending
+        return None if descending else Q(**{f"{name}__isnull": False})
+    q = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+    if nullable and descending:
+        q |= Q(**{f"{name}__isnull": True})
+    return q
+
+
+def keyset_filter(keys, values):
+    """
+    Q selecting rows strictly after the row whose key values are `values`, i.e. the
+    expansion of ``(k1, k2, ..., id) > (v1, v2, ..., vid)`` for mixed directions.
+    """
+    clauses = []
+    equal = Q()
+    for (name, descending, nullable), value in zip(keys, values):
+        after = _after(name, descending, nullable, value)
+        if after is not None:
+            clauses.append(equal & after)
+        equal &= Q(**{f"{name}__isnull": True}) if value is None else Q(**{name: value})
+    if not clauses:
+        return Q(pk__in=[])
+    condition = reduce(or_, clauses)
+
+    # Redundant range bound on the leading key so the database can do an index range scan
+    name, descending, nullable = keys[0]
+    if values[0] is not None and len(keys) > 1:
+        bound = Q(**{f"{name}__{'lte' if descending else 'gte'}": values[0]})
+        if nullable and descending:
+            bound |= Q(**{f"{name}__isnull": True})
+        condition &= bound
+    return condition
+
+
+def row_value(row, name):
+    """Reads a key value from either a model instance or a .values() dict."""
+    if isinstance(row, dict):
+        return row[name]
+    for part in name.split(LOOKUP_SEP):
+        row = getattr(row, part, None) if row is not None else None
+    return row
+
+
+def iter_keyset_batches(queryset, batch_size):
+    """
+    Yields the rows of `queryset` (in its ordering) as lists of at most `batch_size`,
+    each fetched by its own keyset query. Unlike a plain cursor iteration this keeps
+    memory flat even with database drivers that buffer the whole result set client-side.
+    """
+    keys = get_ordering_keys(queryset)
+    queryset = queryset.order_by(*ordering_expressions(keys))
+    batch = list(queryset[:batch_size])
+    while batch:
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1]
+        batch = list(queryset.filter(keyset_filter(keys, [row_value(last, name) for name, _, _ in keys]))[:batch_size])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in cursor pagination: only applied when the request carries ``cursor`` or
+    ``page_size``, so clients that expect the plain list keep working unchanged.
+    Works with whatever ordering the OrderingFilter applied (any ordering_fields entry).
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        return self.finalize_page(list(self.get_page_queryset(queryset, request)))
+
+    def get_page_queryset(self, queryset, request):
+        """Builds the (lazy) queryset for the requested page, one row more than the page size."""
+        self.request = request
+        self.size = self.get_page_size(request)
+        self.keys = get_ordering_keys(queryset)
+        self.signature = [f"-{name}" if descending else name for name, descending, _ in self.keys]
+
+        token = request.query_params.get(self.cursor_query_param)
+        self.cursor = decode_cursor(token) if token else None
+        self.reverse = bool(self.cursor and self.cursor.get('r'))
+        if self.cursor is not None:
+            values = self.cursor.get('v')
+            if self.cursor.get('o') != self.signature or not isinstance(values, list) or len(values) != len(self.keys):
+                raise NotFound('Invalid cursor')
+            values = cursor_values(queryset.model, self.keys, values)
+
+        keys = reverse_keys(self.keys) if self.reverse else self.keys
+        queryset = queryset.order_by(*ordering_expressions(keys))
+        if self.cursor is not None:
+            queryset = queryset.filter(keyset_filter(keys, values))
+        return queryset[:self.size + 1]
+
+    def finalize_page(self, rows):
+        """Trims the look-ahead row, restores order for backward pages and computes the links."""
+        has_more = len(rows) > self.size
+        rows = rows[:self.size]
+        if self.reverse:
+            rows.reverse()
+            has_next, has_previous = self.cursor is not None, has_more
+        else:
+            has_next, has_previous = has_more, self.cursor is not None
+
+        self.next_cursor = self._cursor_for(rows[-1], False) if has_next and rows else None
+        self.previous_cursor = self._cursor_for(rows[0], True) if has_previous and rows else None
+        return rows
+
+    def _cursor_for(self, row, reverse):
+        payload = {'o': self.signature, 'v': [row_value(row, name) for name, _, _ in self.keys]}
+        if reverse:
+            payload['r'] = 1
+        return encode_cursor(payload)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.size)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class LedgerPagination(KeysetPagination):
+    """
+    KeysetPagination that is always on (?page_size= still sets the size), for
+    tables too large to ever return in one response, such as the loan ledger.
+    """
+    page_size = 50
+    max_page_size = 500
+
+    def is_requested(self, request):
+        return True
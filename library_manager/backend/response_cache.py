@@ -0,0 +1,203 @@
+"""
+Response cache for the book list and book detail endpoints.
+
+Book reads far outnumber catalogue changes, so GET responses of
+BookListCreateView and BookDetailView are kept in Django's cache (CACHES in
+settings.py; the local-memory and file-based backends both work).
+
+- Keys are built from the path, the normalised query parameters (sorted, empty
+  values dropped), the scheme/host (image URLs and page links are absolute),
+  today's date (days_left and friends) and a version stamp.
+- The version stamp is bumped by invalidate_book_responses(): on Book save/delete
+  and User rename/delete (signals.py), borrow/return (circulation.py) and bulk
+  imports (catalogue_import.py). Old entries are never read again and expire
+  after BOOK_RESPONSE_CACHE_TIMEOUT seconds.
+- The cached payload has the shape an anonymous viewer would get: every borrowed
+  book shows "Checked Out". Borrower names are stored next to it and re-applied
+  per request for the borrower themselves and for admins/librarians.
+- The same version stamp yields the ETag and Last-Modified headers of these
+  responses, so clients revalidating with If-None-Match get a 304 without any
+  book query (book_response_etag, book_response_last_modified).
+
+With the local-memory backend every process has its own cache and only sees
+its own invalidations; run several workers with the file-based backend (set
+DJANGO_CACHE_DIR) so they share the version stamp.
+"""
+import hashlib
+import time
+from datetime import date, datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .db_routers import reading_from_replica
+from .roles import get_role, is_admin_or_librarian
+
+VERSION_KEY = 'backend:book-responses:version'
+MODIFIED_KEY = 'backend:book-responses:modified' # Time of the last bump (Last-Modified)
+
+
+def _cache():
+    return caches[getattr(settings, 'BOOK_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'BOOK_RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def _new_version():
+    # Never restart from a small number: if the version key is evicted, a counter
+    # starting at 1 could land on a version whose old entries are still cached
+    return time.time_ns() // 1000
+
+
+def get_version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        if cache.add(VERSION_KEY, _new_version(), None):
+            cache.set(MODIFIED_KEY, time.time(), None) # Nothing known about earlier changes
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump_version():
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError: # Key missing (first write or evicted)
+        cache.set(VERSION_KEY, _new_version(), None)
+    cache.set(MODIFIED_KEY, time.time(), None)
+
+
+def invalidate_book_responses():
+    """
+    Makes every cached book response stale. Bumped now (later reads in this
+    transaction) and again on commit: a request that read the new version before
+    the commit may have cached the old rows under it.
+    """
+    _bump_version()
+    transaction.on_commit(_bump_version)
+
+
+def _settled():
+    """
+    False while the request reads from a replica that may not have the last change
+    yet (within REPLICA_PIN_SECONDS of it, see db_routers.py). Such responses are
+    neither cached nor given validators, so stale rows never outlive the lag.
+    """
+    if not reading_from_replica():
+        return True
+    modified = _cache().get(MODIFIED_KEY)
+    return modified is None or time.time() - modified > getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+def _request_digest(request):
+    # DRF Request (query_params) or plain HttpRequest (GET, async views)
+    query = getattr(request, 'query_params', request.GET)
+    params = sorted(
+        (name, value)
+        for name, values in query.lists()
+        for value in values if value != ''
+    )
+    parts = [request.build_absolute_uri(request.path), repr(params), date.today().isoformat()]
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def response_cache_key(request):
+    return f"backend:book-responses:{get_version()}:{_request_digest(request)}"
+
+
+# --- Conditional GET (ETag / Last-Modified) ---
+# Both validators are computed from the version stamp alone, so a 304 costs no
+# book query and no serialization. Used with django.views.decorators.http.condition.
+
+def book_response_etag(request, *args, **kwargs):
+    """
+    Strong ETag of a book GET response: the cache key (version stamp, URL, date)
+    plus the viewer, whose id and role decide which borrower names are shown.
+    """
+    if not _settled():
+        return None
+    user = request.user
+    viewer = f"{user.pk}:{get_role(user)}" if user.is_authenticated else 'anonymous'
+    parts = [str(get_version()), _request_digest(request), viewer]
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def book_response_last_modified(request, *args, **kwargs):
+    """
+    Time of the last catalogue change, but never before today's midnight (the
+    loan countdown fields change every day). None if the cache lost the time or
+    a replica may still be catching up.
+    """
+    get_version() # Records the time if the stamp is new
+    modified = _cache().get(MODIFIED_KEY)
+    if modified is None or not _settled():
+        return None
+    midnight = datetime.combine(date.today(), datetime.min.time()).astimezone(timezone.utc)
+    return max(datetime.fromtimestamp(modified, tz=timezone.utc), midnight)
+
+
+def _books_of(data):
+    """The book dicts of a cached payload: a book, a list of books or a page of them."""
+    if isinstance(data, list):
+        return data
+    if 'results' in data:
+        return data['results']
+    return [data]
+
+
+def apply_viewer(entry, user):
+    """Shows borrower names to the borrower themselves and to admins/librarians."""
+    if user is None or not user.is_authenticated:
+        return entry['data']
+    privileged = is_admin_or_librarian(user)
+    borrowers = entry['borrowers']
+    for book in _books_of(entry['data']):
+        borrower_id = book.get('borrower_id')
+        if borrower_id is not None and 'borrower' in book and (privileged or borrower_id == user.pk):
+            book['borrower'] = borrowers.get(book['id'], book['borrower'])
+    return entry['data']
+
+
+def _lookup(request):
+    """(cache key, cached entry or None); the key is None when the response must not be cached."""
+    if not _timeout() or not _settled():
+        return None, None
+    key = response_cache_key(request)
+    return key, _cache().get(key)
+
+
+def _store(key, data, borrowers):
+    entry = {'data': data, 'borrowers': borrowers}
+    if key is not None:
+        _cache().set(key, entry, _timeout()) # Stored as a copy: apply_viewer does not leak into it
+    return entry
+
+
+def cached_book_data(request, build):
+    """
+    The payload of a book GET request from the cache, or from build(), with the
+    borrower names the viewer may see. build() returns (data, borrowers): the
+    payload serialized for an anonymous viewer and a dict book id -> borrower
+    username for the borrowed books in it.
+    """
+    key, entry = _lookup(request)
+    if entry is None:
+        entry = _store(key, *build())
+    return apply_viewer(entry, request.user)
+
+
+async def acached_book_data(request, abuild):
+    """cached_book_data() for async views: abuild() is a coroutine function."""
+    key, entry = _lookup(request)
+    if entry is None:
+        entry = _store(key, *await abuild())
+    return apply_viewer(entry, request.user)
+
+
+def cached_book_response(request, build):
+    return Response(cached_book_data(request, build))
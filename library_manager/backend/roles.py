@@ -0,0 +1,63 @@
+"""
+Role lookup for permission checks and serializers.
+
+``request.user`` is loaded without its profile, so every ``user.profile.type``
+check used to cost a UserProfile query. get_role() resolves the role at most once
+per request (the result is kept on the user object, which lives as long as the
+request) and otherwise serves it from Django's cache. Cached roles are dropped
+whenever a UserProfile is saved or deleted (e.g. promote_user_to_librarian), see
+the UserProfile handlers in backend/signals.py.
+
+With the per-process local-memory cache, invalidation only reaches the process
+that saved the profile; other processes notice after ROLE_CACHE_TIMEOUT seconds.
+Configure a shared cache backend to make role changes effective everywhere at once.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserProfile
+
+ADMIN = 'AD'
+LIBRARIAN = 'LB'
+STAFF_ROLES = (ADMIN, LIBRARIAN)
+
+_NO_PROFILE = '' # Cached for users without a profile (a None value would read as a miss)
+
+
+def _cache_key(user_id):
+    return f"backend:user-role:{user_id}"
+
+
+def get_role(user):
+    """The user's profile type ('AD', 'LB', 'US'), or None for anonymous users and users without a profile."""
+    if user is None or not user.is_authenticated:
+        return None
+
+    # A profile that is already loaded (select_related, earlier access) is the freshest answer
+    if 'profile' in user._state.fields_cache:
+        profile = user._state.fields_cache['profile']
+        return profile.type if profile is not None else None
+
+    role = getattr(user, '_cached_role', None)
+    if role is None:
+        key = _cache_key(user.pk)
+        role = cache.get(key)
+        if role is None:
+            role = UserProfile.objects.filter(user_id=user.pk).values_list('type', flat=True).first() or _NO_PROFILE
+            cache.set(key, role, getattr(settings, 'ROLE_CACHE_TIMEOUT', 60))
+        user._cached_role = role
+    return role or None
+
+
+def is_admin(user):
+    return get_role(user) == ADMIN
+
+
+def is_admin_or_librarian(user):
+    return get_role(user) in STAFF_ROLES
+
+
+def clear_cached_role(user_id):
+    """Drops the cached role of a user (the next get_role() call reads the profile again)."""
+    cache.delete(_cache_key(user_id))
+
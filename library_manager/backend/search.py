@@ -0,0 +1,141 @@
+"""
+Token inverted index for book search.
+
+``?search=`` on its own keeps DRF's ``icontains`` behaviour, which cannot use an
+index (``LIKE '%term%'``) and scans the whole table. With ``?search_mode=index``
+the query is answered from BookSearchToken instead: every word of a book's title,
+author and ISBN is stored as one row, and each search term becomes an indexed
+prefix lookup (``token LIKE 'term%'``). All terms must match; results are ranked
+by the summed weights of the matching tokens (exact word matches count double).
+
+The index is kept up to date by the Book signals in backend/signals.py. Writes
+that bypass signals (bulk_create, QuerySet.update of title/author/isbn) must be
+followed by ``python manage.py rebuild_search_index``.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, When
+from rest_framework import filters
+
+from .models import Book, BookSearchToken
+from .pagination import iter_keyset_batches
+
+TOKEN_RE = re.compile(r"\w+")
+ISBN_HYPHEN_RE = re.compile(r"(?<=\d)[-\s](?=\d)") # '978-0-13' -> '978013'
+MAX_TOKEN_LENGTH = BookSearchToken._meta.get_field('token').max_length
+MAX_QUERY_TERMS = 8
+
+# Field -> weight of its tokens in the ranking
+FIELD_WEIGHTS = (
+    ('isbn', 5),
+    ('title', 3),
+    ('author', 2),
+)
+
+
+def tokenize(text):
+    """Lower-cased words of `text`, with digit groups joined across hyphens (ISBNs)."""
+    if not text:
+        return []
+    text = ISBN_HYPHEN_RE.sub('', str(text).lower())
+    return [token[:MAX_TOKEN_LENGTH] for token in TOKEN_RE.findall(text)]
+
+
+def book_tokens(book):
+    """Maps each token of a book (instance or values() dict) to its weight."""
+    tokens = {}
+    for field, weight in FIELD_WEIGHTS:
+        value = book[field] if isinstance(book, dict) else getattr(book, field)
+        for token in tokenize(value):
+            tokens[token] = max(tokens.get(token, 0), weight)
+    return tokens
+
+
+def _token_rows(book_id, tokens):
+    return [BookSearchToken(book_id=book_id, token=token, weight=weight) for token, weight in tokens.items()]
+
+
+def index_book(book):
+    """(Re)indexes a single book. Called from the Book post_save signal."""
+    with transaction.atomic():
+        BookSearchToken.objects.filter(book_id=book.pk).delete()
+        BookSearchToken.objects.bulk_create(_token_rows(book.pk, book_tokens(book)))
+
+
+def rebuild_index(queryset=None, batch_size=1000):
+    """Reindexes `queryset` (default: every book) in batches. Returns the number of books."""
+    if queryset is None:
+        queryset = Book.objects.all()
+    total = 0
+    rows = queryset.order_by('id').values('id', 'title', 'author', 'isbn')
+    for batch in iter_keyset_batches(rows, batch_size):
+        index_book_rows(batch)
+        total += len(batch)
+    return total
+
+
+def index_book_rows(rows):
+    """(Re)indexes books given as values() dicts with id, title, author and isbn."""
+    with transaction.atomic():
+        BookSearchToken.objects.filter(book_id__in=[row['id'] for row in rows]).delete()
+        BookSearchToken.objects.bulk_create(
+            [token for row in rows for token in _token_rows(row['id'], book_tokens(row))]
+        )
+
+
+def prefix_q(term):
+    """
+    Tokens starting with `term`. Tokens are stored lower-cased, so istartswith is a
+    plain LIKE 'term%' (startswith would be LIKE BINARY on MySQL, which cannot use
+    the index with the default collation). The explicit range term <= token < term'
+    lets backends that cannot use an index for LIKE (SQLite) do a range scan too.
+    """
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return Q(token__gte=term, token__lt=upper, token__istartswith=term)
+
+
+def search_books(queryset, query):
+    """
+    Restricts a Book queryset to books matching every term of `query` (as word
+    prefixes) and annotates it with `search_rank`. Returns it unchanged for an empty query.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return queryset
+
+    for term in terms:
+        # Semi-join per term: an index range scan on (token, book_id)
+        queryset = queryset.filter(pk__in=BookSearchToken.objects.filter(prefix_q(term)).values('book_id'))
+
+    rank = (
+        BookSearchToken.objects
+        .filter(reduce(or_, (prefix_q(term) for term in terms)), book=OuterRef('pk'))
+        .order_by()
+        .values('book')
+        .annotate(total=Sum(Case(
+            When(token__in=terms, then=F('weight') * 2), default=F('weight'), output_field=IntegerField()
+        )))
+        .values('total')
+    )
+    return queryset.annotate(search_rank=Subquery(rank[:1], output_field=IntegerField()))
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter that answers ``?search=`` from the token index when the request
+    has ``?search_mode=index``. Results are ordered by relevance unless ?ordering is given.
+    """
+    search_mode_param = 'search_mode'
+
+    def filter_queryset(self, request, queryset, view):
+        if request.query_params.get(self.search_mode_param) != 'index' or queryset.model is not Book:
+            return super().filter_queryset(request, queryset, view)
+
+        query = request.query_params.get(self.search_param, '').replace('\x00', '')
+        queryset = search_books(queryset, query)
+        if 'search_rank' in queryset.query.annotations:
+            queryset = queryset.order_by('-search_rank', 'id')
+        return queryset
@@ -1,8 +1,6 @@
 import os
 import django
 import sys
-import datetime
-import json
 
 # --- Path Setup ---
 # Calculate the project root directory (the parent of 'backend')
@@ -34,7 +32,8 @@ except Exception as e:
 # --- Model Imports ---
 # Use relative import because seeds.py is in the same directory as models.py
 try:
-    from backend.models import UserProfile, Book # <<< REVERTED TO ABSOLUTE IMPORT
+    from backend.models import UserProfile # <<< REVERTED TO ABSOLUTE IMPORT
+    from backend.catalogue_import import import_books
     from django.contrib.auth import get_user_model
 except ModuleNotFoundError:
     print("Error: Could not find the 'backend' module.")
@@ -47,7 +46,6 @@ except ImportError as e:
     sys.exit(1)
 
 from django.db import connection
-from django.core.files.base import ContentFile # For handling default image if needed
 
 User = get_user_model() # Get the active User model
 
@@ -61,24 +59,8 @@ except Exception as e:
     print(f"Database connection failed: {e}")
     sys.exit(1) # Exit if DB connection fails
 
-# --- Data Loading Function ---
-def load_books_from_json():
-    """Loads book data from a JSON file."""
-    file_path = os.path.join(os.path.dirname(__file__), 'books_data.json')
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f: # Specify UTF-8 encoding
-            books_data = json.load(f)
-        print(f"Successfully loaded {len(books_data)} books from {file_path}")
-        return books_data
-    except FileNotFoundError:
-        print(f"Error: {file_path} not found. Please ensure the file exists.")
-        return []
-    except json.JSONDecodeError as e:
-        print(f"Error: Could not decode JSON from {file_path}. Check format. Details: {e}")
-        return []
-    except Exception as e:
-        print(f"An unexpected error occurred loading books: {e}")
-        return []
+BOOKS_DATA_FILE = os.path.join(os.path.dirname(__file__), 'books_data.json')
+BOOK_BATCH_SIZE = 1000 # Books written per INSERT ... ON CONFLICT statement
 
 # --- Seeding Function ---
 def seed_database():
@@ -143,78 +125,24 @@ def seed_database():
 
 
     # --- 2. Seed Books ---
+    # Streamed and upserted in batches by the bulk import pipeline (backend/catalogue_import.py)
     print("\n--- Seeding Books ---")
-    books_data = load_books_from_json()
-
-    if not books_data:
-        print("No book data loaded or found. Skipping book seeding.")
+    if not os.path.exists(BOOKS_DATA_FILE):
+        print(f"Error: {BOOKS_DATA_FILE} not found. Skipping book seeding.")
     else:
         # Optional: Get an admin user to set as 'added_by'
         admin_user = created_users.get("AdminUser", None)
         if not admin_user:
             print("Warning: AdminUser not found. 'added_by' for books will be set to None.")
 
-        for book_data in books_data:
-            isbn = book_data.get("isbn")
-            if not isbn:
-                print(f"Skipping book due to missing ISBN: {book_data.get('title', 'N/A')}")
-                continue
-
-            # Prepare defaults dictionary matching the Book model fields
-            defaults = {
-                "title": book_data.get("title", "Unknown Title"),
-                "author": book_data.get("author", "Unknown Author"),
-                "category": book_data.get("category", "TXT"), # Default category
-                "language": book_data.get("language", "English"),
-                "condition": book_data.get("condition", "GD"), # Default condition
-                "available": book_data.get("available", True),
-                "storage_location": book_data.get("storage_location"),
-                "publisher": book_data.get("publisher"),
-                "publication_year": book_data.get("publication_year"),
-                "copy_number": book_data.get("copy_number", 1),
-                # --- Foreign Keys and Dates ---
-                "added_by": admin_user, # Set to the admin user found earlier, or None
-                "borrower": None,       # Initially not borrowed
-                "borrow_date": None,    # Initially no borrow date
-                "due_date": None,       # Initially no due date
-                # --- Image Handling ---
-                # Use the path from JSON or a default. Assumes MEDIA_ROOT/STATIC_ROOT setup.
-                "image": book_data.get("image", 'images/library_seal.jpg'), # Relative path
-            }
-
-            try:
-                book, created = Book.objects.update_or_create(
-                    isbn=isbn, defaults=defaults
-                )
-                if created:
-                    print(f"Created Book: {book.title} (ISBN: {book.isbn})")
-                else:
-                    print(f"Updated Book: {book.title} (ISBN: {book.isbn})")
-
-                # --- Handle potential image file creation if default is used and doesn't exist ---
-                # This part is complex and depends on storage backend.
-                # For simplicity, we assume the default image file exists where Django expects it.
-                # If 'image' field requires an actual file upload during seeding,
-                # you might need to use ContentFile and save() explicitly.
-                # Example (if needed):
-                # if created and not book.image: # If newly created and image is default/missing
-                #    try:
-                #        # Assuming default image is accessible
-                #        default_image_path = os.path.join(settings.STATICFILES_DIRS[0], 'images/library_seal.jpg') # Adjust path as needed
-                #        if os.path.exists(default_image_path):
-                #            with open(default_image_path, 'rb') as f:
-                #                book.image.save('library_seal.jpg', ContentFile(f.read()), save=True)
-                #        else:
-                #             print(f"Warning: Default image not found at {default_image_path}")
-                #    except Exception as img_err:
-                #        print(f"Warning: Could not set default image for {book.title}: {img_err}")
-
-
-            except Exception as e:
-                print(f"Error creating/updating book with ISBN {isbn}: {e}")
-                # Optionally print the data causing the error for debugging:
-                # print(f"Data causing error: {book_data}")
-                # print(f"Defaults used: {defaults}")
+        try:
+            summary = import_books(BOOKS_DATA_FILE, added_by=admin_user, batch_size=BOOK_BATCH_SIZE)
+        except (OSError, ValueError) as e:
+            print(f"Error importing books from {BOOKS_DATA_FILE}: {e}")
+        else:
+            for number, message in summary.errors:
+                print(f"Skipped book record {number}: {message}")
+            print(f"Books: {summary}")
 
 
     print("\nDatabase seeding process completed!")
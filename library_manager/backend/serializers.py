@@ -1,10 +1,16 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from operator import itemgetter
+
+from django.db.models import QuerySet
 from rest_framework import serializers
-from .models import Book, UserProfile
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
+from .catalogue_bulk import create_books, update_books
+from .models import Book, Hold, Loan, UserProfile, Work
 from datetime import date  # Import date
-from django.templatetags.static import static # Import static tag function
-from django.conf import settings  # Import settings for STATIC_URL
+from .static_urls import avatar_url, book_image_url
+from .roles import is_admin_or_librarian
 
 # Get the User model configured in settings (usually django.contrib.auth.models.User)
 User = get_user_model()
@@ -50,41 +56,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
         """
         Return the full URL for the avatar, ensuring it points to the static path.
         Handles cases where avatar might be None or have no file/name.
+        Resolution is memoized in backend.static_urls.
         """
-        request = self.context.get('request')
-        avatar_path = None
-
-        # Check if obj.avatar has a meaningful value (name attribute)
-        # This handles both ImageField/FileField and potentially CharField if used
-        if obj.avatar and hasattr(obj.avatar, 'name') and obj.avatar.name:
-            # Assume obj.avatar.name stores the path relative to MEDIA_ROOT or
-            # just the filename if it's a static choice.
-            # We need to construct the path relative to the STATIC_URL base.
-            # Example: If avatar.name is 'avatars/user-1.svg', we want
-            # '/static/images/avatars/user-1.svg'
-            # If avatar.name is just 'user-1.svg', we need to prepend 'images/avatars/'
-            # Let's assume the name includes the 'avatars/' prefix as saved by the view.
-            # If not, adjust the path construction here.
-            if 'avatars/' in obj.avatar.name:
-                 # Construct the path expected by the static tag function
-                 # e.g., 'images/avatars/user-1.svg'
-                 static_file_path = f"images/{obj.avatar.name}"
-                 avatar_path = static(static_file_path)
-            else:
-                 # Fallback or alternative logic if 'avatars/' prefix is missing
-                 # Maybe the name is just the filename?
-                 static_file_path = f"images/avatars/{obj.avatar.name}"
-                 avatar_path = static(static_file_path)
-
-        # If no valid avatar path was derived, use the default
-        if not avatar_path:
-            avatar_path = static('images/avatars/default.svg') # Default path
-
-        # Build the absolute URI if request context is available
-        if request:
-            return request.build_absolute_uri(avatar_path)
-        # Otherwise, return the path (e.g., /static/images/avatars/...)
-        return avatar_path
+        avatar_name = obj.avatar.name if obj.avatar and hasattr(obj.avatar, 'name') else None
+        return avatar_url(avatar_name, self.context.get('request'))
 
 
 # Serializer for the standard User model, including nested profile data
@@ -192,7 +167,185 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
+def get_viewer(context):
+    """
+    The user whose view of borrower names is rendered: context['viewer'] when given
+    (None renders the anonymous view cached by backend/response_cache.py),
+    otherwise the request's user.
+    """
+    if 'viewer' in context:
+        return context['viewer']
+    request = context.get('request')
+    return getattr(request, 'user', None) if request else None
+
+
+# --- Sparse fieldsets (?fields= / ?omit=) of the book read endpoints ---
+
+# The .values() columns each BookSerializer field is rendered from, in output order
+BOOK_FIELD_COLUMNS = {
+    "id": ("id",),
+    "title": ("title",),
+    "author": ("author",),
+    "isbn": ("isbn",),
+    "category": ("category",),
+    "category_display": ("category",),
+    "language": ("language",),
+    "condition": ("condition",),
+    "condition_display": ("condition",),
+    "available": ("available",),
+    "image": ("image",),
+    "image_url": ("image",),
+    "borrower": ("borrower_id", "borrower__username"), # Joins the borrower
+    "borrower_id": ("borrower_id",),
+    "borrow_date": ("borrow_date",),
+    "due_date": ("due_date",),
+    "storage_location": ("storage_location",),
+    "publisher": ("publisher",),
+    "publication_year": ("publication_year",),
+    "copy_number": ("copy_number",),
+    "added_by": ("added_by__username",), # Joins the user who added the book
+    "added_by_id": ("added_by_id",),
+    "days_left": ("due_date", "available"),
+    "overdue": ("due_date", "available"),
+    "days_overdue": ("due_date", "available"),
+    "due_today": ("due_date", "available"),
+}
+
+
+def _field_names(param, value):
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in BOOK_FIELD_COLUMNS]
+    if unknown:
+        raise serializers.ValidationError({param: [f"Unknown field(s): {', '.join(unknown)}."]})
+    return names
+
+
+def get_requested_book_fields(query_params):
+    """
+    The book fields picked with ?fields=a,b (only these) and/or ?omit=c,d (all but
+    these), in serializer order, or None when neither is given. `id` is always
+    included and `borrower` brings `borrower_id` along (borrower names are shown
+    per viewer by id). Unknown names raise ValidationError (400).
+    """
+    requested = query_params.get('fields')
+    omitted = query_params.get('omit')
+    if not requested and not omitted:
+        return None
+    selected = set(_field_names('fields', requested) if requested else BOOK_FIELD_COLUMNS)
+    if omitted:
+        selected.difference_update(_field_names('omit', omitted))
+    selected.add('id')
+    if 'borrower' in selected:
+        selected.add('borrower_id')
+    return tuple(name for name in BOOK_FIELD_COLUMNS if name in selected)
+
+
+def book_columns(fields):
+    """The .values() columns needed to render `fields` (None: all of them)."""
+    fields = BOOK_FIELD_COLUMNS if fields is None else fields
+    return tuple(dict.fromkeys(column for name in fields for column in BOOK_FIELD_COLUMNS[name]))
+
+
+def narrow_book_queryset(queryset, fields):
+    """
+    Restricts a Book queryset (for BookSerializer) to the columns `fields` need:
+    .only() those, and join borrower/added_by only if their usernames are shown.
+    """
+    only = set()
+    related = set()
+    for column in book_columns(fields):
+        relation, _, _ = column.partition('__')
+        if relation != column: # borrower__username, added_by__username
+            related.add(relation)
+            only.update((relation, column))
+        else:
+            only.add(column[:-3] if column in ('borrower_id', 'added_by_id') else column)
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*sorted(related))
+    return queryset.only(*sorted(only))
+
+
 # Serializer for the Book model
+class BookListSerializer(serializers.ListSerializer):
+    """
+    BookSerializer(many=True) for the bulk endpoint (BookBulkView). The ISBNs of
+    the whole list are checked with one query instead of one per book, and
+    create()/update() write with bulk_create/bulk_update (backend/catalogue_bulk.py).
+    For updates, `instance` is a dict {id: Book} and every item names its "id".
+    Errors are reported by item index, for the failing items only.
+    """
+    duplicate_isbn_message = 'book with this isbn already exists.' # Same as the model's unique error
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Replaced by the batched check in _validate_item
+        isbn = self.child.fields.get('isbn')
+        if isbn is not None:
+            isbn.validators = [v for v in isbn.validators if not isinstance(v, UniqueValidator)]
+
+    def to_internal_value(self, data):
+        # The item loop is ours rather than ListSerializer's: how DRF validates each
+        # child differs between versions, and every item needs its own instance
+        if not isinstance(data, list):
+            message = self.error_messages['not_a_list'].format(input_type=type(data).__name__)
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]}, code='not_a_list')
+        if not data and not self.allow_empty:
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [self.error_messages['empty']]}, code='empty'
+            )
+        isbns = [str(item['isbn']).strip() for item in data if isinstance(item, dict) and item.get('isbn')]
+        self._taken_isbns = dict(Book.objects.filter(isbn__in=isbns).values_list('isbn', 'id')) # isbn -> book id
+        self._seen = set() # ISBNs and ids already claimed by earlier items
+
+        validated, errors = [], {}
+        for index, item in enumerate(data):
+            try:
+                validated.append(self._validate_item(item))
+            except serializers.ValidationError as exc:
+                errors[index] = exc.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+        return validated
+
+    def _validate_item(self, data):
+        book = None
+        if self.instance is not None:
+            book_id = data.get('id') if isinstance(data, dict) else None
+            book = self.instance.get(book_id) if type(book_id) is int else None
+            if book is None:
+                raise serializers.ValidationError({'id': ['No Book matches the given query.']})
+            if ('id', book.id) in self._seen:
+                raise serializers.ValidationError({'id': ['Book is listed more than once in this request.']})
+            self._seen.add(('id', book.id))
+        self.child.instance = book
+        self.child.initial_data = data
+        attrs = self.child.run_validation(data)
+
+        isbn = attrs.get('isbn')
+        if isbn is not None:
+            owner = self._taken_isbns.get(isbn)
+            if ('isbn', isbn) in self._seen or (owner is not None and (book is None or owner != book.id)):
+                raise serializers.ValidationError({'isbn': [self.duplicate_isbn_message]})
+            self._seen.add(('isbn', isbn))
+        if book is not None:
+            attrs['id'] = book.id
+        return attrs
+
+    def create(self, validated_data):
+        return create_books([Book(**attrs) for attrs in validated_data])
+
+    def update(self, instance, validated_data):
+        books, fields = [], set()
+        for attrs in validated_data:
+            book = instance[attrs.pop('id')]
+            for name, value in attrs.items():
+                setattr(book, name, value)
+            fields.update(attrs)
+            books.append(book)
+        return update_books(books, fields)
+
+
 class BookSerializer(serializers.ModelSerializer):
     # Use StringRelatedField to display usernames instead of IDs for related users
     # read_only=True because these fields are typically set by the view logic (e.g., current user)
@@ -221,6 +374,7 @@ class BookSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Book
+        list_serializer_class = BookListSerializer # Bulk create/update (BookBulkView)
         # Explicitly list all fields you want to expose
         fields = [
             "id",
@@ -262,27 +416,34 @@ class BookSerializer(serializers.ModelSerializer):
         # extra_kwargs = {
         #     'image': {'write_only': True}
         # }
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldset (context['fields'], see get_requested_book_fields)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def get_borrower(self, obj: Book) -> str | None:
         """
         Determines what to display for the 'borrower' field based on the
         requesting user's role and whether they are the borrower.
         """
-        request = self.context.get('request')
+        viewer = get_viewer(self.context)
         
         # If the book is not borrowed, borrower is None
         if not obj.borrower:
             return None
 
-        # If there's a request and an authenticated user
-        if request and request.user and request.user.is_authenticated:
+        # If there's an authenticated viewer
+        if viewer and viewer.is_authenticated:
             # Case 1: The current user is the borrower
-            if request.user == obj.borrower:
+            if viewer == obj.borrower:
                 return obj.borrower.username
             
             # Case 2: The current user is an Admin or Librarian
             # (and not the borrower, due to previous check)
-            user_profile = getattr(request.user, 'profile', None)
-            if user_profile and user_profile.type in ['AD', 'LB']:
+            if is_admin_or_librarian(viewer):
                 return obj.borrower.username
         
         # Case 3: For regular users viewing a book borrowed by someone else,
@@ -296,60 +457,9 @@ class BookSerializer(serializers.ModelSerializer):
         Handles potential incorrect prefixes in the stored image name
         and ensures the path is correctly resolved using the static tag.
         """
-        request = self.context.get('request')
-        image_path_resolved = None # The final path/URL
-        default_static_path = 'images/library_seal.jpg' # Default image relative to static root
-
-        # Similar logic for book images if they are static assets
-        if obj.image and hasattr(obj.image, 'name') and obj.image.name:
-            image_name = obj.image.name.strip() # Get the stored name and strip whitespace
-
-            # --- Clean the stored image name ---
-            # Remove potential leading prefixes that might have been saved incorrectly
-            prefixes_to_remove = ['static/images/', '/static/images/', 'images/']
-            for prefix in prefixes_to_remove:
-                if image_name.startswith(prefix):
-                    image_name = image_name[len(prefix):]
-                    break # Remove only the first matching prefix
-
-            # --- Construct the path for the static tag ---
-            # We assume all book images belong under an 'images/' directory
-            # within the static files structure.
-            # If image_name is 'covers/book.jpg', static_file_path becomes 'images/covers/book.jpg'
-            # If image_name is 'book.jpg', static_file_path becomes 'images/book.jpg'
-            static_file_path = f"images/{image_name}"
-
-            try:
-                # static() will prepend STATIC_URL ('/static/')
-                # e.g., static('images/covers/book.jpg') -> '/static/images/covers/book.jpg'
-                image_path_resolved = static(static_file_path)
-            except (ValueError, FileNotFoundError): # Handle case where static file doesn't exist
-                print(f"Warning: Static file not found for book image: '{static_file_path}' (derived from '{obj.image.name}'). Using default.")
-                image_path_resolved = None # Fallback to default
-
-        # If no valid image path or static file not found, use the default
-        if not image_path_resolved:
-            try:
-                image_path_resolved = static(default_static_path)
-            except (ValueError, FileNotFoundError):
-                 print(f"Warning: Default static file not found: '{default_static_path}'")
-                 # If even the default is missing, return a placeholder or None
-                 # Returning the path string directly might be better than None if build_absolute_uri fails
-                 image_path_resolved = f"{settings.STATIC_URL}{default_static_path}" # Construct manually as last resort
-
-
-        # Build the absolute URI if request context is available
-        if request and image_path_resolved:
-            try:
-                return request.build_absolute_uri(image_path_resolved)
-            except Exception as e:
-                 print(f"Error building absolute URI for '{image_path_resolved}': {e}")
-                 # Fallback if build_absolute_uri fails unexpectedly
-                 return image_path_resolved # Return the path itself (/static/...)
-        elif image_path_resolved:
-             return image_path_resolved # Return the path (/static/...) if no request
-        else:
-             return None # Should ideally not happen if default exists
+        image_name = obj.image.name if obj.image and hasattr(obj.image, 'name') else None
+        # Memoized in backend.static_urls: covers repeat across copies and requests
+        return book_image_url(image_name, self.context.get('request'))
 
     def get_days_left(self, obj):
         # Ensure due_date is compared with today's date
@@ -382,3 +492,246 @@ class BookSerializer(serializers.ModelSerializer):
     def get_due_today(self, obj):
         days_left = self.get_days_left(obj)
         return days_left is not None and days_left == 0
+
+
+class WorkSerializer(serializers.ModelSerializer):
+    """A title of the catalogue with its copy counts, rendered from the Work row alone."""
+    category_display = serializers.SerializerMethodField()
+    image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Work
+        fields = [
+            "id", "title", "author", "language", "category", "category_display",
+            "publisher", "publication_year", "image_url", "copy_count", "available_copies",
+        ]
+        read_only_fields = fields
+
+    def get_category_display(self, obj):
+        return BookFastListSerializer.category_labels.get(obj.category, obj.category)
+
+    def get_image_url(self, obj):
+        return book_image_url(obj.image or None, self.context.get('request'))
+
+
+class WorkDetailSerializer(WorkSerializer):
+    """A title with its copies (borrowers are not shown)."""
+    copies = serializers.SerializerMethodField()
+
+    class Meta(WorkSerializer.Meta):
+        fields = WorkSerializer.Meta.fields + ["copies"]
+        read_only_fields = fields
+
+    def get_copies(self, obj):
+        return list(
+            obj.copies.order_by('copy_number', 'id')
+            .values('id', 'isbn', 'copy_number', 'condition', 'storage_location', 'available', 'due_date')
+        )
+
+
+# Read-only fast path for book list responses
+class BookFastListSerializer:
+    """
+    Read-only equivalent of ``BookSerializer(many=True)`` for list endpoints.
+
+    Rows are built straight from ``.values()`` dicts instead of model instances and
+    DRF field objects: the derived loan fields are computed once per row, and the
+    per-request constants (today, the viewer and their role, image URLs) are
+    resolved once per response. The output is identical to BookSerializer's.
+    """
+    # Columns read from the database (see get_values_queryset)
+    value_fields = (
+        "id", "title", "author", "isbn", "category", "language", "condition",
+        "available", "image", "borrower_id", "borrower__username", "borrow_date",
+        "due_date", "storage_location", "publisher", "publication_year",
+        "copy_number", "added_by_id", "added_by__username",
+    )
+    category_labels = dict(Book.CATEGORIES)
+    condition_labels = dict(Book.CONDITIONS)
+
+    def __init__(self, instance, context=None):
+        # `instance` is a queryset (values() is applied if needed) or an iterable of value dicts
+        self.instance = instance
+        self.context = context or {}
+
+    @classmethod
+    def get_values_queryset(cls, queryset, extra_fields=(), fields=None):
+        """
+        Turns a Book queryset into the .values() queryset this serializer consumes.
+        Annotations (e.g. search_rank) are kept so keyset cursors can order by them.
+        With a sparse fieldset (`fields`) only the columns those need are selected,
+        and borrower/added_by are only joined when their usernames are rendered.
+        """
+        columns = cls.value_fields if fields is None else book_columns(fields)
+        return queryset.values(*dict.fromkeys((*columns, *queryset.query.annotations, *extra_fields)))
+
+    def _rows(self):
+        rows = self.instance
+        if isinstance(rows, QuerySet) and rows._fields is None:
+            rows = self.get_values_queryset(rows, fields=self.context.get('fields'))
+        return rows
+
+    def iter_data(self, rows=None):
+        """Yields one serialized dict per row (used by streaming responses)."""
+        rows = self._rows() if rows is None else rows
+        fields = self.context.get('fields')
+        if fields is None:
+            yield from self._render(rows)
+            return
+        # Sparse fieldset: only the requested fields are computed, from the columns
+        # book_columns() selected for them
+        getters = self._field_getters(fields)
+        for row in rows:
+            yield {name: get(row) for name, get in getters}
+
+    def _viewer_access(self):
+        """(viewer id, privileged): who is asking decides whether borrower names are shown."""
+        viewer = get_viewer(self.context)
+        if viewer is not None and viewer.is_authenticated:
+            return viewer.pk, is_admin_or_librarian(viewer)
+        return None, False
+
+    def _image_urls(self):
+        """A function: stored image name -> (image, image_url), cached per name (copies repeat)."""
+        request = self.context.get('request')
+        storage = Book._meta.get_field('image').storage
+        cache = {}
+
+        def urls(image_name):
+            found = cache.get(image_name)
+            if found is None:
+                image = None
+                if image_name:
+                    image = storage.url(image_name)
+                    if request is not None:
+                        image = request.build_absolute_uri(image)
+                found = cache[image_name] = (image, book_image_url(image_name, request))
+            return found
+        return urls
+
+    def _field_getters(self, fields):
+        """(name, row -> value) pairs for a sparse fieldset, rendering like _render()."""
+        today = date.today()
+        viewer_id, privileged = self._viewer_access()
+        image_urls = self._image_urls()
+        category_labels = self.category_labels
+        condition_labels = self.condition_labels
+
+        def borrower(row):
+            if row["borrower_id"] is None:
+                return None
+            if viewer_id is not None and (row["borrower_id"] == viewer_id or privileged):
+                return row["borrower__username"]
+            return "Checked Out" # Generic placeholder for privacy
+
+        def days_left(row):
+            due_date = row["due_date"]
+            return (due_date - today).days if due_date and not row["available"] else None
+
+        def days_overdue(row):
+            days = days_left(row)
+            return -days if days is not None and days < 0 else 0
+
+        def isoformat(column):
+            return lambda row: row[column].isoformat() if row[column] else None
+
+        def integer(column):
+            return lambda row: int(row[column]) if row[column] is not None else None
+
+        derived = {
+            "category_display": lambda row: category_labels.get(row["category"], row["category"]),
+            "condition_display": lambda row: condition_labels.get(row["condition"], row["condition"]),
+            "available": lambda row: bool(row["available"]),
+            "image": lambda row: image_urls(row["image"])[0],
+            "image_url": lambda row: image_urls(row["image"])[1],
+            "borrower": borrower,
+            "borrow_date": isoformat("borrow_date"),
+            "due_date": isoformat("due_date"),
+            "publication_year": integer("publication_year"),
+            "copy_number": integer("copy_number"),
+            "added_by": itemgetter("added_by__username"),
+            "days_left": days_left,
+            "overdue": lambda row: days_overdue(row) > 0,
+            "days_overdue": days_overdue,
+            "due_today": lambda row: days_left(row) == 0,
+        }
+        # The other fields are columns of the same name
+        return [(name, derived.get(name) or itemgetter(name)) for name in fields]
+
+    def _render(self, rows):
+        today = date.today()
+        viewer_id, privileged = self._viewer_access()
+        image_urls = self._image_urls()
+        category_labels = self.category_labels
+        condition_labels = self.condition_labels
+
+        for row in rows:
+            urls = image_urls(row["image"])
+
+            borrower_id = row["borrower_id"]
+            borrower = None
+            if borrower_id is not None:
+                if viewer_id is not None and (borrower_id == viewer_id or privileged):
+                    borrower = row["borrower__username"]
+                else:
+                    borrower = "Checked Out" # Generic placeholder for privacy
+
+            due_date = row["due_date"]
+            days_left = (due_date - today).days if due_date and not row["available"] else None
+            borrow_date = row["borrow_date"]
+            publication_year = row["publication_year"]
+            copy_number = row["copy_number"]
+
+            yield {
+                "id": row["id"],
+                "title": row["title"],
+                "author": row["author"],
+                "isbn": row["isbn"],
+                "category": row["category"],
+                "category_display": category_labels.get(row["category"], row["category"]),
+                "language": row["language"],
+                "condition": row["condition"],
+                "condition_display": condition_labels.get(row["condition"], row["condition"]),
+                "available": bool(row["available"]),
+                "image": urls[0],
+                "image_url": urls[1],
+                "borrower": borrower,
+                "borrower_id": borrower_id,
+                "borrow_date": borrow_date.isoformat() if borrow_date else None,
+                "due_date": due_date.isoformat() if due_date else None,
+                "storage_location": row["storage_location"],
+                "publisher": row["publisher"],
+                "publication_year": int(publication_year) if publication_year is not None else None,
+                "copy_number": int(copy_number) if copy_number is not None else None,
+                "added_by": row["added_by__username"],
+                "added_by_id": row["added_by_id"],
+                "days_left": days_left,
+                "overdue": days_left is not None and days_left < 0,
+                "days_overdue": -days_left if days_left is not None and days_left < 0 else 0,
+                "due_today": days_left == 0,
+            }
+
+    @property
+    def data(self):
+        return list(self.iter_data())
+
+
+# Serializer for the loan ledger (read-only)
+class LoanSerializer(serializers.ModelSerializer):
+    action_display = serializers.CharField(source="get_action_display", read_only=True)
+
+    class Meta:
+        model = Loan
+        fields = ["id", "book_id", "user_id", "action", "action_display", "created_at", "due_date"]
+        read_only_fields = fields
+
+
+class HoldSerializer(serializers.ModelSerializer):
+    """A patron's place in the queue of a title (positions only grow, they are not renumbered)."""
+    title = serializers.CharField(source="work.title", read_only=True)
+    author = serializers.CharField(source="work.author", read_only=True)
+
+    class Meta:
+        model = Hold
+        fields = ["id", "work_id", "title", "author", "user_id", "position", "created_at"]
+        read_only_fields = fields
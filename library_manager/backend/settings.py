@@ -52,6 +52,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'backend.db_routers.ReplicaRoutingMiddleware', # Read-your-writes pinning for replica reads
+    'backend.async_views.AsyncEndpointsMiddleware', # ASGI requests use the async book read views
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -99,6 +101,10 @@ DATABASES = {
             'PASSWORD': 'SoftwareUser', # Consider using environment variables for sensitive data
             'HOST': 'localhost',
             'PORT': '3305',
+            # Keep each worker thread's connection open between requests instead of
+            # reconnecting per request; it is pinged before reuse after an idle period
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
             # Add options for UTF8 support if needed
             'OPTIONS': {
                 'charset': 'utf8mb4',
@@ -106,6 +112,56 @@ DATABASES = {
         }
     }
 
+# Read replicas (backend/db_routers.py): listing views read from these aliases.
+# Set DJANGO_DB_REPLICA_HOST (and optionally DJANGO_DB_REPLICA_PORT) to add one.
+DATABASE_ROUTERS = ['backend.db_routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+if os.environ.get('DJANGO_DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DJANGO_DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DJANGO_DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+# Seconds a client that wrote keeps reading from the primary (above the replication lag)
+REPLICA_PIN_SECONDS = 5
+
+# Pool of direct MySQL connections handed out by backend/db_config.get_db_connection()
+DB_POOL_SIZE = 5
+DB_POOL_TIMEOUT = 5.0 # Seconds to wait for a free connection
+DB_POOL_MAX_IDLE = 300.0 # Seconds before an idle pooled connection is replaced
+
+# Caches: local memory per process by default. Set DJANGO_CACHE_DIR to share a
+# file-based cache between worker processes (no external service needed).
+if os.environ.get('DJANGO_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['DJANGO_CACHE_DIR'],
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'library-manager',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Seconds a cached book list/detail response lives (0 disables the cache); see backend/response_cache.py
+BOOK_RESPONSE_CACHE_TIMEOUT = 300
+
+# ProfileModelBackend loads request.user together with its UserProfile (one query
+# instead of two per request). ModelBackend stays listed so that sessions created
+# before the switch (which store its path) remain valid.
+AUTHENTICATION_BACKENDS = [
+    'backend.auth_backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -166,3 +222,16 @@ CSRF_COOKIE_SECURE = True  # If using HTTPS
 SESSION_COOKIE_SECURE = True  # Ensures cookies are only sent over HTTPS
 SESSION_COOKIE_HTTPONLY = True  # Prevents JS access to session cookie
 SESSION_COOKIE_SAMESITE = 'Lax'  # Controls cross-site request behavior
+
+# Delta sync (backend/change_log.py): change log entries younger than this are held back, so a
+# transaction committing late cannot add an entry below a change token already handed out
+BOOK_CHANGE_SETTLE_SECONDS = 2
+
+# Server-sent availability feed (backend/availability_feed.py, ASGI only): events kept per
+# process for clients resuming with Last-Event-ID, and seconds between keep-alive comments
+AVAILABILITY_FEED_HISTORY = 1000
+AVAILABILITY_FEED_HEARTBEAT = 15
+
+# Seconds a user's role (UserProfile.type) stays in the cache for permission checks.
+# Profile saves clear it at once in this process; see backend/roles.py.
+ROLE_CACHE_TIMEOUT = 60
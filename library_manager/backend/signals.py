@@ -0,0 +1,226 @@
+"""
+Model signal handlers, connected in BackendConfig.ready().
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .change_log import record_book_changes
+from .models import Book, UserProfile
+from .response_cache import invalidate_book_responses
+from .roles import clear_cached_role
+from .search import index_book
+from .works import DETAIL_FIELDS, KEY_FIELDS, adjust_work_counts, get_work_id, work_key
+
+# Fields whose words end up in the search index
+SEARCH_INDEXED_FIELDS = {'title', 'author', 'isbn'}
+# Fields that decide whether (and to whom) a book is on loan
+LOAN_FIELDS = {'available', 'borrower'}
+# Fields that decide the work of a book and its share of the work's counters
+WORK_FIELDS = {'work', 'available', *KEY_FIELDS}
+WORK_DETAIL_FIELDS = {'image', *DETAIL_FIELDS}
+
+_bulk_delete = ContextVar('backend_bulk_book_delete', default=False)
+
+
+@contextmanager
+def bulk_book_delete():
+    """
+    Mutes the per-book post_delete handlers below: the caller releases the loan
+    counters, recounts the works, drops the cached responses and logs the
+    deletions once for the whole batch (catalogue_bulk.delete_books()).
+    """
+    token = _bulk_delete.set(True)
+    try:
+        yield
+    finally:
+        _bulk_delete.reset(token)
+
+
+@receiver(post_save, sender=Book, dispatch_uid='backend_index_book')
+def update_book_search_index(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Keeps the book's search tokens in sync (deleted books lose them via CASCADE)."""
+    if raw:
+        return # loaddata: run rebuild_search_index afterwards
+    if update_fields is not None and not SEARCH_INDEXED_FIELDS.intersection(update_fields):
+        return
+    index_book(instance)
+
+
+# --- UserProfile.active_loans for loans changed outside backend/circulation.py ---
+# Borrow/return use QuerySet.update() and adjust the counter themselves (no signals fire).
+# These handlers cover Book.save()/delete() from the admin, the book API, fixtures and tests.
+
+def _loan_holder(available, borrower_id):
+    return borrower_id if borrower_id is not None and not available else None
+
+
+def _adjust_active_loans(user_id, delta):
+    if user_id is None:
+        return
+    loans = UserProfile.objects.filter(user_id=user_id)
+    if delta < 0:
+        loans = loans.filter(active_loans__gt=0)
+    loans.update(active_loans=F('active_loans') + delta)
+
+
+@receiver(pre_save, sender=Book, dispatch_uid='backend_remember_stored_book')
+def remember_stored_book(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Reads the stored loan holder and work of the book once, for the handlers below."""
+    instance._loan_holder_before = None
+    instance._work_before = None # (work_id, available)
+    instance._work_key_before = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not (LOAN_FIELDS | WORK_FIELDS).intersection(update_fields):
+        instance._loan_holder_before = _loan_holder(instance.available, instance.borrower_id)
+        instance._work_before = (instance.work_id, instance.available)
+        return
+    previous = Book.objects.filter(pk=instance.pk).values('available', 'borrower_id', 'work_id', *KEY_FIELDS).first()
+    if previous:
+        instance._loan_holder_before = _loan_holder(previous['available'], previous['borrower_id'])
+        instance._work_before = (previous['work_id'], previous['available'])
+        instance._work_key_before = work_key(SimpleNamespace(**previous))
+
+
+@receiver(post_save, sender=Book, dispatch_uid='backend_count_active_loans')
+def update_active_loans_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return # loaddata: run reconcile_active_loans afterwards
+    before = getattr(instance, '_loan_holder_before', None)
+    after = _loan_holder(instance.available, instance.borrower_id)
+    if before != after:
+        _adjust_active_loans(before, -1)
+        _adjust_active_loans(after, 1)
+
+
+@receiver(post_delete, sender=Book, dispatch_uid='backend_release_active_loans')
+def update_active_loans_on_delete(sender, instance, **kwargs):
+    if _bulk_delete.get():
+        return
+    _adjust_active_loans(_loan_holder(instance.available, instance.borrower_id), -1)
+
+
+# --- Works (titles) and their copy counters (backend/works.py) ---
+# Borrow/return and bulk writes keep the counters in step themselves (no signals fire).
+
+@receiver(pre_save, sender=Book, dispatch_uid='backend_assign_book_work')
+def assign_book_work(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Points the book at the work of its title/author/language, also when they change."""
+    if raw or (update_fields is not None and 'work' not in update_fields):
+        return
+    if instance.work_id is None or instance._work_key_before not in (None, work_key(instance)):
+        instance.work_id = get_work_id(instance)
+
+
+@receiver(post_save, sender=Book, dispatch_uid='backend_count_work_copies')
+def update_work_counts_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return # loaddata: call works.refresh_work_counts() afterwards
+    details = update_fields is None or bool(WORK_DETAIL_FIELDS.intersection(update_fields))
+    book = instance if details else None
+    before = None if created else instance._work_before
+    if before is None:
+        adjust_work_counts(instance.work_id, copies=int(created), available=int(created and instance.available), book=book)
+    elif before[0] != instance.work_id:
+        adjust_work_counts(before[0], copies=-1, available=-int(before[1]))
+        adjust_work_counts(instance.work_id, copies=1, available=int(instance.available), book=book)
+    else:
+        adjust_work_counts(instance.work_id, available=int(instance.available) - int(before[1]), book=book)
+
+
+@receiver(post_delete, sender=Book, dispatch_uid='backend_count_work_copies_on_delete')
+def update_work_counts_on_delete(sender, instance, **kwargs):
+    if _bulk_delete.get():
+        return
+    adjust_work_counts(instance.work_id, copies=-1, available=-int(instance.available))
+
+
+# --- Cached roles (backend/roles.py) ---
+
+@receiver(post_save, sender=UserProfile, dispatch_uid='backend_clear_role_on_save')
+@receiver(post_delete, sender=UserProfile, dispatch_uid='backend_clear_role_on_delete')
+def clear_role_on_profile_change(sender, instance, **kwargs):
+    """Drops the cached role of the profile's user (e.g. after promote_user_to_librarian)."""
+    clear_cached_role(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid='backend_clear_role_of_new_user')
+def clear_role_of_new_user(sender, instance, created, **kwargs):
+    """A new user may reuse the id of a deleted one (e.g. after a rollback): never inherit its role."""
+    if created:
+        clear_cached_role(instance.pk)
+
+
+# --- Cached book responses (backend/response_cache.py) ---
+
+@receiver(post_save, sender=Book, dispatch_uid='backend_book_responses_on_save')
+@receiver(post_delete, sender=Book, dispatch_uid='backend_book_responses_on_delete')
+def invalidate_book_responses_on_book_change(sender, **kwargs):
+    if not _bulk_delete.get():
+        invalidate_book_responses()
+
+
+@receiver(pre_save, sender=get_user_model(), dispatch_uid='backend_remember_stored_username')
+def remember_stored_username(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Reads the stored username once, so that renames can be told from other user saves."""
+    instance._username_before = instance.username
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and 'username' not in update_fields:
+        return # e.g. login (last_login only)
+    stored = sender.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+    if stored is not None:
+        instance._username_before = stored
+
+
+def _renamed(instance, created):
+    return not created and getattr(instance, '_username_before', instance.username) != instance.username
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid='backend_book_responses_on_user_save')
+def invalidate_book_responses_on_rename(sender, instance, created, **kwargs):
+    """Book responses show usernames (added_by, borrower): only renames make them stale."""
+    if _renamed(instance, created):
+        invalidate_book_responses()
+
+
+@receiver(post_delete, sender=get_user_model(), dispatch_uid='backend_book_responses_on_user_delete')
+def invalidate_book_responses_on_user_delete(sender, **kwargs):
+    invalidate_book_responses() # added_by/borrower are cleared without Book signals
+
+
+# --- Catalogue change log (backend/change_log.py) ---
+
+@receiver(post_save, sender=Book, dispatch_uid='backend_log_book_save')
+def log_book_save(sender, instance, **kwargs):
+    record_book_changes([instance.pk])
+
+
+@receiver(post_delete, sender=Book, dispatch_uid='backend_log_book_delete')
+def log_book_delete(sender, instance, **kwargs):
+    if _bulk_delete.get():
+        return
+    record_book_changes([instance.pk], deleted=True)
+
+
+def _books_showing(user):
+    return Book.objects.filter(Q(added_by=user) | Q(borrower=user)).values_list('id', flat=True)
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid='backend_log_user_rename')
+def log_user_rename(sender, instance, created, **kwargs):
+    """Other user saves (password, email, ...) do not touch the books (see remember_stored_username)."""
+    if _renamed(instance, created):
+        record_book_changes(list(_books_showing(instance)))
+
+
+@receiver(pre_delete, sender=get_user_model(), dispatch_uid='backend_log_user_delete')
+def log_user_delete(sender, instance, **kwargs):
+    """added_by/borrower of the user's books are cleared (SET_NULL) without Book signals."""
+    record_book_changes(list(_books_showing(instance)))
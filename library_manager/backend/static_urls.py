@@ -0,0 +1,215 @@
+"""
+Memoized static URL resolution for book covers and user avatars.
+
+Resolving a stored ImageField name to an absolute static URL (prefix cleanup,
+static(), build_absolute_uri()) used to run for every serialized row, although
+a catalogue only has a handful of distinct covers. Results are kept in a bounded
+LRU cache keyed on (kind, stored name, scheme://host). The cache is dropped when
+the static settings change or when collectstatic rewrites the collected files.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.templatetags.static import static
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BOOK_IMAGE = 'images/library_seal.jpg' # Default image relative to static root
+DEFAULT_AVATAR = 'images/avatars/default.svg'
+
+
+class StaticURLCache:
+    """Thread-safe bounded LRU mapping with hit/miss counters."""
+
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.clears = 0
+
+    def get_or_resolve(self, key, resolver):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+        # Resolve outside the lock; a concurrent miss for the same key just computes it twice
+        value = resolver()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.clears += 1
+
+    def info(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'clears': self.clears,
+            }
+
+
+_cache = StaticURLCache(getattr(settings, 'STATIC_URL_CACHE_SIZE', 2048))
+_stamp_lock = threading.Lock()
+_stamp = None
+_stamp_checked_at = 0.0
+
+
+def _collection_stamp():
+    """
+    Fingerprint of the collected static files: the manifest's mtime for hashed
+    (manifest) storages, otherwise the mtime of STATIC_ROOT. Changes on collectstatic.
+    """
+    try:
+        if hasattr(staticfiles_storage, 'manifest_name'):
+            return os.stat(staticfiles_storage.path(staticfiles_storage.manifest_name)).st_mtime_ns
+        if settings.STATIC_ROOT:
+            return os.stat(settings.STATIC_ROOT).st_mtime_ns
+    except (OSError, NotImplementedError):
+        pass
+    return None
+
+
+def _check_collection_stamp():
+    """Clears the cache if static files were recollected (checked at most every few seconds)."""
+    global _stamp, _stamp_checked_at
+    now = time.monotonic()
+    if now - _stamp_checked_at < getattr(settings, 'STATIC_URL_CACHE_CHECK_INTERVAL', 5):
+        return
+    with _stamp_lock:
+        _stamp_checked_at = now
+        stamp = _collection_stamp()
+        if stamp != _stamp:
+            if _stamp is not None:
+                _cache.clear()
+            _stamp = stamp
+
+
+def clear_static_url_cache():
+    global _stamp_checked_at
+    _cache.clear()
+    _stamp_checked_at = 0.0
+
+
+def static_url_cache_info():
+    """Hit/miss counters for monitoring (see the cache stats API view)."""
+    return _cache.info()
+
+
+@receiver(setting_changed)
+def _static_settings_changed(*, setting, **kwargs):
+    if setting in {'STATIC_URL', 'STATIC_ROOT', 'STORAGES', 'STATICFILES_STORAGE', 'STATICFILES_DIRS'}:
+        clear_static_url_cache()
+
+
+def _scheme_host(request):
+    try:
+        return f"{request.scheme}://{request.get_host()}"
+    except Exception: # e.g. DisallowedHost: fall back to relative URLs like before
+        return None
+
+
+def _absolute(request, path):
+    """Absolute URI for a static path, or the path itself if that is not possible."""
+    try:
+        return request.build_absolute_uri(path)
+    except Exception as e:
+        logger.warning("Error building absolute URI for '%s': %s", path, e)
+        return path # Return the path itself (/static/...)
+
+
+def _resolve(kind, name, request, resolve_path):
+    _check_collection_stamp()
+    path = _cache.get_or_resolve((kind, name, None), lambda: resolve_path(name))
+    if not request or not path:
+        return path
+    scheme_host = _scheme_host(request)
+    if scheme_host is None or not path.startswith('/') or path.startswith('//'):
+        # The result would depend on more than scheme/host (or the host is invalid)
+        return _absolute(request, path)
+    return _cache.get_or_resolve((kind, name, scheme_host), lambda: _absolute(request, path))
+
+
+def _book_image_path(image_name):
+    image_path_resolved = None # The final path
+
+    if image_name:
+        image_name = image_name.strip() # Get the stored name and strip whitespace
+
+        # --- Clean the stored image name ---
+        # Remove potential leading prefixes that might have been saved incorrectly
+        prefixes_to_remove = ['static/images/', '/static/images/', 'images/']
+        for prefix in prefixes_to_remove:
+            if image_name.startswith(prefix):
+                image_name = image_name[len(prefix):]
+                break # Remove only the first matching prefix
+
+        # --- Construct the path for the static tag ---
+        # We assume all book images belong under an 'images/' directory
+        # within the static files structure.
+        # If image_name is 'covers/book.jpg', static_file_path becomes 'images/covers/book.jpg'
+        static_file_path = f"images/{image_name}"
+
+        try:
+            # static() will prepend STATIC_URL ('/static/')
+            image_path_resolved = static(static_file_path)
+        except (ValueError, FileNotFoundError): # Handle case where static file doesn't exist
+            logger.warning("Static file not found for book image: '%s'. Using default.", static_file_path)
+
+    # If no valid image path or static file not found, use the default
+    if not image_path_resolved:
+        try:
+            image_path_resolved = static(DEFAULT_BOOK_IMAGE)
+        except (ValueError, FileNotFoundError):
+            logger.warning("Default static file not found: '%s'", DEFAULT_BOOK_IMAGE)
+            image_path_resolved = f"{settings.STATIC_URL}{DEFAULT_BOOK_IMAGE}" # Construct manually as last resort
+    return image_path_resolved
+
+
+def _avatar_path(avatar_name):
+    avatar_path = None
+    if avatar_name:
+        # The view saves names with the 'avatars/' prefix (e.g. 'avatars/user-1.svg'),
+        # which live under 'images/' in the static files. Bare file names are also accepted.
+        if 'avatars/' in avatar_name:
+            avatar_path = static(f"images/{avatar_name}")
+        else:
+            avatar_path = static(f"images/avatars/{avatar_name}")
+
+    # If no valid avatar path was derived, use the default
+    return avatar_path or static(DEFAULT_AVATAR)
+
+
+def book_image_url(image_name, request=None):
+    """
+    Resolves a stored book image name (e.g. 'static/images/covers/x.jpg') to the
+    static URL of the cover, absolute if a request is given.
+    """
+    return _resolve('book', image_name or None, request, _book_image_path)
+
+
+def avatar_url(avatar_name, request=None):
+    """Resolves a stored avatar name (e.g. 'avatars/user-1.svg') to its static URL."""
+    return _resolve('avatar', avatar_name or None, request, _avatar_path)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for the ASGI book endpoints (backend/async_views.py).
+AsyncClient requests go through the ASGI handler, so they are routed to the async
+views; their responses must match what the DRF views return over WSGI.
+"""
+import json
+from datetime import date
+
+from asgiref.sync import async_to_sync
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase
+from backend.availability_feed import RESET_EVENT, get_broadcaster
+from backend.circulation import LOAN_PERIOD
+from backend.models import Book
+
+
+@override_settings(BOOK_RESPONSE_CACHE_TIMEOUT=0) # Both sides build their response
+class AsyncBookViewsTestCase(LibraryAPITestCaseBase):
+
+    def _login_both(self, user_type):
+        user = self._login_user(user_type)
+        self.async_client.force_login(user)
+        return user
+
+    def _aget(self, url, *args, **kwargs):
+        return async_to_sync(self.async_client.get)(url, *args, **kwargs)
+
+    def _assert_same(self, url, params=None):
+        expected = self.client.get(url, params or {})
+        response = self._aget(url, params or {})
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        return response
+
+    def test_anonymous_requests_are_rejected(self):
+        for url in (self.book_list_create_url, self.book_detail_url(self.book1.id), self.borrowed_books_list_url):
+            self.assertEqual(self._aget(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_book_list_matches_sync_view(self):
+        self._login_both('user1')
+        self._assert_same(self.book_list_create_url)
+        self._assert_same(self.book_list_create_url, {'category': 'SF', 'ordering': '-title'})
+        self._assert_same(self.book_list_create_url, {'search': 'test'})
+        self._assert_same(self.book_list_create_url, {'available': 'maybe'}) # 400 from the filterset
+
+    def test_book_list_pages_match_sync_view(self):
+        self._login_both('user2')
+        response = self._assert_same(self.book_list_create_url, {'page_size': 1, 'ordering': 'title'})
+        self.assertIsNotNone(response.json()['next'])
+        self._assert_same(response.json()['next'])
+        self._assert_same(self.book_list_create_url, {'cursor': 'garbage'}) # 404 Invalid cursor
+
+    def test_book_detail_matches_sync_view(self):
+        for user_type in ('user1', 'user2', 'librarian'):
+            self._login_both(user_type)
+            self._assert_same(self.book_detail_url(self.borrowed_book.id))
+        self._assert_same(self.book_detail_url(999999))
+
+    def test_borrowed_books_match_sync_view(self):
+        for user_type in ('user1', 'user2', 'admin'):
+            self._login_both(user_type)
+            self._assert_same(self.borrowed_books_list_url)
+        self._assert_same(self.borrowed_books_list_url, {'page_size': 1})
+
+    def test_conditional_get(self):
+        self._login_both('user2')
+        url = self.book_detail_url(self.book1.id)
+        with override_settings(BOOK_RESPONSE_CACHE_TIMEOUT=300):
+            first = self._aget(url)
+            self.assertEqual(first['ETag'], self.client.get(url)['ETag']) # Same validators as over WSGI
+            response = self._aget(url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_writes_go_to_the_drf_views(self):
+        self._login_both('librarian')
+        response = async_to_sync(self.async_client.patch)(
+            self.book_detail_url(self.book1.id), {'title': 'Async Renamed'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Book.objects.get(id=self.book1.id).title, 'Async Renamed')
+        self.assertEqual(self._aget(self.book_detail_url(self.book1.id)).json()['title'], 'Async Renamed')
+
+        self._login_both('user2')
+        response = async_to_sync(self.async_client.post)(self.book_list_create_url, {'title': 'Nope'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AvailabilityFeedTestCase(LibraryAPITestCaseBase):
+    """The server-sent availability feed (backend/availability_feed.py), ASGI only."""
+
+    def _read(self, url, chunks, **kwargs):
+        """The status, headers and first `chunks` messages of a feed response."""
+        async def read():
+            response = await self.async_client.get(url, **kwargs)
+            if not response.streaming:
+                return response, []
+            received = []
+            async for chunk in response.streaming_content:
+                received.append(chunk.decode())
+                if len(received) == chunks:
+                    break
+            await response.streaming_content.aclose() # Disconnects the client
+            return response, received
+        return async_to_sync(read)()
+
+    def test_anonymous_requests_are_rejected(self):
+        response, _ = self._read(reverse('book-availability-feed', urlconf='backend.asgi_urls'), 1)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_borrow_and_return_are_replayed_after_last_event_id(self):
+        self._login_user('user2')
+        self.async_client.force_login(self.user2)
+        start = get_broadcaster().publish({'id': 0}) # Resume point
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.book_borrow_url(self.book1.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.book_return_url(self.book1.id))
+
+        url = reverse('book-availability-feed', urlconf='backend.asgi_urls')
+        response, messages = self._read(url, 3, headers={'Last-Event-ID': start})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(messages[0].startswith('retry:'))
+        borrowed, returned = (message.split('data: ')[1] for message in messages[1:])
+        self.assertEqual(json.loads(borrowed), {
+            'id': self.book1.id, 'available': False, 'due_date': (date.today() + LOAN_PERIOD).isoformat(),
+        })
+        self.assertEqual(json.loads(returned), {'id': self.book1.id, 'available': True, 'due_date': None})
+        self.assertEqual(get_broadcaster().subscriber_count(), 0) # Unsubscribed on disconnect
+
+    @override_settings(AVAILABILITY_FEED_HEARTBEAT=0.01)
+    def test_stale_token_resets_and_idle_stream_sends_keep_alives(self):
+        self.async_client.force_login(self.user2)
+        url = reverse('book-availability-feed', urlconf='backend.asgi_urls')
+        _, messages = self._read(url + '?last_event_id=stale-1', 3)
+        self.assertEqual(messages[1:], [RESET_EVENT, ': keep-alive\n\n'])
+
+    def test_not_routed_over_wsgi(self):
+        self._login_user('user2')
+        self.assertEqual(self.client.get('/api/books/availability/').status_code, status.HTTP_404_NOT_FOUND)
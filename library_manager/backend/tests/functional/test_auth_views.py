@@ -3,6 +3,7 @@
 Functional tests for Authentication related API views (Register, Login, Logout).
 """
 from django.contrib.auth import get_user_model, SESSION_KEY
+from django.core.cache import cache
 from rest_framework import status
 
 # Import the base test case
@@ -171,4 +172,36 @@ class AuthViewsTestCase(LibraryAPITestCaseBase):
         """Attempt logout without being logged in."""
         response = self.client.post(self.logout_url)
         # DRF defaults usually return 403 Forbidden if authentication fails for IsAuthenticated
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class ProfileModelBackendTestCase(LibraryAPITestCaseBase):
+    """request.user is loaded with its profile in one query (backend/auth_backends.py)."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear() # No cached roles: permission checks must read the loaded profile
+
+    def test_current_user_needs_no_profile_query(self):
+        self._login_user('user1')
+        with self.assertNumQueries(2): # Session + user joined with profile
+            response = self.client.get(self.current_user_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['profile']['type'], USER_TYPE)
+
+    def test_admin_permission_check_needs_no_profile_query(self):
+        self._login_user('admin')
+        with self.assertNumQueries(3): # Session + user joined with profile + user list
+            response = self.client.get(self.user_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_login_returns_user_with_profile(self):
+        login_data = {'username': self.user1.username, 'password': 'password123'}
+        response = self.client.post(self.login_url, login_data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['profile']['type'], USER_TYPE)
+        self.assertEqual(self.client.session['_auth_user_backend'], 'backend.auth_backends.ProfileModelBackend')
+
+    def test_sessions_of_the_default_backend_stay_valid(self):
+        self.client.force_login(self.user1, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(self.current_user_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for batch borrowing and returning (BatchBorrowView, BatchReturnView).
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase, TEST_BOOK_ISBN_2
+from backend.circulation import MAX_BATCH_SIZE, MAX_BORROW_LIMIT
+from backend.models import Book, Loan, UserProfile
+
+
+class BatchCirculationViewsTestCase(LibraryAPITestCaseBase):
+
+    def setUp(self):
+        super().setUp()
+        self.batch_borrow_url = reverse('book-batch-borrow')
+        self.batch_return_url = reverse('book-batch-return')
+
+    def _post(self, url, books, **extra):
+        return self.client.post(url, {'books': books, **extra}, format='json')
+
+    def _active_loans(self, user):
+        return UserProfile.objects.get(user=user).active_loans
+
+    def test_authentication_required(self):
+        for url in (self.batch_borrow_url, self.batch_return_url):
+            self.assertEqual(self._post(url, [self.book1.id]).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_borrow_by_id_and_isbn_reports_each_item(self):
+        user = self._login_user('user2')
+        response = self._post(self.batch_borrow_url, [self.book1.id, TEST_BOOK_ISBN_2, self.borrowed_book.id, 999999])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['message'], 'Borrowed 2 of 4 books')
+
+        ok, by_isbn, unavailable, unknown = response.data['results']
+        self.assertEqual((ok['item'], ok['ok'], ok['book']['id']), (self.book1.id, True, self.book1.id))
+        self.assertEqual((by_isbn['ok'], by_isbn['book']['id']), (True, self.book2.id))
+        self.assertFalse(by_isbn['book']['available'])
+        self.assertEqual((unavailable['ok'], unavailable['status']), (False, status.HTTP_400_BAD_REQUEST))
+        self.assertIn('currently unavailable', unavailable['error'])
+        self.assertEqual((unknown['ok'], unknown['status']), (False, status.HTTP_404_NOT_FOUND))
+
+        self.assertEqual(
+            set(Book.objects.filter(borrower=user, available=False).values_list('id', flat=True)),
+            {self.book1.id, self.book2.id},
+        )
+        self.assertEqual(self._active_loans(user), 2)
+        self.assertEqual(Loan.objects.filter(user_id=user.id, action=Loan.BORROW).count(), 2)
+
+    def test_borrow_limit_is_checked_once_for_the_batch(self):
+        user = self._login_user('user2')
+        extra = [
+            Book.objects.create(title=f'Extra {n}', author='Author', isbn=f'978000000010{n}', added_by=self.librarian_user)
+            for n in range(MAX_BORROW_LIMIT)
+        ]
+        books = [self.book1.id] + [book.id for book in extra]
+        response = self._post(self.batch_borrow_url, books)
+        results = response.data['results']
+        self.assertEqual([result['ok'] for result in results], [True] * MAX_BORROW_LIMIT + [False])
+        self.assertIn('Borrow limit reached', results[-1]['error'])
+        self.assertEqual(self._active_loans(user), MAX_BORROW_LIMIT)
+        self.assertTrue(Book.objects.get(id=extra[-1].id).available)
+
+    def test_statement_count_does_not_grow_with_the_batch(self):
+        self._login_user('librarian')
+        with CaptureQueriesContext(connection) as one:
+            self._post(self.batch_borrow_url, [self.book1.id])
+        self._post(self.batch_return_url, [self.book1.id])
+        with CaptureQueriesContext(connection) as two:
+            self._post(self.batch_borrow_url, [self.book1.id, self.book2.id])
+        self.assertEqual(len(two), len(one))
+
+    def test_duplicate_items_fail(self):
+        self._login_user('user2')
+        response = self._post(self.batch_borrow_url, [self.book1.id, TEST_BOOK_ISBN_2, self.book2.id])
+        self.assertEqual([result['ok'] for result in response.data['results']], [True, True, False])
+        self.assertIn('more than once', response.data['results'][2]['error'])
+
+    def test_return_own_books_only(self):
+        user = self._login_user('user2')
+        self._post(self.batch_borrow_url, [self.book1.id, self.book2.id])
+        response = self._post(self.batch_return_url, [self.book1.id, self.borrowed_book.id, self.book_for_filter.id])
+        self.assertEqual(response.data['message'], 'Returned 1 of 3 books')
+        returned, not_mine, available = response.data['results']
+        self.assertTrue(returned['ok'] and returned['book']['available'])
+        self.assertEqual(not_mine['status'], status.HTTP_403_FORBIDDEN)
+        self.assertEqual(available['error'], 'Book is already available.')
+        self.assertEqual(self._active_loans(user), 1)
+        self.assertFalse(Book.objects.get(id=self.borrowed_book.id).available)
+
+    def test_librarian_lends_and_returns_for_patrons(self):
+        self._login_user('librarian')
+        response = self._post(self.batch_borrow_url, [self.book1.id], user=self.user2.id)
+        self.assertTrue(response.data['results'][0]['ok'])
+        self.assertEqual(Book.objects.get(id=self.book1.id).borrower, self.user2)
+
+        response = self._post(self.batch_return_url, [self.book1.id, self.borrowed_book.id])
+        self.assertEqual(response.data['message'], 'Returned 2 of 2 books')
+        self.assertEqual((self._active_loans(self.user2), self._active_loans(self.user1)), (0, 0))
+        self.assertEqual(
+            list(Loan.objects.filter(action=Loan.RETURN).order_by('id').values_list('user_id', flat=True)),
+            [self.user2.id, self.user1.id],
+        )
+
+    def test_regular_user_cannot_lend_to_others(self):
+        self._login_user('user1')
+        response = self._post(self.batch_borrow_url, [self.book1.id], user=self.user2.id)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(Book.objects.get(id=self.book1.id).available)
+
+    def test_invalid_bodies(self):
+        self._login_user('user2')
+        for books in (None, [], 'abc', [True], [[1]], [self.book1.id] * (MAX_BATCH_SIZE + 1)):
+            with self.subTest(books=books):
+                self.assertEqual(self._post(self.batch_borrow_url, books).status_code, status.HTTP_400_BAD_REQUEST)
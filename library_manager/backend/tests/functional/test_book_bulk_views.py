@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for bulk catalogue changes (BookBulkView, backend/catalogue_bulk.py).
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase, TEST_BOOK_ISBN, TEST_BOOK_ISBN_2
+from backend.catalogue_bulk import delete_books
+from backend.models import Book, BookChange, BookSearchToken, UserProfile
+
+
+def _new_books(count, start=0):
+    return [
+        {'title': f'Donated {n}', 'author': 'Donor', 'isbn': f'97850000{n:05d}', 'category': 'TXT',
+         'language': 'English', 'condition': 'GD'}
+        for n in range(start, start + count)
+    ]
+
+
+class BookBulkViewsTestCase(LibraryAPITestCaseBase):
+
+    def setUp(self):
+        super().setUp()
+        self.bulk_url = reverse('book-bulk')
+
+    def test_librarians_only(self):
+        for user_type in (None, 'user1'):
+            if user_type:
+                self._login_user(user_type)
+            response = self.client.post(self.bulk_url, _new_books(1), format='json')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_create_validates_and_inserts_in_batches(self):
+        user = self._login_user('librarian')
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.bulk_url, _new_books(2), format='json')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(self.bulk_url, _new_books(40, start=10), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(large), len(small)) # No per-book queries (uniqueness, INSERT, ...)
+
+        created = Book.objects.filter(id__in=response.data['created'])
+        self.assertEqual(created.count(), 40)
+        self.assertEqual(set(created.values_list('added_by', flat=True)), {user.id})
+        self.assertEqual(list(created.order_by('id').values_list('id', flat=True)), response.data['created'])
+        self.assertTrue(BookSearchToken.objects.filter(book_id=response.data['created'][0], token='donated').exists())
+        self.assertEqual(BookChange.objects.filter(book_id__in=response.data['created']).count(), 40)
+        # Visible through the (cached) list right away
+        self.assertEqual(len(self.client.get(self.book_list_create_url, {'search': 'donated'}).data), 42)
+
+    def test_create_reports_errors_per_item(self):
+        self._login_user('librarian')
+        books = _new_books(3)
+        books[1]['isbn'] = TEST_BOOK_ISBN # Taken
+        books[2]['isbn'] = books[0]['isbn'] # Twice in the batch
+        books.append({'title': 'No ISBN', 'author': 'Anon', 'category': 'TXT', 'language': 'English', 'condition': 'GD'})
+        response = self.client.post(self.bulk_url, books, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sorted(response.data), [1, 2, 3]) # Errors by item index
+        self.assertEqual(response.data[1]['isbn'], ['book with this isbn already exists.'])
+        self.assertEqual(response.data[2]['isbn'], ['book with this isbn already exists.'])
+        self.assertIn('isbn', response.data[3])
+        self.assertFalse(Book.objects.filter(author='Donor').exists()) # All-or-nothing
+
+    def test_partial_update(self):
+        self._login_user('librarian')
+        response = self.client.patch(self.bulk_url, [
+            {'id': self.book1.id, 'title': 'Renamed One'},
+            {'id': self.book2.id, 'isbn': '9785999999999', 'condition': 'PO'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], [self.book1.id, self.book2.id])
+        book1, book2 = Book.objects.get(id=self.book1.id), Book.objects.get(id=self.book2.id)
+        self.assertEqual((book1.title, book1.isbn), ('Renamed One', TEST_BOOK_ISBN))
+        self.assertEqual((book2.isbn, book2.condition, book2.title), ('9785999999999', 'PO', self.book2.title))
+        self.assertTrue(BookSearchToken.objects.filter(book_id=self.book1.id, token='renamed').exists())
+
+    def test_update_errors(self):
+        self._login_user('librarian')
+        response = self.client.patch(self.bulk_url, [
+            {'id': self.book1.id, 'isbn': TEST_BOOK_ISBN}, # Its own ISBN: fine
+            {'id': self.book2.id, 'isbn': TEST_BOOK_ISBN}, # Someone else's
+            {'id': 999999, 'title': 'Missing'},
+            {'id': self.book1.id, 'title': 'Twice'},
+            {'title': 'No id'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sorted(response.data), [1, 2, 3, 4])
+        self.assertIn('isbn', response.data[1])
+        self.assertEqual([sorted(response.data[index]) for index in (2, 3, 4)], [['id'], ['id'], ['id']])
+        self.assertEqual(Book.objects.get(id=self.book2.id).isbn, TEST_BOOK_ISBN_2)
+
+    def test_delete_in_chunks_releases_loans(self):
+        self._login_user('librarian')
+        UserProfile.objects.filter(user=self.user1).update(active_loans=1) # borrowed_book
+        ids = [self.book1.id, self.book2.id, self.borrowed_book.id, 999999]
+        self.assertEqual(sorted(delete_books(ids, chunk_size=2)), sorted(ids[:3]))
+        self.assertFalse(Book.objects.filter(id__in=ids).exists())
+        self.assertFalse(BookSearchToken.objects.filter(book_id__in=ids).exists())
+        self.assertEqual(UserProfile.objects.get(user=self.user1).active_loans, 0)
+        self.assertEqual(
+            set(BookChange.objects.filter(kind=BookChange.DELETE).values_list('book_id', flat=True)), set(ids[:3])
+        )
+
+    def test_delete_applies_each_change_once(self):
+        UserProfile.objects.filter(user=self.user1).update(active_loans=2) # borrowed_book and another loan
+        with CaptureQueriesContext(connection) as one:
+            delete_books([self.book2.id])
+        with CaptureQueriesContext(connection) as two:
+            delete_books([self.book1.id, self.borrowed_book.id, self.book_for_filter.id])
+        self.assertEqual(len(two), len(one) + 1) # + the loan counter release, not per book
+        self.assertEqual(UserProfile.objects.get(user=self.user1).active_loans, 1)
+        self.assertEqual(BookChange.objects.filter(book_id=self.book1.id, kind=BookChange.DELETE).count(), 1)
+
+    def test_delete_endpoint(self):
+        self._login_user('admin')
+        response = self.client.delete(self.bulk_url, {'ids': [self.book1.id, self.book2.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], sorted([self.book1.id, self.book2.id]))
+        self.assertEqual(self.client.get(self.book_detail_url(self.book1.id)).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_bodies(self):
+        self._login_user('librarian')
+        self.assertEqual(self.client.post(self.bulk_url, [], format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.patch(self.bulk_url, {'id': 1}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        for body in ({}, {'ids': ['a']}, {'ids': [True]}):
+            with self.subTest(body=body):
+                response = self.client.delete(self.bulk_url, body, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for the book list/detail response cache (backend/response_cache.py).
+"""
+from django.test import override_settings
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase
+from backend.models import Book
+from backend.response_cache import get_version
+
+# Session + user (with profile): all a cached response costs
+CACHED_QUERIES = 2
+
+
+class BookResponseCacheTestCase(LibraryAPITestCaseBase):
+
+    def _book(self, response, book_id):
+        books = response.data['results'] if isinstance(response.data, dict) and 'results' in response.data else response.data
+        return next(book for book in books if book['id'] == book_id)
+
+    def test_repeated_list_is_served_from_cache(self):
+        self._login_user('user2')
+        first = self.client.get(self.book_list_create_url, {'category': 'SF'})
+        with self.assertNumQueries(CACHED_QUERIES):
+            second = self.client.get(self.book_list_create_url, {'category': 'SF'})
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.json(), first.json())
+
+    def test_query_params_are_normalised(self):
+        self._login_user('user2')
+        self.client.get(self.book_list_create_url + '?language=English&category=SF&search=')
+        with self.assertNumQueries(CACHED_QUERIES):
+            response = self.client.get(self.book_list_create_url + '?category=SF&language=English')
+        self.assertEqual([book['id'] for book in response.data], [self.book1.id])
+
+    def test_borrower_name_is_applied_per_viewer(self):
+        # Primed by a viewer who may not see the name
+        self._login_user('user2')
+        self.assertEqual(self._book(self.client.get(self.book_list_create_url), self.borrowed_book.id)['borrower'], 'Checked Out')
+
+        for user_type, expected in (('user1', self.user1.username), ('admin', self.user1.username), ('user2', 'Checked Out')):
+            self._login_user(user_type)
+            with self.assertNumQueries(CACHED_QUERIES):
+                response = self.client.get(self.book_list_create_url)
+            self.assertEqual(self._book(response, self.borrowed_book.id)['borrower'], expected)
+
+    def test_detail_is_cached_and_applies_borrower(self):
+        self._login_user('user1')
+        self.client.get(self.book_detail_url(self.borrowed_book.id))
+        self._login_user('librarian')
+        with self.assertNumQueries(CACHED_QUERIES):
+            response = self.client.get(self.book_detail_url(self.borrowed_book.id))
+        self.assertEqual(response.data['borrower'], self.user1.username)
+        self._login_user('user2')
+        self.assertEqual(self.client.get(self.book_detail_url(self.borrowed_book.id)).data['borrower'], 'Checked Out')
+
+    def test_book_update_invalidates(self):
+        self._login_user('librarian')
+        self.client.get(self.book_list_create_url)
+        self.client.get(self.book_detail_url(self.book1.id))
+        response = self.client.patch(self.book_detail_url(self.book1.id), {'title': 'Renamed Test Book'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self._book(self.client.get(self.book_list_create_url), self.book1.id)['title'], 'Renamed Test Book')
+        self.assertEqual(self.client.get(self.book_detail_url(self.book1.id)).data['title'], 'Renamed Test Book')
+
+    def test_borrow_and_return_invalidate(self):
+        self._login_user('user2')
+        self.assertTrue(self._book(self.client.get(self.book_list_create_url), self.book1.id)['available'])
+
+        self.client.post(self.book_borrow_url(self.book1.id))
+        book = self._book(self.client.get(self.book_list_create_url), self.book1.id)
+        self.assertFalse(book['available'])
+        self.assertEqual(book['borrower'], self.user2.username)
+
+        self.client.post(self.book_return_url(self.book1.id))
+        self.assertTrue(self._book(self.client.get(self.book_list_create_url), self.book1.id)['available'])
+
+    def test_queryset_update_needs_explicit_invalidation(self):
+        # Documents the contract: writes that bypass signals must call invalidate_book_responses()
+        self._login_user('user2')
+        self.client.get(self.book_detail_url(self.book2.id))
+        Book.objects.filter(id=self.book2.id).update(title='Changed Behind The Back')
+        self.assertNotEqual(self.client.get(self.book_detail_url(self.book2.id)).data['title'], 'Changed Behind The Back')
+
+    def test_only_user_renames_invalidate(self):
+        self._login_user('user2')
+        self.client.get(self.book_detail_url(self.borrowed_book.id))
+        version = get_version()
+        self.user1.set_password('another-password123')
+        self.user1.email = 'changed@example.com'
+        self.user1.save()
+        self.assertEqual(get_version(), version)
+        self.user1.username = 'renamed_user1'
+        self.user1.save()
+        self.assertNotEqual(get_version(), version)
+
+    def test_cache_can_be_disabled(self):
+        self._login_user('user2')
+        with override_settings(BOOK_RESPONSE_CACHE_TIMEOUT=0):
+            self.client.get(self.book_list_create_url)
+            Book.objects.filter(id=self.book2.id).update(title='Changed Behind The Back')
+            response = self.client.get(self.book_list_create_url)
+        self.assertEqual(self._book(response, self.book2.id)['title'], 'Changed Behind The Back')
+
+    def test_invalid_requests_are_not_cached(self):
+        self._login_user('user2')
+        self.assertEqual(self.client.get(self.book_detail_url(999999)).status_code, status.HTTP_404_NOT_FOUND)
+        Book.objects.create(id=999999, title='Late Arrival', author='Someone', isbn='9789999999999')
+        self.assertEqual(self.client.get(self.book_detail_url(999999)).status_code, status.HTTP_200_OK)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                           'LOCATION': '/tmp/library-manager-test-cache'}})
+    def test_file_based_backend(self):
+        from django.core.cache import cache
+        cache.clear()
+        self._login_user('user2')
+        self.client.get(self.book_list_create_url)
+        with self.assertNumQueries(CACHED_QUERIES):
+            self.client.get(self.book_list_create_url)
+        self.client.post(self.book_borrow_url(self.book1.id))
+        self.assertFalse(self._book(self.client.get(self.book_list_create_url), self.book1.id)['available'])
+        cache.clear()
+
+
+class BookConditionalGetTestCase(LibraryAPITestCaseBase):
+    """ETag / Last-Modified revalidation of the book endpoints."""
+
+    def test_list_and_detail_send_validators(self):
+        self._login_user('user2')
+        for url in (self.book_list_create_url, self.book_detail_url(self.book1.id)):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.has_header('ETag'))
+            self.assertFalse(response['ETag'].startswith('W/')) # Strong validator
+            self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_matching_etag_gives_304_without_book_queries(self):
+        self._login_user('user2')
+        etag = self.client.get(self.book_list_create_url)['ETag']
+        with self.assertNumQueries(CACHED_QUERIES):
+            response = self.client.get(self.book_list_create_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_etag_changes_with_the_catalogue(self):
+        self._login_user('librarian')
+        url = self.book_detail_url(self.book1.id)
+        etag = self.client.get(url)['ETag']
+        self.client.patch(url, {'title': 'Revalidated'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Revalidated')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_viewer_and_query(self):
+        self._login_user('user1')
+        etag_user1 = self.client.get(self.book_list_create_url)['ETag']
+        self.assertNotEqual(self.client.get(self.book_list_create_url, {'category': 'SF'})['ETag'], etag_user1)
+        self._login_user('admin')
+        response = self.client.get(self.book_list_create_url, HTTP_IF_NONE_MATCH=etag_user1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since(self):
+        self._login_user('user2')
+        url = self.book_detail_url(self.book2.id)
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
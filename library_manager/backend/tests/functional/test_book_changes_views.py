@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for delta sync of the catalogue (BookChangesView, backend/change_log.py).
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase
+from backend.change_log import compact_book_changes
+from backend.models import Book, BookChange
+
+
+@override_settings(BOOK_CHANGE_SETTLE_SECONDS=0)
+class BookChangesViewsTestCase(LibraryAPITestCaseBase):
+
+    def setUp(self):
+        super().setUp()
+        self.changes_url = reverse('book-changes')
+
+    def _sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(self.changes_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def _latest_token(self):
+        return str(BookChange.objects.latest('id').id)
+
+    def test_authentication_required(self):
+        self.assertEqual(self.client.get(self.changes_url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_sync_from_zero_returns_catalogue(self):
+        self._login_user('user2')
+        data = self._sync(0)
+        self.assertEqual({book['id'] for book in data['changed']}, set(Book.objects.values_list('id', flat=True)))
+        self.assertEqual((data['deleted'], data['has_more']), ([], False))
+        # Nothing changed since
+        again = self._sync(data['next_since'])
+        self.assertEqual((again['changed'], again['deleted'], again['next_since']), ([], [], data['next_since']))
+
+    def test_updates_loans_and_deletes_are_returned_once(self):
+        self._login_user('librarian')
+        token = self._latest_token()
+        self.client.patch(self.book_detail_url(self.book1.id), {'title': 'Changed Title'})
+        self.client.post(self.book_borrow_url(self.book1.id))
+        self.client.post(self.book_return_url(self.borrowed_book.id))
+        self.client.delete(self.book_detail_url(self.book2.id))
+
+        data = self._sync(token)
+        changed = {book['id']: book for book in data['changed']}
+        self.assertEqual(set(changed), {self.book1.id, self.borrowed_book.id})
+        self.assertEqual(changed[self.book1.id]['title'], 'Changed Title')
+        self.assertFalse(changed[self.book1.id]['available'])
+        self.assertEqual(changed[self.book1.id]['borrower'], self.librarian_user.username) # Rendered for the viewer
+        self.assertTrue(changed[self.borrowed_book.id]['available'])
+        self.assertEqual(data['deleted'], [self.book2.id])
+
+    def test_pages_follow_next_since(self):
+        self._login_user('user2')
+        seen, token, pages = set(), 0, 0
+        while True:
+            data = self._sync(token, limit=2)
+            seen.update(book['id'] for book in data['changed'])
+            token, pages = data['next_since'], pages + 1
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, set(Book.objects.values_list('id', flat=True)))
+        self.assertGreater(pages, 1)
+
+    def test_book_deleted_after_page_entry_is_reported_deleted(self):
+        self._login_user('user2')
+        token, book_id = self._latest_token(), self.book1.id
+        Book.objects.filter(id=book_id).update(title='Touched') # Bypasses the log...
+        BookChange.objects.create(book_id=book_id) # ...so log it by hand
+        Book.objects.get(id=book_id).delete()
+        data = self._sync(token, limit=1)
+        self.assertEqual((data['changed'], data['deleted'], data['has_more']), ([], [book_id], True))
+
+    def test_user_rename_logs_their_books(self):
+        self._login_user('user2')
+        token = self._latest_token()
+        self.user1.username = 'renamed_user1'
+        self.user1.save()
+        data = self._sync(token)
+        self.assertIn(self.borrowed_book.id, {book['id'] for book in data['changed']})
+
+    def test_other_user_saves_log_nothing(self):
+        self._login_user('user2')
+        token = self._latest_token()
+        self.librarian_user.email = 'new-librarian@example.com'
+        self.librarian_user.save() # Added most of the books
+        self.assertEqual(self._sync(token)['changed'], [])
+
+    def test_compaction_keeps_tokens_valid(self):
+        self._login_user('librarian')
+        token = self._latest_token()
+        for title in ('First', 'Second', 'Third'):
+            self.client.patch(self.book_detail_url(self.book1.id), {'title': title})
+        self.client.delete(self.book_detail_url(self.book2.id))
+        before = self._sync(token)
+
+        self.assertGreaterEqual(compact_book_changes(batch_size=1), 2)
+        self.assertEqual(BookChange.objects.filter(book_id=self.book1.id).count(), 1)
+        after = self._sync(token)
+        self.assertEqual(
+            ([b['id'] for b in after['changed']], after['deleted'], after['next_since']),
+            ([b['id'] for b in before['changed']], before['deleted'], before['next_since']),
+        )
+        out = StringIO()
+        call_command('compact_book_changes', stdout=out)
+        self.assertIn('Removed 0 superseded entries', out.getvalue())
+
+    def test_invalid_parameters(self):
+        self._login_user('user2')
+        for params in ({'since': 'abc'}, {'since': -1}, {'limit': 0}):
+            with self.subTest(params=params):
+                response = self.client.get(self.changes_url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BOOK_CHANGE_SETTLE_SECONDS=60)
+    def test_recent_changes_are_held_back(self):
+        self._login_user('librarian')
+        token = self._latest_token()
+        self.client.patch(self.book_detail_url(self.book1.id), {'title': 'Too Fresh'})
+        data = self._sync(token)
+        self.assertEqual((data['changed'], data['next_since'], data['has_more']), ([], token, False))
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for the streaming catalogue export (BookExportView).
+"""
+import json
+
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase
+from backend.models import Book
+from backend.views import BookExportView
+
+
+class BookExportViewsTestCase(LibraryAPITestCaseBase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(7):
+            Book.objects.create(
+                title=f"Export Book {i % 3}",
+                author="Exporter",
+                isbn=f"97855600000{i:02d}",
+                category=['CK', 'SF'][i % 2],
+                language='English',
+                condition='GD',
+            )
+
+    def setUp(self):
+        super().setUp()
+        self._original_batch_size = BookExportView.batch_size
+        BookExportView.batch_size = 3 # Force several batches
+
+    def tearDown(self):
+        BookExportView.batch_size = self._original_batch_size
+        super().tearDown()
+
+    def _content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_json_export_matches_list(self):
+        """The streamed JSON array is the same data the list endpoint returns."""
+        self._login_user('user1')
+        response = self.client.get(self.book_export_url, {'ordering': '-title'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('attachment', response['Content-Disposition'])
+        exported = json.loads(self._content(response))
+
+        listed = self.client.get(self.book_list_create_url, {'ordering': '-title'}).json()
+        self.assertEqual(exported, listed)
+        self.assertEqual(len(exported), Book.objects.count())
+
+    def test_ndjson_export_with_filters(self):
+        """NDJSON emits one book per line and honours filters and search."""
+        self._login_user('librarian')
+        response = self.client.get(self.book_export_url, {
+            'export_format': 'ndjson', 'category': 'SF', 'search': 'Export',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self._content(response).splitlines()
+        ids = [json.loads(line)['id'] for line in lines]
+        expected = Book.objects.filter(category='SF', title__contains='Export').order_by('id')
+        self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+
+    def test_empty_export(self):
+        self._login_user('user1')
+        response = self.client.get(self.book_export_url, {'search': 'no such book'})
+        self.assertEqual(json.loads(self._content(response)), [])
+
+    def test_invalid_format_and_anonymous(self):
+        self._login_user('user1')
+        response = self.client.get(self.book_export_url, {'export_format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.logout()
+        response = self.client.get(self.book_export_url)
+        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
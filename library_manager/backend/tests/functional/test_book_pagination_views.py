@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for keyset (cursor) pagination on BookListCreateView.
+"""
+from urllib.parse import parse_qs, urlparse
+
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase
+from backend.models import Book
+from backend.pagination import decode_cursor, encode_cursor
+
+
+class BookPaginationViewsTestCase(LibraryAPITestCaseBase):
+    """
+    Walks the book list page by page for every ordering field and checks that
+    each book is returned exactly once, in the same order as the unpaginated list.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Duplicate titles/authors/years (and NULL years) exercise the id tie-breaker
+        for i in range(17):
+            Book.objects.create(
+                title=f"Paged Book {i % 4}",
+                author=f"Paged Author {i % 3}",
+                isbn=f"97855500000{i:02d}",
+                category=['CK', 'SF', 'HIS'][i % 3],
+                language='English',
+                condition='GD',
+                publication_year=None if i % 5 == 0 else 2000 + (i % 6),
+            )
+
+    def _walk(self, params, page_size=4):
+        """Follows 'next' links from the first page and returns the collected ids."""
+        response = self.client.get(self.book_list_create_url, {**params, 'page_size': page_size})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids, pages = [], 0
+        while True:
+            pages += 1
+            self.assertLessEqual(len(response.data['results']), page_size)
+            ids.extend(book['id'] for book in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return ids, pages
+
+    def _expected_ids(self, ordering):
+        """Ids in the order of the unpaginated list, NULLs first ascending and last descending."""
+        descending = ordering.startswith('-')
+        name = ordering.lstrip('-')
+        books = list(Book.objects.values('id', name))
+        present = sorted((b for b in books if b[name] is not None), key=lambda b: b['id'])
+        present.sort(key=lambda b: b[name], reverse=descending) # Stable: ids stay ascending within ties
+        nulls = sorted((b for b in books if b[name] is None), key=lambda b: b['id'])
+        ordered = present + nulls if descending else nulls + present
+        return [b['id'] for b in ordered]
+
+    def test_unpaginated_by_default(self):
+        """Without page_size/cursor the endpoint keeps returning the full list."""
+        self._login_user('user1')
+        response = self.client.get(self.book_list_create_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), Book.objects.count())
+
+    def test_walk_every_ordering_field(self):
+        """Each ordering field (both directions) yields every book exactly once, in order."""
+        self._login_user('user1')
+        for ordering in ['title', '-title', 'author', '-author', 'publication_year',
+                         '-publication_year', 'category', '-category']:
+            with self.subTest(ordering=ordering):
+                ids, pages = self._walk({'ordering': ordering})
+                self.assertEqual(ids, self._expected_ids(ordering))
+                self.assertEqual(pages, -(-Book.objects.count() // 4))
+
+    def test_default_ordering_is_id(self):
+        """Without ?ordering pages are ordered by primary key."""
+        self._login_user('user1')
+        ids, _ = self._walk({})
+        self.assertEqual(ids, list(Book.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_previous_link_returns_same_page(self):
+        """Following 'next' then 'previous' returns the original page."""
+        self._login_user('user1')
+        first = self.client.get(self.book_list_create_url, {'ordering': '-publication_year', 'page_size': 5})
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [b['id'] for b in back.data['results']],
+            [b['id'] for b in first.data['results']],
+        )
+
+    def test_filters_apply_to_pages(self):
+        """Filters are combined with the keyset predicate."""
+        self._login_user('user1')
+        ids, _ = self._walk({'category': 'SF', 'ordering': 'title'}, page_size=2)
+        self.assertEqual(sorted(ids), sorted(Book.objects.filter(category='SF').values_list('id', flat=True)))
+
+    def test_invalid_cursor(self):
+        """A malformed cursor, or one issued for another ordering, is rejected with 404."""
+        self._login_user('user1')
+        response = self.client.get(self.book_list_create_url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        first = self.client.get(self.book_list_create_url, {'ordering': 'title', 'page_size': 3})
+        cursor = parse_qs(urlparse(first.data['next']).query)['cursor'][0]
+        response = self.client.get(self.book_list_create_url, {'ordering': 'author', 'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_forged_cursor(self):
+        """Cursor values of the wrong type for their field are rejected with 404, not a server error."""
+        self._login_user('user1')
+        first = self.client.get(self.book_list_create_url, {'ordering': 'publication_year', 'page_size': 3})
+        payload = decode_cursor(parse_qs(urlparse(first.data['next']).query)['cursor'][0])
+        for values in (['abc', 1], [2000, 'abc'], [2000, {'a': 1}], [[2000], 1]):
+            forged = encode_cursor({**payload, 'v': values})
+            response = self.client.get(self.book_list_create_url, {'ordering': 'publication_year', 'cursor': forged})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
+
+
+class BookIndexedSearchViewsTestCase(LibraryAPITestCaseBase):
+    """?search_mode=index answers ?search= from the token index, ranked by relevance."""
+
+    def test_indexed_search_ranked(self):
+        self._login_user('user1')
+        author_match = Book.objects.create(title="Cookbook", author="Ada Lovelace", isbn="9785570000001",
+                                           category='CK', language='English', condition='GD')
+        title_match = Book.objects.create(title="Lovelace and Babbage", author="Sydney Padua", isbn="9785570000002",
+                                          category='HIS', language='English', condition='GD')
+        response = self.client.get(self.book_list_create_url, {'search': 'lovel', 'search_mode': 'index'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([b['id'] for b in response.data], [title_match.id, author_match.id])
+
+        # Explicit ordering wins over relevance; filters still apply
+        response = self.client.get(self.book_list_create_url,
+                                   {'search': 'lovel', 'search_mode': 'index', 'ordering': 'title'})
+        self.assertEqual([b['id'] for b in response.data], [author_match.id, title_match.id])
+        response = self.client.get(self.book_list_create_url,
+                                   {'search': 'lovel', 'search_mode': 'index', 'category': 'HIS'})
+        self.assertEqual([b['id'] for b in response.data], [title_match.id])
+
+    def test_indexed_search_paginates_by_rank(self):
+        self._login_user('user1')
+        for i in range(5):
+            Book.objects.create(title=f"Ranked Volume {i}" if i % 2 else f"Other {i}", author="Ranked Writer",
+                                isbn=f"97855800000{i:02d}", category='SF', language='English', condition='GD')
+        params = {'search': 'ranked', 'search_mode': 'index', 'page_size': 2}
+        response = self.client.get(self.book_list_create_url, params)
+        ids = [b['id'] for b in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids.extend(b['id'] for b in response.data['results'])
+        unpaginated = self.client.get(self.book_list_create_url, {'search': 'ranked', 'search_mode': 'index'})
+        self.assertEqual(ids, [b['id'] for b in unpaginated.data])
+        self.assertEqual(len(ids), 5)
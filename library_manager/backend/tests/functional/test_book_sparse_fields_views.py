@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for sparse fieldsets (?fields= / ?omit=) of the book read endpoints.
+"""
+import json
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase
+from backend.models import Book
+from backend.serializers import BOOK_FIELD_COLUMNS
+
+CARD_FIELDS = 'id,title,author,image_url,available'
+
+
+class BookSparseFieldsTestCase(LibraryAPITestCaseBase):
+
+    def _books(self, response):
+        data = response.json()
+        return data['results'] if isinstance(data, dict) else data
+
+    def _book_queries(self, url, params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        queries = [q['sql'] for q in ctx.captured_queries if 'FROM "backend_book"' in q['sql'] or 'FROM `backend_book`' in q['sql']]
+        return response, queries
+
+    def test_list_renders_only_selected_fields(self):
+        self._login_user('user2')
+        full = {book['id']: book for book in self._books(self.client.get(self.book_list_create_url))}
+        response, queries = self._book_queries(self.book_list_create_url, {'fields': CARD_FIELDS})
+        books = self._books(response)
+        self.assertEqual(len(books), len(full))
+        for book in books:
+            self.assertEqual(set(book), set(CARD_FIELDS.split(',')))
+            self.assertEqual(book, {name: full[book['id']][name] for name in book})
+        # Narrower SQL: no user joins, no unused columns
+        self.assertTrue(queries)
+        for sql in queries:
+            self.assertNotIn('JOIN', sql)
+            self.assertNotIn('storage_location', sql)
+
+    def test_omit_drops_fields_and_joins(self):
+        self._login_user('user2')
+        response, queries = self._book_queries(self.book_list_create_url, {'omit': 'borrower,added_by'})
+        self.assertEqual(set(self._books(response)[0]), set(BOOK_FIELD_COLUMNS) - {'borrower', 'added_by'})
+        self.assertNotIn('JOIN', queries[0])
+
+    def test_borrower_names_follow_the_viewer(self):
+        params = {'fields': 'title,borrower'}
+        for user_type, expected in (('user2', 'Checked Out'), ('user1', self.user1.username), ('admin', self.user1.username)):
+            self._login_user(user_type)
+            books = {book['id']: book for book in self._books(self.client.get(self.book_list_create_url, params))}
+            book = books[self.borrowed_book.id]
+            self.assertEqual(set(book), {'id', 'title', 'borrower', 'borrower_id'}) # borrower brings borrower_id
+            self.assertEqual(book['borrower'], expected)
+
+    def test_sparse_pages_keep_their_cursor(self):
+        self._login_user('user2')
+        params = {'fields': 'title', 'ordering': 'author', 'page_size': 1}
+        first = self.client.get(self.book_list_create_url, params).json()
+        self.assertEqual(list(first['results'][0]), ['id', 'title'])
+        second = self.client.get(first['next']).json()
+        self.assertNotEqual(second['results'][0]['id'], first['results'][0]['id'])
+
+    def test_detail(self):
+        self._login_user('librarian')
+        url = self.book_detail_url(self.borrowed_book.id)
+        full = self.client.get(url).json()
+        response, queries = self._book_queries(url, {'fields': 'title,available,days_left,added_by'})
+        self.assertEqual(response.json(), {name: full[name] for name in ('id', 'title', 'available', 'added_by', 'days_left')})
+        self.assertNotIn('publisher', queries[0])
+        self.assertEqual(queries[0].count('JOIN'), 1) # added_by only
+
+        response = self.client.get(url, {'fields': 'title,borrower'})
+        self.assertEqual(response.json()['borrower'], self.user1.username)
+
+    def test_export(self):
+        self._login_user('user2')
+        response = self.client.get(self.book_export_url, {'fields': 'title', 'ordering': '-title'})
+        books = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(books, [
+            {'id': book_id, 'title': title}
+            for book_id, title in Book.objects.order_by('-title', '-id').values_list('id', 'title')
+        ])
+
+    def test_unknown_fields_are_rejected(self):
+        self._login_user('user2')
+        for url in (self.book_list_create_url, self.book_detail_url(self.book1.id), self.book_export_url):
+            for params in ({'fields': 'title,secret'}, {'omit': 'nope'}):
+                with self.subTest(url=url, params=params):
+                    response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                    self.assertIn(next(iter(params)), response.json())
+
+    def test_async_views_match(self):
+        user = self._login_user('user1')
+        self.async_client.force_login(user)
+        for url, params in ((self.book_list_create_url, {'fields': CARD_FIELDS + ',borrower'}),
+                            (self.book_detail_url(self.borrowed_book.id), {'omit': 'image,image_url'}),
+                            (self.book_list_create_url, {'fields': 'bogus'})):
+            expected = self.client.get(url, params)
+            response = async_to_sync(self.async_client.get)(url, params)
+            self.assertEqual((response.status_code, response.json()), (expected.status_code, expected.json()))
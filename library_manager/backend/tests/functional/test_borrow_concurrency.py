@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrency stress test for BorrowBookView: many users borrow the same book at
+the same instant and exactly one of them must get it.
+"""
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.models import Book, UserProfile
+from backend.views import BorrowBookView
+
+User = get_user_model()
+
+
+class ConcurrentBorrowTestCase(TransactionTestCase):
+    """Runs real parallel transactions, so it cannot use the per-test transaction of TestCase."""
+
+    PARALLEL_BORROWS = 200
+
+    @classmethod
+    def setUpClass(cls):
+        # The shared-cache in-memory SQLite test database rejects concurrent writers
+        # ("database table is locked"); MySQL or a file-based SQLite test DB is needed.
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise unittest.SkipTest("Needs a test database that supports concurrent transactions.")
+        super().setUpClass()
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Contended Book', author='Popular Author', isbn='9787770000001',
+            category='SF', language='English', condition='NW',
+        )
+        User.objects.bulk_create(
+            User(username=f"rush_user_{i}") for i in range(self.PARALLEL_BORROWS)
+        )
+        self.users = list(User.objects.filter(username__startswith='rush_user_'))
+        UserProfile.objects.bulk_create(UserProfile(user=user, type='US') for user in self.users)
+
+    def test_parallel_borrows_single_winner(self):
+        """Hundreds of simultaneous borrows of one book: one 200, everybody else 400."""
+        view = BorrowBookView.as_view()
+        factory = APIRequestFactory()
+        barrier = threading.Barrier(self.PARALLEL_BORROWS)
+
+        def attempt(user):
+            request = factory.post(f"/api/books/{self.book.id}/borrow/")
+            force_authenticate(request, user=user)
+            try:
+                barrier.wait() # Release all requests at once
+                return view(request, book_id=self.book.id).status_code
+            finally:
+                connection.close() # Each thread has its own connection
+
+        with ThreadPoolExecutor(max_workers=self.PARALLEL_BORROWS) as executor:
+            codes = list(executor.map(attempt, self.users))
+
+        self.assertEqual(codes.count(status.HTTP_200_OK), 1, codes)
+        self.assertEqual(codes.count(status.HTTP_400_BAD_REQUEST), self.PARALLEL_BORROWS - 1)
+
+        self.book.refresh_from_db()
+        self.assertFalse(self.book.available)
+        winner = self.users[codes.index(status.HTTP_200_OK)]
+        self.assertEqual(self.book.borrower, winner)
@@ -9,7 +9,7 @@ from rest_framework import status
 # Import the base test case and constants/models
 from .test_views_base import LibraryAPITestCaseBase, USER_TYPE, ADMIN_TYPE, LIBRARIAN_TYPE
 from backend.models import Book
-from backend.views import MAX_BORROW_LIMIT # Import borrow limit
+from backend.circulation import MAX_BORROW_LIMIT # Import borrow limit
 
 class BorrowReturnViewsTestCase(LibraryAPITestCaseBase):
     """
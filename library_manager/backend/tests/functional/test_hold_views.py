@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for the hold queue (PlaceHoldView, CancelHoldView, MyHoldsView)
+and the returns that serve it (backend/circulation.py).
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase
+from backend.circulation import MAX_BORROW_LIMIT, place_hold
+from backend.models import Book, Hold, Loan, UserProfile, Work
+
+User = get_user_model()
+
+
+class HoldViewsTestCase(LibraryAPITestCaseBase):
+
+    def setUp(self):
+        super().setUp()
+        # borrowed_book (user1's loan) is the only copy of its title
+        self.work = Work.objects.get(id=Book.objects.get(id=self.borrowed_book.id).work_id)
+        self.hold_url = reverse('work-hold', kwargs={'work_id': self.work.id})
+        self.my_holds_url = reverse('my-holds')
+
+    def _hold_for(self, user):
+        return place_hold(user, self.work.id)
+
+    def _active_loans(self, user):
+        return UserProfile.objects.get(user=user).active_loans
+
+    def test_authentication_required(self):
+        self.assertEqual(self.client.post(self.hold_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(self.my_holds_url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_place_hold(self):
+        user = self._login_user('user2')
+        response = self.client.post(self.hold_url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['hold']['work_id'], response.data['hold']['title']), (self.work.id, self.work.title))
+        self.assertEqual(response.data['hold']['position'], 1)
+
+        again = self.client.post(self.hold_url)
+        self.assertEqual(again.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('already have a hold', again.data['error'])
+        available = self.client.post(reverse('work-hold', kwargs={'work_id': Book.objects.get(id=self.book1.id).work_id}))
+        self.assertEqual(available.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Borrow it instead', available.data['error'])
+        missing = self.client.post(reverse('work-hold', kwargs={'work_id': 999999}))
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.assertEqual([hold['work_id'] for hold in self.client.get(self.my_holds_url).data], [self.work.id])
+        self.assertEqual(Hold.objects.filter(user=user).count(), 1)
+
+    def test_return_lends_to_the_first_in_line(self):
+        self._hold_for(self.user2)
+        self._hold_for(self.librarian_user)
+        self._login_user('user1')
+        response = self.client.post(self.book_return_url(self.borrowed_book.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['message'], 'Book returned and lent to the next patron on hold')
+
+        book = Book.objects.get(id=self.borrowed_book.id)
+        self.assertEqual((book.available, book.borrower_id), (False, self.user2.id))
+        self.assertEqual(self._active_loans(self.user2), 1)
+        self.assertEqual(
+            list(Loan.objects.filter(book_id=book.id).order_by('id').values_list('action', 'user_id')),
+            [(Loan.RETURN, self.user1.id), (Loan.BORROW, self.user2.id)],
+        )
+        # The hold is served; the next patron moves up without any renumbering
+        self.assertEqual(list(Hold.objects.values_list('user_id', 'position')), [(self.librarian_user.id, 2)])
+        work = Work.objects.get(id=self.work.id)
+        self.assertEqual((work.copy_count, work.available_copies), (1, 0))
+
+    def test_patrons_at_the_limit_keep_their_place(self):
+        self._hold_for(self.user2)
+        self._hold_for(self.librarian_user)
+        UserProfile.objects.filter(user=self.user2).update(active_loans=MAX_BORROW_LIMIT)
+        self._login_user('user1')
+        self.client.post(self.book_return_url(self.borrowed_book.id))
+        self.assertEqual(Book.objects.get(id=self.borrowed_book.id).borrower_id, self.librarian_user.id)
+        self.assertEqual(self._active_loans(self.user2), MAX_BORROW_LIMIT)
+        self.assertEqual(list(Hold.objects.values_list('user_id', flat=True)), [self.user2.id])
+
+    def test_queue_skips_any_number_of_patrons_at_the_limit(self):
+        patrons = [User.objects.create_user(username=f'busy{n}', password='password123') for n in range(8)]
+        for patron in patrons:
+            UserProfile.objects.create(user=patron, active_loans=MAX_BORROW_LIMIT)
+            self._hold_for(patron)
+        self._hold_for(self.user2)
+        self._login_user('user1')
+        self.client.post(self.book_return_url(self.borrowed_book.id))
+        self.assertEqual(Book.objects.get(id=self.borrowed_book.id).borrower_id, self.user2.id)
+        self.assertEqual(Hold.objects.count(), len(patrons))
+
+    def test_direct_borrows_are_reserved_for_holders(self):
+        self._hold_for(self.user2)
+        UserProfile.objects.filter(user=self.user2).update(active_loans=MAX_BORROW_LIMIT)
+        self._login_user('user1')
+        self.client.post(self.book_return_url(self.borrowed_book.id)) # Nobody can take it: back on the shelf
+        self.assertTrue(Book.objects.get(id=self.borrowed_book.id).available)
+
+        self._login_user('librarian')
+        for response in (
+            self.client.post(self.book_borrow_url(self.borrowed_book.id)),
+            self.client.post(reverse('work-borrow', kwargs={'work_id': self.work.id})),
+        ):
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('reserved for patrons on hold', response.data['error'])
+        batch = self.client.post(reverse('book-batch-borrow'), {'books': [self.borrowed_book.id, self.book1.id]}, format='json')
+        self.assertEqual([result['ok'] for result in batch.data['results']], [False, True])
+        self.assertTrue(Book.objects.get(id=self.borrowed_book.id).available)
+
+        # The holder collects it once below the limit, which uses up the hold
+        UserProfile.objects.filter(user=self.user2).update(active_loans=0)
+        self._login_user('user2')
+        response = self.client.post(self.book_borrow_url(self.borrowed_book.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Hold.objects.exists())
+
+    def test_cancel(self):
+        hold = self._hold_for(self.user2)
+        self._login_user('user1')
+        cancel_url = reverse('hold-detail', kwargs={'id': hold.id})
+        self.assertEqual(self.client.delete(cancel_url).status_code, status.HTTP_404_NOT_FOUND) # Not theirs
+        self._login_user('user2')
+        self.assertEqual(self.client.delete(cancel_url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(self.my_holds_url).data, [])
+
+        other = self._hold_for(self.user1)
+        self._login_user('librarian')
+        self.assertEqual(
+            self.client.delete(reverse('hold-detail', kwargs={'id': other.id})).status_code, status.HTTP_204_NO_CONTENT
+        )
+        # Nobody waiting: the returned copy goes back on the shelf
+        response = self.client.post(self.book_return_url(self.borrowed_book.id))
+        self.assertEqual(response.data['message'], 'Book returned successfully')
+        self.assertEqual(Work.objects.get(id=self.work.id).available_copies, 1)
+
+    def test_batch_return_serves_holds(self):
+        self._hold_for(self.user2)
+        self._login_user('librarian')
+        self.client.post(reverse('book-batch-borrow'), {'books': [self.book1.id], 'user': self.user1.id}, format='json')
+        response = self.client.post(
+            reverse('book-batch-return'), {'books': [self.borrowed_book.id, self.book1.id]}, format='json',
+        )
+        held, plain = response.data['results']
+        self.assertEqual((held['ok'], held['book']['available']), (True, False))
+        self.assertTrue(plain['book']['available'])
+        self.assertEqual(Book.objects.get(id=self.borrowed_book.id).borrower_id, self.user2.id)
+        self.assertEqual(Work.objects.get(id=self.work.id).available_copies, 0)
+        self.assertFalse(Hold.objects.exists())
+        self.assertEqual((self._active_loans(self.user1), self._active_loans(self.user2)), (0, 1))
+
+    def test_statement_count_does_not_grow_with_the_queue(self):
+        def queries(action):
+            with CaptureQueriesContext(connection) as ctx:
+                action()
+            return len(ctx)
+
+        short = queries(lambda: self._hold_for(self.user2))
+        patrons = [User.objects.create_user(username=f'patron{n}', password='password123') for n in range(20)]
+        for patron in patrons[:-1]:
+            self._hold_for(patron)
+        self.assertEqual(queries(lambda: self._hold_for(patrons[-1])), short)
+        self.assertEqual(Hold.objects.get(user=patrons[-1]).position, 21)
+
+        self._login_user('user1')
+        self.assertEqual(self.client.post(self.book_return_url(self.borrowed_book.id)).status_code, status.HTTP_200_OK)
+        self.assertEqual(Book.objects.get(id=self.borrowed_book.id).borrower_id, self.user2.id)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for the loan ledger (models.Loan) and its history endpoints.
+"""
+from datetime import date, timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase
+from backend.circulation import LOAN_PERIOD
+from backend.models import Loan
+from backend.pagination import encode_cursor
+
+
+class LoanHistoryViewsTestCase(LibraryAPITestCaseBase):
+
+    def setUp(self):
+        super().setUp()
+        self.loans_url = reverse('loan-history')
+        self.my_loans_url = reverse('my-loan-history')
+
+    def _get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_borrow_and_return_are_recorded(self):
+        self._login_user('user2')
+        self.client.post(self.book_borrow_url(self.book1.id))
+        self.client.post(self.book_return_url(self.book1.id))
+        self._login_user('librarian')
+        self.client.post(self.book_return_url(self.borrowed_book.id)) # user1's loan
+
+        entries = list(Loan.objects.order_by('id').values_list('book_id', 'user_id', 'action', 'due_date'))
+        self.assertEqual(entries, [
+            (self.book1.id, self.user2.id, Loan.BORROW, date.today() + LOAN_PERIOD),
+            (self.book1.id, self.user2.id, Loan.RETURN, None),
+            (self.borrowed_book.id, self.user1.id, Loan.RETURN, None),
+        ])
+
+    def test_failed_requests_leave_no_entry(self):
+        self._login_user('user2')
+        self.client.post(self.book_borrow_url(self.borrowed_book.id)) # Already out
+        self.client.post(self.book_return_url(self.book1.id)) # Not borrowed
+        self.assertFalse(Loan.objects.exists())
+
+    def test_ledger_is_staff_only(self):
+        self._login_user('user1')
+        self.assertEqual(self.client.get(self.loans_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.my_loans_url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_filters(self):
+        self._login_user('user2')
+        self.client.post(self.book_borrow_url(self.book1.id))
+        self._login_user('user1')
+        self.client.post(self.book_borrow_url(self.book2.id))
+        self.client.post(self.book_return_url(self.book2.id))
+        old = Loan.objects.create(book_id=self.book2.id, user_id=self.user1.id, action=Loan.BORROW)
+        Loan.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=40))
+
+        self._login_user('admin')
+        ids = lambda **params: [loan['id'] for loan in self._get(self.loans_url, **params)['results']]
+        book2 = list(Loan.objects.filter(book_id=self.book2.id).values_list('id', flat=True))
+        self.assertEqual(ids(book=self.book2.id), sorted(book2, reverse=True))
+        self.assertEqual(ids(user=self.user2.id), [Loan.objects.get(user_id=self.user2.id).id])
+        self.assertEqual(len(ids(user=self.user1.id, action='R')), 1)
+        since = (date.today() - timedelta(days=1)).isoformat()
+        self.assertNotIn(old.id, ids(**{'from': since}))
+        self.assertEqual(ids(to=(date.today() - timedelta(days=30)).isoformat()), [old.id])
+        self.assertEqual(len(ids(**{'from': since, 'to': date.today().isoformat()})), 3)
+
+        for params in ({'book': 'x'}, {'from': '17/10/2026'}, {'action': 'Z'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.loans_url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pages_walk_the_ledger_newest_first(self):
+        start = timezone.now() - timedelta(days=1)
+        Loan.objects.bulk_create([
+            Loan(book_id=self.book1.id, user_id=self.user1.id, action=Loan.BORROW, created_at=start + timedelta(minutes=i))
+            for i in range(7)
+        ])
+        self._login_user('librarian')
+        for params in ({}, {'book': self.book1.id}):
+            seen, url, query = [], self.loans_url, {'page_size': 3, **params}
+            while url:
+                data = self._get(url, **query)
+                seen += [loan['created_at'] for loan in data['results']]
+                url, query = data['next'], {}
+            with self.subTest(params=params):
+                self.assertEqual(len(seen), 7)
+                self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_forged_cursor(self):
+        self._login_user('librarian')
+        cursor = encode_cursor({'o': ['-created_at', '-id'], 'v': ['abc', 1]})
+        self.assertEqual(self.client.get(self.loans_url, {'cursor': cursor}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_my_history(self):
+        self._login_user('user2')
+        self.client.post(self.book_borrow_url(self.book1.id))
+        Loan.objects.create(book_id=self.book2.id, user_id=self.user1.id, action=Loan.BORROW)
+        data = self._get(self.my_loans_url, user=self.user1.id) # ?user= is ignored here
+        self.assertEqual([(loan['book_id'], loan['action_display']) for loan in data['results']],
+                         [(self.book1.id, 'Borrowed')])
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for read-replica routing of the listing views (backend/db_routers.py).
+The 'default' alias stands in for the replica, so routing decisions are observed
+through reading_from_replica().
+"""
+from unittest.mock import patch
+
+from django.test import override_settings
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase
+from backend import db_routers
+from backend.db_routers import PIN_COOKIE
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaRoutingViewsTestCase(LibraryAPITestCaseBase):
+
+    def setUp(self):
+        super().setUp()
+        self.decisions = []
+        original = db_routers.reading_from_replica
+
+        def spy():
+            result = original()
+            self.decisions.append(result)
+            return result
+
+        patcher = patch('backend.db_routers.reading_from_replica', side_effect=spy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_book_list_reads_from_replica(self):
+        self._login_user('user2')
+        response = self.client.get(self.book_list_create_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(True, self.decisions)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_user_list_reads_from_replica(self):
+        self._login_user('admin')
+        self.assertEqual(self.client.get(self.user_list_url).status_code, status.HTTP_200_OK)
+        self.assertIn(True, self.decisions)
+
+    def test_borrow_stays_on_primary_and_pins_the_client(self):
+        self._login_user('user2')
+        response = self.client.post(self.book_borrow_url(self.book1.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(True, self.decisions)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # The client sends the cookie back: its next listing reads the primary
+        self.decisions.clear()
+        response = self.client.get(self.book_list_create_url)
+        self.assertFalse(response.data[[b['id'] for b in response.data].index(self.book1.id)]['available'])
+        self.assertNotIn(True, self.decisions)
+
+    def test_book_create_stays_on_primary(self):
+        self._login_user('librarian')
+        response = self.client.post(self.book_list_create_url, {
+            'title': 'Primary Only', 'author': 'Writer', 'isbn': '9781111111111',
+            'category': 'SF', 'language': 'English', 'condition': 'GD',
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn(True, self.decisions)
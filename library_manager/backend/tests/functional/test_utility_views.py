@@ -2,6 +2,7 @@
 """
 Functional tests for Utility API views (e.g., CSRF token).
 """
+from django.urls import reverse
 from rest_framework import status
 
 # Import the base test case
@@ -19,4 +20,29 @@ class UtilityViewsTestCase(LibraryAPITestCaseBase):
         response = self.client.get(self.csrf_token_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('csrfToken', response.data)
-        self.assertIsNotNone(response.data['csrfToken'])
\ No newline at end of file
+        self.assertIsNotNone(response.data['csrfToken'])
+    # --- Test Cache Stats View ---
+    def test_cache_stats_admin_only(self):
+        """Only admins can read the cache counters."""
+        url = reverse('cache-stats')
+        self._login_user('user1')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self._login_user('admin')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('static_url_cache', response.data)
+        self.assertIn('hits', response.data['static_url_cache'])
+        self.assertIn('misses', response.data['static_url_cache'])
+
+    # --- Test DB Pool Stats View ---
+    def test_db_pool_stats_admin_only(self):
+        """Only admins can read the connection pool counters."""
+        url = reverse('db-pool-stats')
+        self._login_user('user1')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self._login_user('admin')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('pool', response.data)
+        self.assertIn('conn_max_age', response.data['orm'])
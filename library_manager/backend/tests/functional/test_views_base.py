@@ -7,10 +7,11 @@ from datetime import date, timedelta
 
 from django.urls import reverse
 from django.contrib.auth import get_user_model, SESSION_KEY
+from django.core.cache import cache
 from rest_framework.test import APITestCase
 
 from backend.models import Book, UserProfile
-from backend.views import MAX_BORROW_LIMIT # Import borrow limit
+from backend.circulation import MAX_BORROW_LIMIT # Import borrow limit
 
 # Get the User model
 User = get_user_model()
@@ -148,6 +149,7 @@ class LibraryAPITestCaseBase(APITestCase):
         # Book Management
         cls.book_list_create_url = reverse('book-list-create') # Removed 'backend:'
         cls.borrowed_books_list_url = reverse('borrowed-books-list') # Removed 'backend:'
+        cls.book_export_url = reverse('book-export')
         # Detail/Action URLs need an ID, generated within tests using reverse
         cls.book_detail_url = lambda book_id: reverse('book-detail', kwargs={'id': book_id}) # Removed 'backend:'
         cls.book_borrow_url = lambda book_id: reverse('book-borrow', kwargs={'book_id': book_id}) # Removed 'backend:'
@@ -162,6 +164,8 @@ class LibraryAPITestCaseBase(APITestCase):
         """
         # Ensure client is logged out before each test by default
         self.client.logout()
+        # Rolled-back test data does not bump the book response cache version
+        cache.clear()
 
     # --- Helper Methods ---
     def _login_user(self, user_type='user1'): # Default to user1 for simplicity
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests for the title catalogue (WorkListView, WorkDetailView, BorrowWorkView)
+and the copy counters kept by backend/works.py.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from .test_views_base import LibraryAPITestCaseBase
+from backend.models import Book, Work
+from backend.works import refresh_work_counts
+
+
+class WorkViewsTestCase(LibraryAPITestCaseBase):
+
+    def setUp(self):
+        super().setUp()
+        self.work_list_url = reverse('work-list')
+        # Two more copies of book1's title
+        self.copies = [
+            Book.objects.create(
+                title=self.book1.title, author=self.book1.author, language=self.book1.language,
+                isbn=f'97860000000{n}', category='SF', condition='GD', added_by=self.librarian_user, copy_number=n,
+            )
+            for n in (2, 3)
+        ]
+        self.work = Work.objects.get(id=Book.objects.get(id=self.book1.id).work_id)
+
+    def _counts(self, work=None):
+        work = Work.objects.get(id=(work or self.work).id)
+        return work.copy_count, work.available_copies
+
+    def _assert_counts_match_copies(self):
+        stored = dict(Work.objects.values_list('id', 'available_copies'))
+        refresh_work_counts(stored)
+        self.assertEqual(dict(Work.objects.values_list('id', 'available_copies')), stored)
+
+    def test_authentication_required(self):
+        self.assertEqual(self.client.get(self.work_list_url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_copies_share_one_work(self):
+        self.assertEqual({copy.work_id for copy in self.copies}, {self.work.id})
+        self.assertEqual(self._counts(), (3, 3))
+        self.assertEqual(self._counts(Work.objects.get(title=self.borrowed_book.title)), (1, 0))
+
+    def test_list_is_one_query_on_works(self):
+        self._login_user('user2')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.work_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'backend_work' in q['sql']]), 1)
+        self.assertEqual(len(response.data), 4) # One entry per title
+        entry = next(work for work in response.data if work['id'] == self.work.id)
+        self.assertEqual((entry['title'], entry['copy_count'], entry['available_copies']), (self.book1.title, 3, 3))
+        self.assertEqual(entry['category_display'], 'Science Fiction')
+        self.assertEqual([work['title'] for work in response.data], sorted(work['title'] for work in response.data))
+
+    def test_list_filters_and_pages(self):
+        self._login_user('user2')
+        response = self.client.get(self.work_list_url, {'available': 'false'})
+        self.assertEqual([work['title'] for work in response.data], [self.borrowed_book.title])
+        response = self.client.get(self.work_list_url, {'search': 'mystery', 'category': 'CR'})
+        self.assertEqual([work['title'] for work in response.data], [self.book_for_filter.title])
+        page = self.client.get(self.work_list_url, {'page_size': 3, 'ordering': '-available_copies'}).data
+        self.assertEqual(page['results'][0]['id'], self.work.id)
+        self.assertEqual(len(self.client.get(page['next']).data['results']), 1)
+        self.assertEqual(self.client.get(self.work_list_url, {'available': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_borrow_and_return_move_the_counter(self):
+        self._login_user('user2')
+        self.client.post(self.book_borrow_url(self.book1.id))
+        self.assertEqual(self._counts(), (3, 2))
+        self.client.post(reverse('book-batch-borrow'), {'books': [self.copies[0].id]}, format='json')
+        self.assertEqual(self._counts(), (3, 1))
+        self.client.post(reverse('book-batch-return'), {'books': [self.book1.id, self.copies[0].id]}, format='json')
+        self.assertEqual(self._counts(), (3, 3))
+        self._assert_counts_match_copies()
+
+    def test_borrow_any_copy_of_a_title(self):
+        user = self._login_user('user2')
+        url = reverse('work-borrow', kwargs={'work_id': self.work.id})
+        borrowed = set()
+        for _ in range(3):
+            response = self.client.post(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            borrowed.add(response.data['book']['id'])
+        self.assertEqual(borrowed, {self.book1.id, *(copy.id for copy in self.copies)})
+        self.assertEqual(set(Book.objects.filter(borrower=user).values_list('id', flat=True)), borrowed)
+        self.assertEqual(self._counts(), (3, 0))
+
+        self._login_user('user1')
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('No copy', response.data['error'])
+        missing = self.client.post(reverse('work-borrow', kwargs={'work_id': 999999}))
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_catalogue_edits_keep_counts(self):
+        self._login_user('librarian')
+        # A retitled copy moves to the work of its new title
+        self.client.patch(self.book_detail_url(self.copies[0].id), {'title': 'A Different Title'})
+        moved = Work.objects.get(title='A Different Title')
+        self.assertEqual((self._counts(), self._counts(moved)), ((2, 2), (1, 1)))
+        self.client.delete(self.book_detail_url(self.copies[1].id))
+        self.assertEqual(self._counts(), (1, 1))
+        # Bulk writes recount the works they touch
+        response = self.client.post(reverse('book-bulk'), [{
+            'title': self.book1.title, 'author': self.book1.author, 'language': self.book1.language,
+            'isbn': '9786000000099', 'category': 'SF', 'condition': 'NW',
+        }], format='json')
+        self.assertEqual(Book.objects.get(id=response.data['created'][0]).work_id, self.work.id)
+        self.assertEqual(self._counts(), (2, 2))
+        self.client.delete(reverse('book-bulk'), {'ids': response.data['created']}, format='json')
+        self.assertEqual(self._counts(), (1, 1))
+        self._assert_counts_match_copies()
+
+    def test_detail_lists_copies(self):
+        self._login_user('user1')
+        response = self.client.get(reverse('work-detail', kwargs={'id': self.work.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({copy['id'] for copy in response.data['copies']}, {self.book1.id, *(c.id for c in self.copies)})
+        self.assertNotIn('borrower', response.data['copies'][0])
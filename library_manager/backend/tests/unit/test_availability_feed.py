@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the availability feed broadcaster (backend/availability_feed.py).
+"""
+import asyncio
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+
+from backend.availability_feed import AvailabilityBroadcaster
+
+
+class AvailabilityBroadcasterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.broadcaster = AvailabilityBroadcaster(history=3)
+
+    def _subscribe(self, last_event_id=None):
+        async def subscribe():
+            return self.broadcaster.subscribe(last_event_id)
+        return async_to_sync(subscribe)()
+
+    def test_event_format(self):
+        event_id = self.broadcaster.publish({'id': 7, 'available': False, 'due_date': '2026-05-14'})
+        subscription = self._subscribe(f"{self.broadcaster.boot}-0")
+        self.assertEqual(subscription.missed, [
+            f'id: {event_id}\nevent: availability\ndata: {{"id":7,"available":false,"due_date":"2026-05-14"}}\n\n'
+        ])
+
+    def test_live_events_reach_subscribers_in_order(self):
+        async def scenario():
+            subscription = self.broadcaster.subscribe()
+            for book_id in (1, 2):
+                self.broadcaster.publish({'id': book_id})
+            received = [await subscription.get(), await subscription.get()]
+            subscription.close()
+            return subscription, received
+
+        subscription, received = async_to_sync(scenario)()
+        self.assertEqual((subscription.missed, subscription.reset), ([], False))
+        self.assertIn('"id":1', received[0])
+        self.assertIn('"id":2', received[1])
+        self.assertEqual(self.broadcaster.subscriber_count(), 0)
+
+    def test_resume_replays_only_missed_events(self):
+        first = self.broadcaster.publish({'id': 1})
+        self.broadcaster.publish({'id': 2})
+        self.broadcaster.publish({'id': 3})
+        subscription = self._subscribe(first)
+        self.assertFalse(subscription.reset)
+        self.assertEqual(len(subscription.missed), 2)
+        self.assertIn('"id":2', subscription.missed[0])
+
+        latest = self._subscribe(f"{self.broadcaster.boot}-3")
+        self.assertEqual((latest.missed, latest.reset), ([], False))
+
+    def test_unknown_or_expired_token_resets(self):
+        first = self.broadcaster.publish({'id': 1})
+        for book_id in range(2, 6):
+            self.broadcaster.publish({'id': book_id}) # History keeps the last 3 only
+        for token in (first, 'oldboot-4', 'garbage', f"{self.broadcaster.boot}-99"):
+            subscription = self._subscribe(token)
+            self.assertTrue(subscription.reset, token)
+            self.assertEqual(subscription.missed, [])
+
+    def test_slow_subscriber_is_told_to_reset(self):
+        async def scenario():
+            subscription = self.broadcaster.subscribe()
+            for book_id in range(5):
+                self.broadcaster.publish({'id': book_id})
+            await asyncio.sleep(0) # Let the scheduled puts run
+            return [await subscription.get() for _ in range(subscription.queue.qsize())]
+
+        received = async_to_sync(scenario)()
+        self.assertEqual(len(received), 4) # Three events, then the end-of-stream marker
+        self.assertIsNone(received[-1])
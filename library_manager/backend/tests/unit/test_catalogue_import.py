@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the bulk catalogue import (backend/catalogue_import.py).
+"""
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from backend.catalogue_import import (
+    clean_record, import_books, import_records, iter_csv_records, iter_json_records,
+)
+from backend.models import Book, BookSearchToken, UserProfile, Work
+from ..factories import UserFactory, UserProfileFactory, BookFactory
+
+
+def _record(i, **extra):
+    return {"title": f"Imported {i}", "author": "Bulk Author", "isbn": f"97877700{i:05d}",
+            "category": "SF", "language": "English", "condition": "GD", **extra}
+
+
+class ReaderTests(TestCase):
+
+    def test_json_array_is_decoded_incrementally(self):
+        """Records split across tiny read chunks are decoded correctly, one by one."""
+        records = [_record(i, publication_year=1990 + i, note='with "quotes", [brackets] and ]') for i in range(5)]
+        text = json.dumps(records, indent=2)
+        self.assertEqual(list(iter_json_records(io.StringIO(text), chunk_size=7)), records)
+        self.assertEqual(list(iter_json_records(io.StringIO(" [ ] "))), [])
+
+    def test_json_errors(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_records(io.StringIO('{"isbn": "1"}')))
+        with self.assertRaises(ValueError):
+            list(iter_json_records(io.StringIO('[{"isbn": "1"}, {"isbn"')))
+
+    def test_csv_blank_cells_are_missing(self):
+        rows = list(iter_csv_records(io.StringIO("isbn,title,publisher\n978123,Title,\n")))
+        self.assertEqual(rows, [{"isbn": "978123", "title": "Title"}])
+
+    def test_clean_record(self):
+        values = clean_record({"isbn": " 978123 ", "publication_year": "1999"})
+        self.assertEqual(values["isbn"], "978123")
+        self.assertEqual(values["publication_year"], 1999)
+        self.assertEqual(values["title"], "Unknown Title")
+        self.assertEqual(values["copy_number"], 1)
+        for bad in ({"title": "No ISBN"}, {"isbn": "1", "category": "XX"},
+                    {"isbn": "1", "publication_year": "soon"}, {"isbn": "12345678901234"}, ["not", "a", "dict"]):
+            with self.subTest(record=bad), self.assertRaises(ValueError):
+                clean_record(bad)
+
+
+class ImportRecordsTests(TestCase):
+
+    def setUp(self):
+        self.admin = UserFactory(username="import_admin")
+        UserProfileFactory(user=self.admin, type="AD")
+
+    def test_inserts_and_updates_in_batches(self):
+        """Each batch costs a fixed number of queries, whatever its size."""
+        BookFactory(isbn=_record(0)["isbn"], title="Old Title")
+        records = [_record(i) for i in range(10)] + [{"title": "No ISBN"}]
+
+        with CaptureQueriesContext(connection) as ctx:
+            summary = import_records(records, added_by=self.admin, batch_size=4)
+        statements = [q['sql'] for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]
+        # 3 batches x (SELECT existing ISBNs, SELECT works, INSERT missing works, SELECT their ids, upsert,
+        # SELECT ids, delete + insert search tokens, recount works, log changes)
+        self.assertEqual(len(statements), 3 * 10)
+        book_inserts = [sql for sql in statements if sql.startswith('INSERT')
+                        and 'backend_booksearchtoken' not in sql and 'backend_bookchange' not in sql
+                        and 'backend_work' not in sql]
+        self.assertEqual(len(book_inserts), 3)
+
+        self.assertEqual((summary.read, summary.created, summary.updated, summary.skipped), (11, 9, 1, 1))
+        self.assertEqual(summary.batches, 3)
+        self.assertEqual(summary.errors, [(11, "Missing ISBN.")])
+        self.assertGreater(summary.rows_per_second, 0)
+        self.assertEqual(Book.objects.get(isbn=_record(0)["isbn"]).title, "Imported 0")
+        self.assertEqual(Book.objects.filter(added_by=self.admin).count(), 10)
+
+    def test_update_keeps_loans_and_refreshes_search_index(self):
+        borrower = UserFactory(username="import_borrower")
+        UserProfileFactory(user=borrower)
+        book = BookFactory(isbn=_record(1)["isbn"], title="Before", available=False, borrower=borrower)
+
+        import_records([_record(1, title="After Rename")])
+
+        book.refresh_from_db()
+        self.assertEqual(book.title, "After Rename")
+        self.assertFalse(book.available)
+        self.assertEqual(book.borrower, borrower)
+        self.assertEqual(UserProfile.objects.get(user=borrower).active_loans, 1)
+        self.assertTrue(BookSearchToken.objects.filter(book=book, token="rename").exists())
+        self.assertFalse(BookSearchToken.objects.filter(book=book, token="before").exists())
+        # The copy moved to the work of its new title, counters included
+        self.assertEqual((book.work.title, book.work.copy_count, book.work.available_copies), ("After Rename", 1, 0))
+        self.assertEqual(Work.objects.get(title="Before").copy_count, 0)
+
+    def test_repeated_isbn_last_one_wins(self):
+        summary = import_records([_record(2, title="First"), _record(2, title="Second")])
+        self.assertEqual(summary.created, 1)
+        self.assertEqual(Book.objects.get(isbn=_record(2)["isbn"]).title, "Second")
+
+
+class ImportFilesTests(TestCase):
+
+    def _write(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+            fp.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_every_format(self):
+        records = [_record(i) for i in range(3)]
+        csv_content = "isbn,title,author,category,language,condition\n" + "".join(
+            f"{r['isbn']},{r['title']},{r['author']},{r['category']},{r['language']},{r['condition']}\n" for r in records)
+        for suffix, content in [
+            ('.json', json.dumps(records)),
+            ('.ndjson', "\n".join(json.dumps(r) for r in records) + "\n"),
+            ('.csv', csv_content),
+        ]:
+            with self.subTest(format=suffix):
+                Book.objects.all().delete()
+                summary = import_books(self._write(suffix, content))
+                self.assertEqual(summary.created, 3)
+                self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), [r['title'] for r in records])
+
+    def test_bundled_books_data(self):
+        """The shipped books_data.json imports cleanly."""
+        path = os.path.join(os.path.dirname(__file__), '..', '..', 'books_data.json')
+        summary = import_books(path)
+        self.assertEqual(summary.skipped, 0)
+        self.assertEqual(Book.objects.count(), summary.created)
+
+    def test_command(self):
+        path = self._write('.ndjson', json.dumps(_record(7)) + "\n{\"title\": \"no isbn\"}\n")
+        out = StringIO()
+        call_command('import_books', path, '--batch-size', '10', stdout=out)
+        self.assertIn("skipped record 2: Missing ISBN.", out.getvalue())
+        self.assertIn("1 created", out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('import_books', path, '--added-by', 'nobody', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('import_books', self._write('.txt', ''), stdout=StringIO())
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the direct MySQL connection pool (backend/db_config.py).
+"""
+import gc
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from mysql.connector import Error
+
+from backend import db_config
+from backend.db_config import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.healthy = True
+        self.closed = False
+        self.in_transaction = False
+        self.resets = 0
+
+    def cursor(self):
+        return 'cursor'
+
+    def ping(self, reconnect=False):
+        if not self.healthy:
+            raise Error(msg="gone away")
+
+    def rollback(self):
+        if self.closed or not self.healthy:
+            raise Error(msg="gone away")
+        self.in_transaction = False
+
+    def reset_session(self):
+        self.resets += 1
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        self.connect = connect
+
+    def _pool(self, **kwargs):
+        return ConnectionPool(self.connect, **kwargs)
+
+    def test_connections_are_reused(self):
+        pool = self._pool(size=2)
+        for _ in range(3):
+            with pool.acquire() as conn:
+                self.assertEqual(conn.cursor(), 'cursor') # Proxied to the real connection
+        self.assertEqual(len(self.opened), 1)
+        self.assertFalse(self.opened[0].closed)
+        stats = pool.stats()
+        self.assertEqual((stats['checkouts'], stats['open'], stats['idle'], stats['in_use']), (3, 1, 1, 0))
+
+    def test_closed_proxy_cannot_be_used(self):
+        conn = self._pool().acquire()
+        conn.close()
+        conn.close() # Returning twice is harmless
+        with self.assertRaises(Error):
+            conn.cursor()
+
+    def test_released_connections_are_reset(self):
+        pool = self._pool()
+        with pool.acquire() as conn:
+            conn.in_transaction = True
+        self.assertEqual((self.opened[0].in_transaction, self.opened[0].resets), (False, 1))
+
+        conn = pool.acquire()
+        self.opened[0].healthy = False # Rollback fails: closed, not reused
+        conn.close()
+        self.assertTrue(self.opened[0].closed)
+        self.assertEqual((pool.stats()['open'], pool.stats()['discarded']), (0, 1))
+
+    def test_dropped_proxy_returns_its_connection(self):
+        pool = self._pool(size=1, timeout=0.05)
+        pool.acquire() # Never closed
+        gc.collect()
+        pool.acquire().close()
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual((pool.stats()['reclaimed'], self.opened[0].resets), (1, 2))
+
+    def test_unhealthy_and_stale_connections_are_replaced(self):
+        pool = self._pool(max_idle=60)
+        pool.acquire().close()
+        self.opened[0].healthy = False
+        pool.acquire().close()
+        self.assertEqual(len(self.opened), 2)
+        self.assertTrue(self.opened[0].closed)
+
+        with patch('backend.db_config.time.monotonic', return_value=time.monotonic() + 61):
+            pool.acquire().close()
+        self.assertEqual(len(self.opened), 3)
+        self.assertEqual(pool.stats()['discarded'], 2)
+
+    def test_exhausted_pool_times_out(self):
+        pool = self._pool(size=1, timeout=0.05)
+        held = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        held.close()
+        pool.acquire().close()
+
+    def test_waiting_checkout_gets_released_connection(self):
+        pool = self._pool(size=1, timeout=5)
+        held = pool.acquire()
+        threading.Timer(0.05, held.close).start()
+        with pool.acquire():
+            pass
+        stats = pool.stats()
+        self.assertEqual((stats['waits'], len(self.opened)), (1, 1))
+        self.assertGreater(stats['max_wait_ms'], 0)
+
+    def test_failed_connect_frees_the_slot(self):
+        calls = []
+
+        def flaky_connect():
+            calls.append(1)
+            if len(calls) == 1:
+                raise Error(msg="refused")
+            return FakeConnection()
+
+        pool = ConnectionPool(flaky_connect, size=1)
+        with self.assertRaises(Error):
+            pool.acquire()
+        pool.acquire().close()
+        self.assertEqual(pool.stats()['open'], 1)
+
+
+class GetDbConnectionTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = patch.object(db_config, '_pool', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_returns_pooled_connection(self):
+        with patch('backend.db_config.open_db_connection', return_value=FakeConnection()) as connect:
+            db_config.get_db_connection().close()
+            db_config.get_db_connection().close()
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(db_config.db_pool_stats()['checkouts'], 2)
+
+    @patch('builtins.print')
+    def test_returns_none_when_mysql_is_unreachable(self, mock_print):
+        with patch('backend.db_config.open_db_connection', side_effect=Error(msg="refused")):
+            self.assertIsNone(db_config.get_db_connection())
+        mock_print.assert_called_once()
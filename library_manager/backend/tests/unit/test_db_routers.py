@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the read-replica router (backend/db_routers.py).
+"""
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from backend.db_routers import (
+    PIN_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware, RoutingState, _state, read_alias,
+)
+from backend.models import Book
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.state = RoutingState()
+        token = _state.set(self.state)
+        self.addCleanup(_state.reset, token)
+
+    def test_reads_go_to_primary_outside_listing_views(self):
+        self.assertIsNone(self.router.db_for_read(Book))
+        self.assertEqual(read_alias(), 'default')
+
+    def test_listing_reads_go_to_replica(self):
+        self.state.replica_reads = True
+        self.assertEqual(self.router.db_for_read(Book), 'replica')
+        self.assertEqual(read_alias(), 'replica')
+
+    def test_write_pins_the_rest_of_the_request(self):
+        self.state.replica_reads = True
+        self.assertIsNone(self.router.db_for_write(Book))
+        self.assertIsNone(self.router.db_for_read(Book))
+
+    def test_pinned_client_reads_primary(self):
+        self.state.replica_reads = True
+        self.state.pinned = True
+        self.assertIsNone(self.router.db_for_read(Book))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        self.state.replica_reads = True
+        self.assertIsNone(self.router.db_for_read(Book))
+
+    def test_no_request_state(self):
+        _state.set(None)
+        self.assertIsNone(self.router.db_for_read(Book))
+        self.assertIsNone(self.router.db_for_write(Book))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=7)
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+
+    def _run(self, view, cookies=None):
+        request = RequestFactory().get('/api/books/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_write_sets_pin_cookie(self):
+        def view(request):
+            PrimaryReplicaRouter().db_for_write(Book)
+            return HttpResponse()
+
+        response = self._run(view)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 7)
+        self.assertIsNone(_state.get()) # Reset after the request
+
+    def test_read_only_request_sets_no_cookie(self):
+        response = self._run(lambda request: HttpResponse())
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_cookie_pins_the_request(self):
+        seen = []
+
+        def view(request):
+            seen.append(_state.get().pinned)
+            return HttpResponse()
+
+        self._run(view, cookies={PIN_COOKIE: '1'})
+        self.assertEqual(seen, [True])
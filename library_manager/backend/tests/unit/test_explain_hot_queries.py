@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the explain_hot_queries management command.
+"""
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from backend.management.commands.explain_hot_queries import find_full_scans
+from backend.models import Book
+
+
+class FindFullScansTests(TestCase):
+
+    def test_sqlite_plans(self):
+        self.assertEqual(find_full_scans('sqlite', "2 0 0 SCAN backend_book"), ['backend_book'])
+        self.assertEqual(find_full_scans('sqlite', "2 0 0 SCAN TABLE backend_book AS U0"), ['backend_book'])
+        self.assertEqual(find_full_scans('sqlite', "3 0 0 SEARCH backend_book USING INDEX x (category=?)"), [])
+        self.assertEqual(find_full_scans('sqlite', "2 0 0 SCAN backend_book USING INDEX book_title_id_idx"), [])
+
+    def test_mysql_plans(self):
+        plan = {"query_block": {"nested_loop": [
+            {"table": {"table_name": "backend_book", "access_type": "ref"}},
+            {"table": {"table_name": "auth_user", "access_type": "ALL"}},
+        ]}}
+        self.assertEqual(find_full_scans('mysql', json.dumps(plan)), ['auth_user'])
+
+    def test_postgresql_plans(self):
+        self.assertEqual(find_full_scans('postgresql', "Seq Scan on backend_book  (cost=0.00..1.01)"), ['backend_book'])
+        self.assertEqual(find_full_scans('postgresql', "Index Scan using book_title_id_idx on backend_book"), [])
+
+    def test_unsupported_backend(self):
+        with self.assertRaises(CommandError):
+            find_full_scans('oracle', "")
+
+
+class ExplainHotQueriesCommandTests(TestCase):
+
+    def test_hot_queries_use_indexes(self):
+        """With the composite indexes in place no hot query needs a full scan."""
+        if connection.vendor != 'sqlite':
+            self.skipTest("Planner choices on small test tables are only deterministic on SQLite")
+        out = StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        self.assertNotIn("FULL SCAN", out.getvalue())
+
+    def test_fails_on_full_scan(self):
+        hot = [("filter: available", Book.objects.filter(available=True))]
+        with patch('backend.management.commands.explain_hot_queries.find_full_scans', return_value=['backend_book']), \
+                patch('backend.management.commands.explain_hot_queries.hot_queries', return_value=hot):
+            with self.assertRaisesMessage(CommandError, "filter: available"):
+                call_command('explain_hot_queries', stdout=StringIO())
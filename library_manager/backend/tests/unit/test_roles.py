@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the cached role lookup (backend/roles.py).
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase
+
+from backend.models import UserProfile
+from backend.roles import get_role, is_admin, is_admin_or_librarian
+from ..factories import UserFactory, UserProfileFactory
+
+User = get_user_model()
+
+
+class GetRoleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+        UserProfileFactory(user=self.user, type='US')
+
+    def _fresh(self, user):
+        """The user as request.user loads it: without its profile."""
+        return User.objects.get(pk=user.pk)
+
+    def test_role_is_read_once_per_request(self):
+        user = self._fresh(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_role(user), 'US')
+            self.assertFalse(is_admin(user))
+            self.assertFalse(is_admin_or_librarian(user))
+
+    def test_role_is_cached_across_requests(self):
+        get_role(self._fresh(self.user))
+        user = self._fresh(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_role(user), 'US')
+
+    def test_loaded_profile_is_used_without_queries(self):
+        user = User.objects.select_related('profile').get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_role(user), 'US')
+
+    def test_profile_save_invalidates_cached_role(self):
+        get_role(self._fresh(self.user))
+        profile = UserProfile.objects.get(user=self.user)
+        profile.type = 'LB'
+        profile.save()
+        self.assertEqual(get_role(self._fresh(self.user)), 'LB')
+        self.assertTrue(is_admin_or_librarian(self._fresh(self.user)))
+
+    def test_profile_delete_invalidates_cached_role(self):
+        get_role(self._fresh(self.user))
+        UserProfile.objects.filter(user=self.user).delete() # Queryset delete still sends post_delete
+        self.assertIsNone(get_role(self._fresh(self.user)))
+
+    def test_users_without_profile_and_anonymous_users_have_no_role(self):
+        user = UserFactory()
+        self.assertIsNone(get_role(self._fresh(user)))
+        user = self._fresh(user)
+        with self.assertNumQueries(0): # "No profile" is cached too
+            self.assertIsNone(get_role(user))
+        self.assertIsNone(get_role(AnonymousUser()))
+        self.assertIsNone(get_role(None))
+
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the book search token index (backend/search.py).
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from backend.models import Book, BookSearchToken
+from backend.search import book_tokens, rebuild_index, search_books, tokenize
+from ..factories import BookFactory
+
+
+class TokenizeTests(TestCase):
+
+    def test_tokenize_words_and_isbn(self):
+        self.assertEqual(tokenize("The Hobbit: There and Back"), ["the", "hobbit", "there", "and", "back"])
+        self.assertEqual(tokenize("978-0-13-468599-1"), ["9780134685991"])
+        self.assertEqual(tokenize(""), [])
+        self.assertEqual(tokenize(None), [])
+
+    def test_book_tokens_keep_highest_weight(self):
+        tokens = book_tokens({'title': 'Tolkien Reader', 'author': 'J. R. R. Tolkien', 'isbn': '9780345345066'})
+        self.assertEqual(tokens['tolkien'], 3) # Title weight wins over author weight
+        self.assertEqual(tokens['r'], 2)
+        self.assertEqual(tokens['9780345345066'], 5)
+
+
+class SearchIndexTests(TestCase):
+
+    def setUp(self):
+        self.hobbit = BookFactory(title="The Hobbit", author="J.R.R. Tolkien", isbn="9780547928227")
+        self.silmarillion = BookFactory(title="The Silmarillion", author="J.R.R. Tolkien", isbn="9780618391110")
+        self.dune = BookFactory(title="Dune", author="Frank Herbert", isbn="9780441172719")
+
+    def _ids(self, query):
+        return list(search_books(Book.objects.all(), query).order_by('-search_rank', 'id').values_list('id', flat=True))
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertTrue(BookSearchToken.objects.filter(book=self.dune, token='dune').exists())
+
+        self.dune.title = "Children of Dune"
+        self.dune.save()
+        self.assertEqual(self._ids("children"), [self.dune.id])
+
+        # Saves that do not touch indexed fields leave the index alone
+        self.dune.available = False
+        self.dune.save(update_fields=['available'])
+        self.assertEqual(self._ids("children"), [self.dune.id])
+
+        self.dune.delete()
+        self.assertEqual(self._ids("dune"), [])
+
+    def test_prefix_and_all_terms_must_match(self):
+        self.assertEqual(sorted(self._ids("tolk")), sorted([self.hobbit.id, self.silmarillion.id]))
+        self.assertEqual(self._ids("tolk hob"), [self.hobbit.id])
+        self.assertEqual(self._ids("9780441"), [self.dune.id])
+        self.assertEqual(self._ids("tolkien dune"), [])
+
+    def test_ranking_prefers_exact_and_heavier_fields(self):
+        herbert = BookFactory(title="Herbert Collected", author="Anonymous", isbn="9781111111101")
+        # 'herbert' is a title word (weight 3) of one book and an author word (weight 2) of the other
+        self.assertEqual(self._ids("herbert"), [herbert.id, self.dune.id])
+        # Exact words outrank mere prefixes
+        hobbits = BookFactory(title="Hobbits Abroad", author="Someone", isbn="9781111111102")
+        self.assertEqual(self._ids("hobbit"), [self.hobbit.id, hobbits.id])
+
+    def test_rebuild_index(self):
+        Book.objects.filter(id=self.dune.id).update(title="God Emperor") # Bypasses signals
+        self.assertEqual(self._ids("emperor"), [])
+        self.assertEqual(rebuild_index(batch_size=2), 3)
+        self.assertEqual(self._ids("emperor"), [self.dune.id])
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn("Indexed 3 books", out.getvalue())
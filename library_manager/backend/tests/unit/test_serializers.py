@@ -14,6 +14,8 @@ from django.http import HttpRequest
 from django.test import RequestFactory
 # Keep DRFRequest import if needed elsewhere, but avoid passing it in context
 from rest_framework.request import Request as DRFRequest
+from rest_framework.renderers import JSONRenderer
+from django.contrib.auth.models import AnonymousUser
 
 
 from backend.serializers import (
@@ -21,6 +23,8 @@ from backend.serializers import (
     UserSerializer,
     RegisterSerializer,
     BookSerializer,
+    BookFastListSerializer,
+    BOOK_FIELD_COLUMNS,
 )
 from backend.models import UserProfile, Book
 from ..factories import UserFactory, UserProfileFactory, BookFactory
@@ -515,4 +519,66 @@ class BookSerializerTests(TestCase):
         with self.assertRaises(DjangoValidationError) as cm:
              new_book = Book(**invalid_data)
              new_book.full_clean()
-        self.assertIn('isbn', cm.exception.error_dict)
\ No newline at end of file
+        self.assertIn('isbn', cm.exception.error_dict)
+
+# --- BookFastListSerializer Tests ---
+
+class BookFastListSerializerTests(TestCase):
+    """The values()-based list serializer must render exactly what BookSerializer renders."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = UserFactory(username="fastlibrarian")
+        UserProfileFactory(user=cls.librarian, type='LB')
+        cls.borrower = UserFactory(username="fastborrower")
+        UserProfileFactory(user=cls.borrower, type='US')
+        cls.other_user = UserFactory(username="fastother")
+        UserProfileFactory(user=cls.other_user, type='US')
+        today = date.today()
+        BookFactory(isbn="9785550000001", added_by=cls.librarian, image='test_cover.jpg')
+        BookFactory(isbn="9785550000002", added_by=None, image='static/images/covers/x.jpg',
+                    storage_location="Shelf A1", copy_number=2)
+        BookFactory(isbn="9785550000003", available=False, borrower=cls.borrower,
+                    borrow_date=today - timedelta(days=5), due_date=today + timedelta(days=9))
+        BookFactory(isbn="9785550000004", available=False, borrower=cls.borrower,
+                    borrow_date=today - timedelta(days=20), due_date=today - timedelta(days=6))
+        BookFactory(isbn="9785550000005", available=False, borrower=cls.borrower,
+                    borrow_date=today - timedelta(days=14), due_date=today, publication_year=None)
+        BookFactory(isbn="9785550000006", image='', category='XX')
+
+    def _render_both(self, viewer):
+        context = {}
+        if viewer is not None:
+            request = RequestFactory().get('/api/books/')
+            request.user = viewer
+            context['request'] = request
+        queryset = Book.objects.select_related('added_by', 'borrower').order_by('id')
+        expected = BookSerializer(queryset, many=True, context=context).data
+        fast = BookFastListSerializer(Book.objects.order_by('id'), context=context).data
+        return JSONRenderer().render(expected), JSONRenderer().render(fast)
+
+    def test_identical_output_for_every_viewer(self):
+        """Byte-identical JSON for the borrower, another user, a librarian and no request."""
+        for viewer in [self.borrower, self.other_user, self.librarian, AnonymousUser(), None]:
+            with self.subTest(viewer=viewer):
+                expected, fast = self._render_both(viewer)
+                self.assertEqual(fast, expected)
+
+    def test_accepts_values_rows(self):
+        """A pre-built values() queryset (as used by paginated views) is consumed as-is."""
+        rows = BookFastListSerializer.get_values_queryset(Book.objects.filter(available=False).order_by('id'))
+        data = BookFastListSerializer(list(rows)).data
+        self.assertEqual([book['days_left'] for book in data], [9, -6, 0])
+        self.assertEqual([book['borrower'] for book in data], ["Checked Out"] * 3)
+
+    def test_sparse_fieldsets_render_the_same_values(self):
+        """Each field computed on its own (?fields=) matches the full rendering."""
+        request = RequestFactory().get('/api/books/')
+        request.user = self.borrower
+        context = {'request': request}
+        full = BookFastListSerializer(Book.objects.order_by('id'), context=context).data
+        for name in BOOK_FIELD_COLUMNS:
+            with self.subTest(field=name):
+                fields = ('id', name) if name != 'id' else ('id',)
+                sparse = BookFastListSerializer(Book.objects.order_by('id'), context={**context, 'fields': fields}).data
+                self.assertEqual(sparse, [{field: book[field] for field in fields} for book in full])
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the memoized static URL resolution (backend/static_urls.py).
+"""
+from unittest.mock import patch
+
+from django.test import TestCase, RequestFactory, override_settings
+
+from backend import static_urls
+from backend.static_urls import (
+    StaticURLCache, book_image_url, avatar_url, clear_static_url_cache, static_url_cache_info,
+)
+
+
+class StaticURLCacheTests(TestCase):
+
+    def test_lru_eviction_and_counters(self):
+        """The least recently used entry is evicted once maxsize is exceeded."""
+        cache = StaticURLCache(maxsize=2)
+        cache.get_or_resolve('a', lambda: 1)
+        cache.get_or_resolve('b', lambda: 2)
+        self.assertEqual(cache.get_or_resolve('a', lambda: 'recomputed'), 1) # hit, 'a' becomes most recent
+        cache.get_or_resolve('c', lambda: 3) # evicts 'b'
+        self.assertEqual(cache.get_or_resolve('b', lambda: 'recomputed'), 'recomputed')
+        info = cache.info()
+        self.assertEqual((info['hits'], info['misses'], info['size']), (1, 4, 2))
+
+
+class StaticURLResolutionTests(TestCase):
+
+    def setUp(self):
+        clear_static_url_cache()
+        self.factory = RequestFactory()
+
+    def test_book_image_prefix_cleanup_and_default(self):
+        """Stored names are normalised under /static/images/ and empty names use the default cover."""
+        self.assertEqual(book_image_url('static/images/covers/a.jpg'), '/static/images/covers/a.jpg')
+        self.assertEqual(book_image_url('images/b.jpg'), '/static/images/b.jpg')
+        self.assertEqual(book_image_url(' c.jpg '), '/static/images/c.jpg')
+        self.assertEqual(book_image_url(''), '/static/images/library_seal.jpg')
+        self.assertEqual(book_image_url(None), '/static/images/library_seal.jpg')
+
+    def test_avatar_paths(self):
+        self.assertEqual(avatar_url('avatars/user-1.svg'), '/static/images/avatars/user-1.svg')
+        self.assertEqual(avatar_url('user-2.svg'), '/static/images/avatars/user-2.svg')
+        self.assertEqual(avatar_url(None), '/static/images/avatars/default.svg')
+
+    def test_repeated_lookups_hit_the_cache(self):
+        """Only the first lookup of a name (per host) resolves; repeats are hits."""
+        request = self.factory.get('/api/books/')
+        before = static_url_cache_info()
+        with patch('backend.static_urls.static', wraps=static_urls.static) as mock_static:
+            for _ in range(5):
+                url = book_image_url('static/images/covers/a.jpg', request)
+        self.assertEqual(url, 'http://testserver/static/images/covers/a.jpg')
+        self.assertEqual(mock_static.call_count, 1)
+        info = static_url_cache_info()
+        self.assertEqual(info['misses'] - before['misses'], 2) # the path and the absolute URL for this host
+        self.assertEqual(info['hits'] - before['hits'], 8)
+
+    def test_absolute_urls_are_keyed_on_host(self):
+        request_a = self.factory.get('/api/books/', HTTP_HOST='a.example.com')
+        request_b = self.factory.get('/api/books/', secure=True, HTTP_HOST='b.example.com')
+        self.assertEqual(book_image_url('x.jpg', request_a), 'http://a.example.com/static/images/x.jpg')
+        self.assertEqual(book_image_url('x.jpg', request_b), 'https://b.example.com/static/images/x.jpg')
+
+    def test_cleared_when_static_settings_change(self):
+        self.assertEqual(book_image_url('x.jpg'), '/static/images/x.jpg')
+        with override_settings(STATIC_URL='/assets/'):
+            self.assertEqual(book_image_url('x.jpg'), '/assets/images/x.jpg')
+        self.assertEqual(book_image_url('x.jpg'), '/static/images/x.jpg')
+
+    def test_cleared_when_static_files_are_recollected(self):
+        """A changed collection stamp (collectstatic run) drops the cached entries."""
+        with patch('backend.static_urls._collection_stamp', return_value=1):
+            book_image_url('x.jpg')
+        self.assertGreater(static_url_cache_info()['size'], 0)
+        clears = static_url_cache_info()['clears']
+        with patch('backend.static_urls._collection_stamp', return_value=2), \
+             override_settings(STATIC_URL_CACHE_CHECK_INTERVAL=0):
+            book_image_url('y.jpg')
+        self.assertEqual(static_url_cache_info()['clears'], clears + 1)
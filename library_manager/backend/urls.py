@@ -15,9 +15,13 @@ from .views import (
     # User Management
     UserListView, CurrentUserView, UserDetailView, CurrentUserUpdateView, promote_user_to_librarian,
     # Book Management
-    BookListCreateView, BookDetailView, BorrowBookView, ReturnBookView, BorrowedBooksListView,
+    BookListCreateView, BookExportView, BookChangesView, BookBulkView, BookDetailView, BorrowBookView, ReturnBookView, BorrowedBooksListView,
+    BatchBorrowView, BatchReturnView, WorkListView, WorkDetailView, BorrowWorkView, LoanHistoryView, MyLoanHistoryView,
+    PlaceHoldView, CancelHoldView, MyHoldsView,
     # Security & CSRF
     csrf_token_view,
+    # Monitoring
+    cache_stats_view, db_pool_stats_view,
 )
 
 app_name = "backend" # Changed app_name to 'backend' as it contains the API logic
@@ -41,6 +45,10 @@ urlpatterns = [
     path("api/users/me/", CurrentUserView.as_view(), name="current-user"),
     # Update details of the currently logged-in user
     path("api/users/me/update/", CurrentUserUpdateView.as_view(), name="current-user-update"), # Changed from update-profile
+    # Borrow/return history of the currently logged-in user
+    path("api/users/me/loans/", MyLoanHistoryView.as_view(), name="my-loan-history"),
+    # Holds of the currently logged-in user
+    path("api/users/me/holds/", MyHoldsView.as_view(), name="my-holds"),
     # Retrieve, Update, Delete a specific user by ID (Admin only)
     path("api/users/<int:id>/", UserDetailView.as_view(), name="user-detail"), # Use 'id' consistent with view lookup_field
     #promote the user to librarian (Admin only)
@@ -59,14 +67,35 @@ urlpatterns = [
     # ============================== #
     # List books (GET) and Create books (POST)
     path("api/books/", BookListCreateView.as_view(), name="book-list-create"),
+    # Stream the whole (filtered) catalogue as JSON or NDJSON (GET)
+    path("api/books/export/", BookExportView.as_view(), name="book-export"),
+    # Books created/updated/deleted since a change token, for clients keeping a local copy (GET)
+    path("api/books/changes/", BookChangesView.as_view(), name="book-changes"),
+    # Create (POST), update (PATCH) or delete (DELETE) many books at once (Admin/Librarian)
+    path("api/books/bulk/", BookBulkView.as_view(), name="book-bulk"),
     # Retrieve (GET), Update (PUT/PATCH), Delete (DELETE) a specific book
     path("api/books/<int:id>/", BookDetailView.as_view(), name="book-detail"), # Use 'id' consistent with view lookup_field
     # Borrow a specific book (POST)
     path("api/books/<int:book_id>/borrow/", BorrowBookView.as_view(), name="book-borrow"),
     # Return a specific book (POST)
     path("api/books/<int:book_id>/return/", ReturnBookView.as_view(), name="book-return"),
+    # Borrow/return several books (ids or ISBNs) in one transaction, with a result per book (POST)
+    path("api/books/borrow/", BatchBorrowView.as_view(), name="book-batch-borrow"),
+    path("api/books/return/", BatchReturnView.as_view(), name="book-batch-return"),
     # List borrowed books (for current user or all users for admin/librarian)
     path("api/books/borrowed/", BorrowedBooksListView.as_view(), name="borrowed-books-list"),
+    # The catalogue by title, with copy counts (GET)
+    path("api/works/", WorkListView.as_view(), name="work-list"),
+    # A title with its copies (GET)
+    path("api/works/<int:id>/", WorkDetailView.as_view(), name="work-detail"),
+    # Borrow any available copy of a title (POST)
+    path("api/works/<int:work_id>/borrow/", BorrowWorkView.as_view(), name="work-borrow"),
+    # Join the hold queue of a title with no available copy (POST)
+    path("api/works/<int:work_id>/hold/", PlaceHoldView.as_view(), name="work-hold"),
+    # Cancel a hold (DELETE)
+    path("api/holds/<int:id>/", CancelHoldView.as_view(), name="hold-detail"),
+    # Loan ledger: all borrows/returns (Admin/Librarian), filter by ?book=, ?user=, ?from=/?to=
+    path("api/loans/", LoanHistoryView.as_view(), name="loan-history"),
 
     # --- Removed old/redundant book routes ---
     # path("api/principal/", ListBooksView.as_view(), name="list-books"), # Combined into book-list-create
@@ -83,7 +112,15 @@ urlpatterns = [
     path("api/csrf/", csrf_token_view, name="csrf-token"), # Renamed for clarity
 
     # ============================== #
-    # 5️ STATIC & FRONTEND ROUTES     #
+    # 5️ MONITORING ROUTES            #
+    # ============================== #
+    # In-process cache hit/miss counters (Admin only)
+    path("api/monitoring/cache/", cache_stats_view, name="cache-stats"),
+    # Database connection pool checkouts/wait times (Admin only)
+    path("api/monitoring/db-pool/", db_pool_stats_view, name="db-pool-stats"),
+
+    # ============================== #
+    # 6️ STATIC & FRONTEND ROUTES     #
     # ============================== #
     re_path(r"^favicon\.ico$", favicon_view),
     # Catch-all for frontend routing (ensure it's the last pattern)
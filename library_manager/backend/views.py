@@ -1,31 +1,55 @@
 import json
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
+from itertools import groupby
 
 from django.shortcuts import render, get_object_or_404
+from django.http import StreamingHttpResponse
 from django.views.generic import TemplateView
 from django.contrib.auth import authenticate, login, logout, get_user_model, update_session_auth_hash
 from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.db import connection
 from django.db.models import Count
 
 from rest_framework import generics, status, permissions, filters, views as drf_views
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes as drf_permission_classes
 
+# ?search= uses DRF's SearchFilter; ?search_mode=index switches to the token index (see search.py)
+from .search import IndexedSearchFilter
+
 # Use django-filter for advanced filtering if installed, otherwise use DRF defaults
 try:
     from django_filters.rest_framework import DjangoFilterBackend
-    DEFAULT_FILTER_BACKENDS = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    DEFAULT_FILTER_BACKENDS = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
 except ImportError:
-    DEFAULT_FILTER_BACKENDS = [filters.SearchFilter, filters.OrderingFilter]
+    DEFAULT_FILTER_BACKENDS = [IndexedSearchFilter, filters.OrderingFilter]
 
 
-from .models import Book, UserProfile
+from .change_log import DEFAULT_LIMIT as CHANGES_DEFAULT_LIMIT, MAX_LIMIT as CHANGES_MAX_LIMIT, changes_since
+from .catalogue_bulk import MAX_BULK_BOOKS, delete_books
+from .db_config import db_pool_stats
+from .db_routers import ReplicaReadMixin, read_alias
+from .circulation import (
+    MAX_BATCH_SIZE, CirculationError, borrow_book, borrow_books, borrow_work, cancel_hold,
+    place_hold, return_book, return_books,
+)
+from .models import Book, Hold, Loan, UserProfile, Work
+from .pagination import (
+    KeysetPagination, LedgerPagination, get_ordering_keys, iter_keyset_batches, ordering_expressions,
+)
+from .static_urls import static_url_cache_info
+from .response_cache import book_response_etag, book_response_last_modified, cached_book_response
+from .roles import is_admin, is_admin_or_librarian
 from .serializers import (
-    UserSerializer, RegisterSerializer, BookSerializer, UserProfileSerializer
+    UserSerializer, RegisterSerializer, BookSerializer, UserProfileSerializer, BookFastListSerializer,
+    LoanSerializer, HoldSerializer, WorkSerializer, WorkDetailSerializer, get_requested_book_fields,
+    narrow_book_queryset,
 )
 
-# Define the borrow limit constant
-MAX_BORROW_LIMIT = 3
 User = get_user_model() # Use Django's configured user model
 
 # --- Custom Permissions ---
@@ -36,8 +60,7 @@ class IsAdminUser(permissions.BasePermission):
         return (
             request.user and
             request.user.is_authenticated and
-            hasattr(request.user, 'profile') and
-            request.user.profile.type == 'AD'
+            is_admin(request.user)
         )
 
 class IsAdminOrLibrarian(permissions.BasePermission):
@@ -46,8 +69,7 @@ class IsAdminOrLibrarian(permissions.BasePermission):
         return (
             request.user and
             request.user.is_authenticated and
-            hasattr(request.user, 'profile') and
-            request.user.profile.type in ['AD', 'LB']
+            is_admin_or_librarian(request.user)
         )
 
 class IsAdminOrLibrarianOrReadOnly(permissions.BasePermission):
@@ -61,7 +83,7 @@ class IsAdminOrLibrarianOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         # Write permissions check
-        return hasattr(request.user, 'profile') and request.user.profile.type in ['AD', 'LB']
+        return is_admin_or_librarian(request.user)
 
     def has_object_permission(self, request, view, obj):
         if not request.user or not request.user.is_authenticated:
@@ -69,7 +91,7 @@ class IsAdminOrLibrarianOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         # Write permissions check
-        return hasattr(request.user, 'profile') and request.user.profile.type in ['AD', 'LB']
+        return is_admin_or_librarian(request.user)
 
 class IsSelfOrAdmin(permissions.BasePermission):
     """
@@ -79,7 +101,7 @@ class IsSelfOrAdmin(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         # Admins have access
-        if hasattr(request.user, 'profile') and request.user.profile.type == 'AD':
+        if is_admin(request.user):
             return True
         # The user themselves has access
         return obj == request.user
@@ -142,7 +164,7 @@ class LogoutView(drf_views.APIView):
 # 2️ USER MANAGEMENT API VIEWS   #
 # ============================== #
 
-class UserListView(generics.ListAPIView):
+class UserListView(ReplicaReadMixin, generics.ListAPIView):
     """Lists all users (Admin only)."""
     queryset = User.objects.select_related('profile').all() # Optimize query
     serializer_class = UserSerializer
@@ -231,26 +253,155 @@ class CurrentUserUpdateView(generics.RetrieveUpdateAPIView):
 # 3️ BOOK MANAGEMENT API VIEWS   #
 # ============================== #
 
-class BookListCreateView(generics.ListCreateAPIView):
+class BookCatalogueFilterMixin:
+    """Filtering/search/ordering shared by the book list and the catalogue export."""
+    queryset = Book.objects.select_related('added_by', 'borrower').all() # Optimize query
+    filter_backends = DEFAULT_FILTER_BACKENDS
+    filterset_fields = ['category', 'language', 'available', 'condition'] # Fields for exact filtering
+    search_fields = ['title', 'author', 'isbn'] # Fields for ?search=... (add &search_mode=index for the token index)
+    ordering_fields = ['title', 'author', 'publication_year', 'category'] # Fields for ?ordering=...
+
+    def get_book_values(self, queryset):
+        """
+        The .values() queryset of the (filtered, ordered) books and the sparse fieldset
+        of the request (?fields= / ?omit=, None for all fields).
+        """
+        fields = get_requested_book_fields(self.request.query_params)
+        # Keyset pages and export batches read the ordering keys back from the rows
+        keys = [name for name, _, _ in get_ordering_keys(queryset)] if fields is not None else ()
+        return BookFastListSerializer.get_values_queryset(queryset, extra_fields=keys, fields=fields), fields
+
+
+class BookListCreateView(ReplicaReadMixin, BookCatalogueFilterMixin, generics.ListCreateAPIView):
     """
     Lists all books (paginated, filterable, searchable, orderable).
     Allows authenticated Admin/Librarian users to create new books.
     """
-    queryset = Book.objects.select_related('added_by', 'borrower').all() # Optimize query
     serializer_class = BookSerializer
     permission_classes = [IsAdminOrLibrarianOrReadOnly] # Read for any auth user, Create for Admin/Librarian
-    filter_backends = DEFAULT_FILTER_BACKENDS
-    filterset_fields = ['category', 'language', 'available', 'condition'] # Fields for exact filtering
-    search_fields = ['title', 'author', 'isbn'] # Fields for ?search=...
-    ordering_fields = ['title', 'author', 'publication_year', 'category'] # Fields for ?ordering=...
-    # Add pagination in settings.py for large lists:
-    # REST_FRAMEWORK = { 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination', 'PAGE_SIZE': 10 }
+    # Keyset pagination, enabled per request with ?page_size=N (follow the returned 'next' cursor links).
+    # Without it the full list is returned as before.
+    pagination_class = KeysetPagination
+
+    @method_decorator(condition(etag_func=book_response_etag, last_modified_func=book_response_last_modified))
+    def list(self, request, *args, **kwargs):
+        # Served from the response cache when possible (see backend/response_cache.py)
+        return cached_book_response(request, self._build_list)
+
+    def _build_list(self):
+        # Read-only fast path: rows come straight from .values() and are serialized by
+        # BookFastListSerializer, which renders exactly what BookSerializer would.
+        queryset = self.filter_queryset(self.get_queryset())
+        # Ties are broken by id, so the plain list, its pages and the export agree on the order
+        queryset = queryset.order_by(*ordering_expressions(get_ordering_keys(queryset)))
+        rows, fields = self.get_book_values(queryset)
+        page = self.paginate_queryset(rows)
+        rows = page if page is not None else list(rows)
+        # Rendered for an anonymous viewer; borrower names are re-applied per request
+        serializer = BookFastListSerializer(rows, context={**self.get_serializer_context(), 'viewer': None, 'fields': fields})
+        borrowers = {row['id']: row['borrower__username'] for row in rows if row.get('borrower__username') is not None}
+        if page is not None:
+            return self.get_paginated_response(serializer.data).data, borrowers
+        return serializer.data, borrowers
 
     def perform_create(self, serializer):
         # Automatically set the 'added_by' field to the current user
         serializer.save(added_by=self.request.user)
 
-class BookDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BookExportView(ReplicaReadMixin, BookCatalogueFilterMixin, generics.GenericAPIView):
+    """
+    Streams the whole (filtered) catalogue as a JSON array, or as NDJSON with
+    ?export_format=ndjson. Books are read in keyset batches of `batch_size` rows and
+    written out as they are serialized, so memory use does not grow with the catalogue.
+    Accepts the same filter/search/ordering parameters as the book list.
+    """
+    permission_classes = [IsAdminOrLibrarianOrReadOnly]
+    batch_size = 1000
+    export_formats = {
+        'json': 'application/json',
+        'ndjson': 'application/x-ndjson',
+    }
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('export_format', 'json')
+        if export_format not in self.export_formats:
+            return Response(
+                {'error': f"Unsupported export_format '{export_format}'. Use one of: {', '.join(self.export_formats)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Filters are validated here, before the response starts streaming
+        queryset, fields = self.get_book_values(self.filter_queryset(self.get_queryset()))
+        # Rows are read while streaming, after the view returned: pick the database now
+        queryset = queryset.using(read_alias())
+        serializer = BookFastListSerializer(None, context={**self.get_serializer_context(), 'fields': fields})
+        rows = (row for batch in iter_keyset_batches(queryset, self.batch_size) for row in batch)
+        if export_format == 'ndjson':
+            content = self._ndjson_chunks(serializer, rows)
+        else:
+            content = self._json_array_chunks(serializer, rows)
+
+        response = StreamingHttpResponse(content, content_type=self.export_formats[export_format])
+        response['Content-Disposition'] = f'attachment; filename="books.{export_format}"'
+        return response
+
+    def _encoded_rows(self, serializer, rows):
+        """Yields lists of JSON-encoded books, one list per batch."""
+        encoded = []
+        for book_data in serializer.iter_data(rows):
+            encoded.append(json.dumps(book_data, ensure_ascii=False, separators=(',', ':')))
+            if len(encoded) >= self.batch_size:
+                yield encoded
+                encoded = []
+        if encoded:
+            yield encoded
+
+    def _json_array_chunks(self, serializer, rows):
+        yield '['
+        separator = ''
+        for encoded in self._encoded_rows(serializer, rows):
+            yield separator + ','.join(encoded)
+            separator = ','
+        yield ']'
+
+    def _ndjson_chunks(self, serializer, rows):
+        for encoded in self._encoded_rows(serializer, rows):
+            yield '\n'.join(encoded) + '\n'
+
+
+class BookChangesView(ReplicaReadMixin, drf_views.APIView):
+    """
+    Delta sync of the catalogue (see backend/change_log.py).
+    GET ?since=<token>&limit=N returns the books created/updated and the ids deleted
+    after the token, plus the token to pass next time. Start with since=0 (the whole
+    catalogue); repeat while has_more is true.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', CHANGES_DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            since = limit = -1
+        if since < 0 or limit < 1:
+            return Response({'error': 'since must be a change token and limit a positive number.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        updated, deleted, next_since, has_more = changes_since(since, min(limit, CHANGES_MAX_LIMIT))
+        rows = list(BookFastListSerializer.get_values_queryset(Book.objects.filter(id__in=updated).order_by('id')))
+        # Deleted after this page's entries: the tombstone follows in a later page, report it now
+        found = {row['id'] for row in rows}
+        deleted += [book_id for book_id in updated if book_id not in found]
+
+        return Response({
+            "changed": BookFastListSerializer(rows, context={'request': request}).data,
+            "deleted": sorted(deleted),
+            "next_since": str(next_since),
+            "has_more": has_more,
+        }, status=status.HTTP_200_OK)
+
+class BookDetailView(ReplicaReadMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieves, updates, or deletes a specific book instance.
     Read access for authenticated users.
@@ -261,106 +412,310 @@ class BookDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAdminOrLibrarianOrReadOnly] # Read for auth, Write for Admin/Librarian
     lookup_field = 'id' # Assuming URL uses book ID
 
+    @method_decorator(condition(etag_func=book_response_etag, last_modified_func=book_response_last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        # Read access does not depend on the book (IsAdminOrLibrarianOrReadOnly), so a
+        # cached copy can be served without loading it (see backend/response_cache.py)
+        return cached_book_response(request, self._build_detail)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in permissions.SAFE_METHODS:
+            # Sparse fieldset: load only the columns (and joins) the requested fields need
+            fields = get_requested_book_fields(self.request.query_params)
+            if fields is not None:
+                queryset = narrow_book_queryset(queryset, fields)
+        return queryset
+
+    def _build_detail(self):
+        book = self.get_object()
+        fields = get_requested_book_fields(self.request.query_params)
+        # Rendered for an anonymous viewer; the borrower name is re-applied per request
+        data = BookSerializer(book, context={**self.get_serializer_context(), 'viewer': None, 'fields': fields}).data
+        borrowers = {}
+        if (fields is None or 'borrower' in fields) and book.borrower_id is not None:
+            borrowers = {book.id: book.borrower.username}
+        return data, borrowers
+
     # perform_update and perform_destroy can be overridden if needed
 
-class BorrowBookView(drf_views.APIView):
-    """Handles borrowing a book."""
-    permission_classes = [permissions.IsAuthenticated]
+class BookBulkView(drf_views.APIView):
+    """
+    Bulk catalogue changes for Admins/Librarians (see backend/catalogue_bulk.py),
+    up to MAX_BULK_BOOKS books per request:
+    POST   [{<book>}, ...]               creates books (201, their ids in order)
+    PATCH  [{"id": 1, <fields>}, ...]    updates books (partial)
+    DELETE {"ids": [1, 2, ...]}          deletes books in short chunked transactions
+    Creates and updates are all-or-nothing: a 400 lists the errors by item index.
+    """
+    permission_classes = [IsAdminOrLibrarian]
 
-    def post(self, request, book_id, *args, **kwargs):
-        book = get_object_or_404(Book, id=book_id)
-        user = request.user
+    def _get_items(self, items, name='items'):
+        if not isinstance(items, list) or not items:
+            raise ValidationError({name: 'A non-empty list is required.'})
+        if len(items) > MAX_BULK_BOOKS:
+            raise ValidationError({name: f'At most {MAX_BULK_BOOKS} books per request.'})
+        return items
 
-        if not book.available:
-            due_date_str = book.due_date.strftime("%Y-%m-%d") if book.due_date else "an unknown date"
-            borrower_name = book.borrower.username if book.borrower else "another user"
-            return Response(
-                {'error': f'Book is currently unavailable. Borrowed by {borrower_name} and due back around {due_date_str}.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+    def post(self, request, *args, **kwargs):
+        serializer = BookSerializer(data=self._get_items(request.data), many=True, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        books = serializer.save(added_by=request.user)
+        return Response({'created': [book.id for book in books]}, status=status.HTTP_201_CREATED)
+
+    def patch(self, request, *args, **kwargs):
+        items = self._get_items(request.data)
+        # All books of the batch in one query (BookListSerializer maps the items to them by id)
+        ids = [item.get('id') for item in items if isinstance(item, dict) and type(item.get('id')) is int]
+        books = Book.objects.in_bulk(ids)
+        serializer = BookSerializer(books, data=items, many=True, partial=True, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        books = serializer.save()
+        return Response({'updated': [book.id for book in books]}, status=status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        ids = self._get_items(request.data.get('ids') if isinstance(request.data, dict) else None, 'ids')
+        if any(type(book_id) is not int for book_id in ids):
+            raise ValidationError({'ids': 'Book ids must be whole numbers.'})
+        return Response({'deleted': delete_books(ids)}, status=status.HTTP_200_OK)
 
-        # Check borrow limit
-        current_borrow_count = Book.objects.filter(borrower=user, available=False).count()
-        if current_borrow_count >= MAX_BORROW_LIMIT:
-            return Response(
-                {'error': f'Borrow limit reached. You cannot borrow more than {MAX_BORROW_LIMIT} books.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+class BorrowBookView(drf_views.APIView):
+    """Handles borrowing a book (atomic, see backend/circulation.py)."""
+    permission_classes = [permissions.IsAuthenticated]
 
-        # Borrow the book
-        book.available = False
-        book.borrower = user
-        book.borrow_date = date.today()
-        book.due_date = date.today() + timedelta(weeks=2) # Standard 2-week loan
-        book.save()
+    def post(self, request, book_id, *args, **kwargs):
+        try:
+            book = borrow_book(request.user, book_id)
+        except CirculationError as e:
+            return Response({'error': e.message}, status=e.status_code)
 
         serializer = BookSerializer(book, context={'request': request})
         return Response({'message': 'Book borrowed successfully', 'book': serializer.data}, status=status.HTTP_200_OK)
 
 class ReturnBookView(drf_views.APIView):
-    """Handles returning a book."""
+    """Handles returning a book (atomic, see backend/circulation.py)."""
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, book_id, *args, **kwargs):
-        book = get_object_or_404(Book, id=book_id)
         user = request.user
+        # Admins/Librarians can return books borrowed by anyone
+        try:
+            book = return_book(user, book_id, is_admin_or_librarian=is_admin_or_librarian(user))
+        except CirculationError as e:
+            return Response({'error': e.message}, status=e.status_code)
+
+        # A copy someone holds is lent to them right away (see _lend_to_next_hold)
+        message = 'Book returned successfully' if book.available else 'Book returned and lent to the next patron on hold'
+        serializer = BookSerializer(book, context={'request': request})
+        return Response({'message': message, 'book': serializer.data}, status=status.HTTP_200_OK)
+
+class BatchCirculationView(drf_views.APIView):
+    """
+    Base of the batch borrow/return views (circulation desk): POST
+    {"books": [<book id or ISBN>, ...]}. Numbers are book ids, strings ISBNs.
+    Answers 200 with one result per book, in request order. Subclasses set
+    `operation`, the circulation.py batch function (user, references, **kwargs),
+    and may pass it extra arguments from get_operation_kwargs().
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    operation = None # staticmethod(borrow_books) / staticmethod(return_books)
+    verb = None # 'Borrowed' / 'Returned'
+
+    def get_references(self, request):
+        books = request.data.get('books') if isinstance(request.data, dict) else None
+        if not isinstance(books, list) or not books:
+            raise ValidationError({'books': 'A non-empty list of book ids or ISBNs is required.'})
+        if len(books) > MAX_BATCH_SIZE:
+            raise ValidationError({'books': f'At most {MAX_BATCH_SIZE} books per request.'})
+        if any(isinstance(book, bool) or not isinstance(book, (int, str)) for book in books):
+            raise ValidationError({'books': 'Each item must be a book id (number) or an ISBN (string).'})
+        return books
+
+    def get_user(self, request):
+        """Whose loans the batch works on."""
+        return request.user
+
+    def get_operation_kwargs(self, request):
+        return {}
 
-        if book.available:
-            return Response({'error': 'Book is already available.'}, status=status.HTTP_400_BAD_REQUEST)
+    def post(self, request, *args, **kwargs):
+        references = self.get_references(request)
+        outcomes = self.operation(self.get_user(request), references, **self.get_operation_kwargs(request))
+        results = []
+        for reference, book, error in outcomes:
+            if error is None:
+                book_data = BookSerializer(book, context={'request': request}).data
+                results.append({'item': reference, 'ok': True, 'book': book_data})
+            else:
+                results.append({'item': reference, 'ok': False, 'error': error.message, 'status': error.status_code})
+        succeeded = sum(result['ok'] for result in results)
+        return Response(
+            {'message': f'{self.verb} {succeeded} of {len(results)} books', 'results': results},
+            status=status.HTTP_200_OK,
+        )
+
+class BatchBorrowView(BatchCirculationView):
+    """
+    Borrows several books at once. Admins/Librarians can lend them to a patron
+    by adding "user": <user id> to the body.
+    """
+    operation = staticmethod(borrow_books)
+    verb = 'Borrowed'
 
-        # Check if the user returning is the one who borrowed it, or if Admin/Librarian is returning
-        is_admin_or_librarian = hasattr(user, 'profile') and user.profile.type in ['AD', 'LB']
-        if book.borrower != user and not is_admin_or_librarian:
-            return Response({'error': 'You did not borrow this book.'}, status=status.HTTP_403_FORBIDDEN)
+    def get_user(self, request):
+        if request.data.get('user') is None:
+            return request.user
+        if not is_admin_or_librarian(request.user):
+            raise PermissionDenied('Only admins and librarians can lend books to other users.')
+        return get_object_or_404(User, id=request.data['user'])
 
-        # Return the book
-        book.available = True
-        book.borrower = None
-        book.borrow_date = None
-        book.due_date = None # Clear due date upon return
-        book.save()
+class BatchReturnView(BatchCirculationView):
+    """Returns several books at once (Admins/Librarians: anyone's books)."""
+    operation = staticmethod(return_books)
+    verb = 'Returned'
+
+    def get_operation_kwargs(self, request):
+        # Admins/Librarians can return books borrowed by anyone
+        return {'is_admin_or_librarian': is_admin_or_librarian(request.user)}
+
+
+class WorkListView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    The catalogue by title: one entry per work (see backend/works.py) with its
+    copy_count and available_copies, read from the Work table alone.
+    ?available=true|false, ?category=, ?language=, ?search= (title/author),
+    ?ordering= and keyset pages (?page_size=) as on /api/books/.
+    """
+    queryset = Work.objects.filter(copy_count__gt=0)
+    serializer_class = WorkSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['title', 'author']
+    ordering_fields = ['title', 'author', 'available_copies']
+    ordering = ['title'] # work_title_id_idx
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        for field in ('category', 'language'):
+            if params.get(field):
+                queryset = queryset.filter(**{field: params[field]})
+        available = params.get('available')
+        if available is not None:
+            if available.lower() in ('true', '1'):
+                queryset = queryset.filter(available_copies__gt=0)
+            elif available.lower() in ('false', '0'):
+                queryset = queryset.filter(available_copies=0)
+            else:
+                raise ValidationError({'available': 'Use true or false.'})
+        return queryset
+
+class WorkDetailView(ReplicaReadMixin, generics.RetrieveAPIView):
+    """A title with its counters and copies."""
+    queryset = Work.objects.all()
+    serializer_class = WorkDetailSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'id'
+
+class BorrowWorkView(drf_views.APIView):
+    """Borrows any available copy of a title (see borrow_work in backend/circulation.py)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, work_id, *args, **kwargs):
+        try:
+            book = borrow_work(request.user, work_id)
+        except CirculationError as e:
+            return Response({'error': e.message}, status=e.status_code)
 
         serializer = BookSerializer(book, context={'request': request})
-        return Response({'message': 'Book returned successfully', 'book': serializer.data}, status=status.HTTP_200_OK)
+        return Response({'message': 'Book borrowed successfully', 'book': serializer.data}, status=status.HTTP_200_OK)
+
+class PlaceHoldView(drf_views.APIView):
+    """
+    Joins the hold queue of a title with no available copy. The next returned
+    copy goes to the first patron in line (see backend/circulation.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, work_id, *args, **kwargs):
+        try:
+            hold = place_hold(request.user, work_id)
+        except CirculationError as e:
+            return Response({'error': e.message}, status=e.status_code)
+
+        hold = Hold.objects.select_related('work').get(id=hold.id)
+        return Response({'message': 'Hold placed', 'hold': HoldSerializer(hold).data}, status=status.HTTP_201_CREATED)
+
+class CancelHoldView(drf_views.APIView):
+    """Cancels a hold: your own, or anyone's for Admins/Librarians."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def delete(self, request, id, *args, **kwargs):
+        cancel_hold(request.user, id, is_admin_or_librarian=is_admin_or_librarian(request.user))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class MyHoldsView(generics.ListAPIView):
+    """The current user's holds, oldest first (one per title at most)."""
+    serializer_class = HoldSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        # unique_user_hold (user, work) serves the lookup
+        return Hold.objects.filter(user_id=self.request.user.pk).select_related('work').order_by('created_at', 'id')
+
+
+def group_books_by_borrower(rows, books):
+    """Groups serialized books (with their value rows, ordered by borrower) into one entry per borrower."""
+    response_data = []
+    for borrower_id, group in groupby(zip(rows, books), key=lambda pair: pair[0]['borrower_id']):
+        group = list(group)
+        response_data.append({
+            "borrower_id": borrower_id,
+            "borrower_name": group[0][0]['borrower__username'],
+            "books": [book_data for _, book_data in group],
+        })
+    return response_data
 
 
 class BorrowedBooksListView(drf_views.APIView):
     """
     Lists borrowed books.
     - For regular users: lists books borrowed by them.
-    - For Admins/Librarians: lists all borrowed books, grouped by user.
+    - For Admins/Librarians: lists all borrowed books, grouped by user. Pass
+      ?page_size=N (and the returned 'next'/'previous' links) to page by borrower.
     Includes derived fields like days_left, overdue status via BookSerializer.
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
         user = request.user
-        is_admin_or_librarian = hasattr(user, 'profile') and user.profile.type in ['AD', 'LB']
         today = date.today()
 
-        if is_admin_or_librarian:
-            # Admins/Librarians see all borrowed books, grouped by borrower
-            borrowed_books_query = Book.objects.filter(available=False).select_related('borrower', 'borrower__profile').order_by('borrower__username', 'due_date')
-            grouped_books = {}
-            for book in borrowed_books_query:
-                borrower = book.borrower
-                if not borrower: continue # Should not happen if available=False, but safety check
-
-                borrower_name = borrower.username
-                if borrower_name not in grouped_books:
-                    grouped_books[borrower_name] = {
-                        "borrower_id": borrower.id,
-                        "borrower_name": borrower_name,
-                        "books": []
-                    }
-
-                # Serialize book data - derived fields are now included by the serializer
-                book_data = BookSerializer(book, context={'request': request}).data
-                grouped_books[borrower_name]["books"].append(book_data)
-
-            # Convert dict to list for response
-            response_data = list(grouped_books.values())
-            return Response({"borrowed_books_by_user": response_data}, status=status.HTTP_200_OK)
+        if is_admin_or_librarian(user):
+            # Admins/Librarians see all borrowed books, grouped by borrower.
+            # One query ordered by borrower, serialized by the values() fast path and
+            # grouped in a single sweep. ?page_size=N pages by borrower (N borrowers per page).
+            borrowed_books_query = Book.objects.filter(available=False, borrower__isnull=False)
+            borrowers = (
+                User.objects.filter(id__in=borrowed_books_query.values('borrower_id'))
+                .values('id', 'username').order_by('username')
+            )
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(borrowers, request, view=self)
+            if page is not None:
+                borrowed_books_query = borrowed_books_query.filter(borrower_id__in=[b['id'] for b in page])
+
+            rows = list(BookFastListSerializer.get_values_queryset(
+                borrowed_books_query.order_by('borrower__username', 'borrower_id', 'due_date', 'id')
+            ))
+            books = BookFastListSerializer(rows, context={'request': request}).iter_data()
+            payload = {"borrowed_books_by_user": group_books_by_borrower(rows, books)}
+            if page is not None:
+                payload["next"] = paginator.get_next_link()
+                payload["previous"] = paginator.get_previous_link()
+            return Response(payload, status=status.HTTP_200_OK)
 
         else:
             # Regular users see only their borrowed books
@@ -371,6 +726,74 @@ class BorrowedBooksListView(drf_views.APIView):
             return Response({"my_borrowed_books": serializer.data}, status=status.HTTP_200_OK)
 
 
+class LoanHistoryView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    The loan ledger (borrows and returns), newest first, for Admins/Librarians.
+    Filters: ?book=<id>, ?user=<id>, ?action=B|R, ?from=YYYY-MM-DD, ?to=YYYY-MM-DD
+    (inclusive). Always paginated by cursor (?page_size=N, then the 'next' links) and
+    never counted, so pages stay fast however long the ledger grows.
+    """
+    serializer_class = LoanSerializer
+    permission_classes = [IsAdminOrLibrarian]
+    pagination_class = LedgerPagination
+
+    def _int_param(self, name):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: 'Must be a number.'})
+
+    def _day_start(self, name, offset_days=0):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            day = date.fromisoformat(value) + timedelta(days=offset_days)
+        except ValueError:
+            raise ValidationError({name: 'Use the YYYY-MM-DD format.'})
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+    def get_user_filter(self):
+        return self._int_param('user')
+
+    def get_queryset(self):
+        loans = Loan.objects.all()
+        book_id = self._int_param('book')
+        user_id = self.get_user_filter()
+        if book_id is not None:
+            loans = loans.filter(book_id=book_id)
+        if user_id is not None:
+            loans = loans.filter(user_id=user_id)
+        action = self.request.query_params.get('action')
+        if action:
+            if action not in dict(Loan.ACTIONS):
+                raise ValidationError({'action': f"Use one of: {', '.join(dict(Loan.ACTIONS))}."})
+            loans = loans.filter(action=action)
+        # Compared with datetimes, not created_at__date, so the index serves the range
+        start, end = self._day_start('from'), self._day_start('to', offset_days=1)
+        if start is not None:
+            loans = loans.filter(created_at__gte=start)
+        if end is not None:
+            loans = loans.filter(created_at__lt=end)
+
+        # Book/user histories walk their (book_id, id)/(user_id, id) index; everything
+        # else the (created_at, id) index
+        if book_id is not None or user_id is not None:
+            return loans.order_by('-id')
+        return loans.order_by('-created_at', '-id')
+
+
+class MyLoanHistoryView(LoanHistoryView):
+    """The current user's own borrows and returns (same filters, except ?user=)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_user_filter(self):
+        return self.request.user.pk
+
+
 # ============================== #
 # 4️ SECURITY & CSRF API VIEWS   #
 # ============================== #
@@ -389,7 +812,7 @@ def promote_user_to_librarian(request, user_id):
         if not request.user.is_authenticated:
             return Response({'error': 'Authentication required.'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        if not hasattr(request.user, 'profile') or request.user.profile.type != 'AD':
+        if not is_admin(request.user):
             return Response({'error': 'Only administrators can promote users.'}, status=status.HTTP_403_FORBIDDEN)
 
         user = User.objects.get(id=user_id)
@@ -407,6 +830,30 @@ def promote_user_to_librarian(request, user_id):
         return Response({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# ============================== #
+# 5️ MONITORING API VIEWS        #
+# ============================== #
+
+@api_view(['GET'])
+@drf_permission_classes([IsAdminUser]) # Admins only
+def cache_stats_view(request):
+    """Exposes in-process cache counters (hits/misses/size) for monitoring."""
+    return Response({"static_url_cache": static_url_cache_info()}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@drf_permission_classes([IsAdminUser]) # Admins only
+def db_pool_stats_view(request):
+    """Exposes the direct MySQL connection pool counters and the ORM connection settings."""
+    return Response({
+        "pool": db_pool_stats(), # None until get_db_connection() is first called
+        "orm": {
+            "vendor": connection.vendor,
+            "conn_max_age": connection.settings_dict.get('CONN_MAX_AGE'),
+            "conn_health_checks": connection.settings_dict.get('CONN_HEALTH_CHECKS'),
+        },
+    }, status=status.HTTP_200_OK)
+
 # Note: The old `validations.py` functions are generally superseded by serializer validation.
 # If specific complex validations were needed outside a serializer context, they could remain,
 # but standard field validation belongs in serializers.
\ No newline at end of file
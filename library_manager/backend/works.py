@@ -0,0 +1,125 @@
+"""
+Titles (models.Work) and their copy counters.
+
+Every Book is a copy of the Work with the same title, author and language. The
+work is assigned when a book is saved (signals.py) or before it is bulk-written
+(assign_works(): catalogue_import.py, catalogue_bulk.py), and created if needed.
+
+Work.copy_count and Work.available_copies follow the copies:
+- Book save/delete: signals.py, with adjust_work_counts()
+- borrow/return (QuerySet.update(), no signals): circulation.py, with
+  adjust_available_copies() in the same transaction
+- bulk writes: refresh_work_counts() recounts the works they touched
+
+Other writes that bypass the model signals must call refresh_work_counts().
+"""
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Book, Work
+
+KEY_FIELDS = ('title', 'author', 'language')
+# Descriptive fields a work takes over from its last saved copy (and the image)
+DETAIL_FIELDS = ('category', 'publisher', 'publication_year')
+
+
+def work_key(book):
+    """The grouping key of a book (case-insensitive, like MySQL's unique index)."""
+    return tuple(str(getattr(book, field) or '').casefold() for field in KEY_FIELDS)
+
+
+def _details(book):
+    details = {field: getattr(book, field) for field in DETAIL_FIELDS}
+    details['category'] = details['category'] or ''
+    details['image'] = book.image.name if book.image else ''
+    return details
+
+
+def get_work_id(book):
+    """The id of the work of `book`, created if needed."""
+    work, _ = Work.objects.get_or_create(
+        title=book.title, author=book.author, language=book.language, defaults=_details(book),
+    )
+    return work.id
+
+
+def _work_ids(books):
+    """{work_key: work id} of the existing works of the given books (one query)."""
+    keys = {work_key(book) for book in books}
+    rows = Work.objects.filter(title__in={book.title for book in books}).values_list('id', *KEY_FIELDS)
+    found = {}
+    for work_id, *key in rows:
+        key = tuple(str(value or '').casefold() for value in key)
+        if key in keys:
+            found.setdefault(key, work_id)
+    return found
+
+
+def assign_works(books):
+    """
+    Sets work_id on Book instances about to be bulk-written: one query for the
+    existing works and one INSERT for the missing ones. Returns the work ids.
+    """
+    works = _work_ids(books)
+    missing = {}
+    for book in books:
+        if work_key(book) not in works:
+            missing.setdefault(work_key(book), book)
+    if missing:
+        Work.objects.bulk_create(
+            [Work(title=book.title, author=book.author, language=book.language, **_details(book))
+             for book in missing.values()],
+            ignore_conflicts=True, # Created concurrently: picked up below
+        )
+        works.update(_work_ids(list(missing.values())))
+    for book in books:
+        book.work_id = works[work_key(book)]
+    return set(works.values())
+
+
+def _plus(field, delta):
+    """`field + delta`, never below zero (the counters are unsigned)."""
+    if delta >= 0:
+        return F(field) + delta
+    return Case(When(**{f'{field}__gte': -delta}, then=F(field) + delta), default=Value(0))
+
+
+def adjust_work_counts(work_id, copies=0, available=0, book=None):
+    """
+    Adds to a work's copy_count/available_copies in one UPDATE; with `book`, the
+    work also takes over its descriptive fields.
+    """
+    changes = _details(book) if book is not None else {}
+    if copies:
+        changes['copy_count'] = _plus('copy_count', copies)
+    if available:
+        changes['available_copies'] = _plus('available_copies', available)
+    if work_id is not None and changes:
+        Work.objects.filter(id=work_id).update(**changes)
+
+
+def adjust_available_copies(deltas):
+    """Adds {work_id: delta} to the works' available_copies in one UPDATE."""
+    deltas = {work_id: delta for work_id, delta in deltas.items() if work_id is not None and delta}
+    if not deltas:
+        return
+    whens = []
+    for work_id, delta in deltas.items():
+        if delta > 0:
+            whens.append(When(id=work_id, then=F('available_copies') + delta))
+        else:
+            whens.append(When(id=work_id, available_copies__gte=-delta, then=F('available_copies') + delta))
+            whens.append(When(id=work_id, then=Value(0)))
+    Work.objects.filter(id__in=deltas).update(available_copies=Case(*whens))
+
+
+def refresh_work_counts(work_ids):
+    """Recounts the copies of the given works (after writes that bypass the Book signals)."""
+    work_ids = {work_id for work_id in work_ids if work_id is not None}
+    if not work_ids:
+        return
+    copies = Book.objects.filter(work_id=OuterRef('id')).order_by().values('work_id')
+    Work.objects.filter(id__in=work_ids).update(
+        copy_count=Coalesce(Subquery(copies.annotate(n=Count('id')).values('n')), 0),
+        available_copies=Coalesce(Subquery(copies.filter(available=True).annotate(n=Count('id')).values('n')), 0),
+    )